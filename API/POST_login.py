@@ -4,12 +4,43 @@ import logging
 import requests
 import traceback
 import utils
+import API.http_client as http_client
 
 
-def login():
+def _load_credentials() -> dict:
+    credentials_path = os.path.join(utils.get_base_dir(), 'EnvironmentCredentials', 'credentials.json')
+    with open(credentials_path) as f:
+        return json.load(f)
+
+
+def _login_request(credentials: dict):
+    """
+    Esegue la chiamata di login in modo silenzioso: nessun log di chiave segreta o token, nessun `print`.
+
+    @return: `(response, token)`; `token` è `None` se la risposta non lo contiene.
+
+    Raises:
+    - `KeyError` if the credentials are incomplete.
+    - `requests.RequestException` if the request fails.
+    - `ValueError` if the response is not valid JSON.
+    """
+    client = http_client.get_client()
+    url = client.url("/ims/api/v1/access_keys/login")
+    payload = {
+        "tenant_id": credentials["tenant_id"],
+        "access_key": credentials["access_key"],
+        "access_secret_key": credentials["access_secret_key"]
+    }
+    response = client.post(url, headers={'Content-Type': 'application/json'}, json=payload, authenticated=False)
+    response.raise_for_status()
+    return response, response.json().get("json_web_token")
+
+
+def login(save_token: bool = True):
     """
     Authenticates with the Unicredit API and retrieves an access token.
 
+    @param save_token: If `False` the token is only kept in memory by the HTTP client and `config.json` is left untouched.
     @return: The response object from the API request.
 
     Requirements:
@@ -18,7 +49,8 @@ def login():
         - `access_key`: The API access key.
         - `access_secret_key`: The API secret key.
     - Logging is configured via `utils.setup_logging()`.
-    - The API response should contain `json_web_token`, which will be stored in `config.json`.
+    - The API response should contain `json_web_token`, which will be stored in `config.json`
+      and handed to the HTTP client's token manager.
 
     Raises:
     - Logs an error if the credentials file is missing or incorrectly formatted.
@@ -29,52 +61,33 @@ def login():
     utils.setup_logging()
 
     # ✅ Load Credentials
-    credentials_path = os.path.join(utils.get_base_dir(), 'EnvironmentCredentials', 'credentials.json')
     try:
-        with open(credentials_path) as f:
-            credentials = json.load(f)
+        credentials = _load_credentials()
         logging.info("✅ Credentials successfully loaded.")
     except Exception as e:
         logging.error(f"❌ Error loading credentials: {e}")
         print("❌ Login failed (check log)")
         return None
-    credentials["base_url"]
-    # ✅ API Endpoint
-    url = f"{credentials["base_url"]}/ims/api/v1/access_keys/login"
-
-    # ✅ Construct Request Data
-    payload = {
-        "tenant_id": credentials["tenant_id"],
-        "access_key": credentials["access_key"],
-        "access_secret_key": credentials["access_secret_key"]
-    }
 
-    headers = {'Content-Type': 'application/json'}
-
-    # ✅ Log request details
-    logging.info(f"🔹 POST Request URL: {url}")
-    logging.info(f"🔹 POST Headers: {headers}")
-    logging.info(f"🔹 POST Payload: {json.dumps(payload, indent=4)}")
+    # ✅ Log request details (la chiave segreta e il token non vengono mai scritti nel log)
+    client = http_client.get_client()
+    logging.info(f"🔹 POST Request URL: {client.url('/ims/api/v1/access_keys/login')}")
+    logging.info(f"🔹 POST tenant_id: {credentials.get('tenant_id')}, access_key: {credentials.get('access_key')}")
 
     try:
-        response = requests.post(url, headers=headers, json=payload)
-        response.raise_for_status()
+        response, token = _login_request(credentials)
 
-        # ✅ Log full response
         logging.info(f"✅ Login request completed successfully!")
         logging.info(f"✅ Response Code: {response.status_code}")
-        logging.info(f"✅ Response Body:\n{response.text}")
-
-        # ✅ Extract token from response
-        data = response.json()
-        token = data.get("json_web_token")
 
         if token:
             # ✅ Save Token in Config
-            config = utils.load_config()
-            config.setdefault("auth", {})["BearerToken"] = token
-            utils.save_config(config)
-            logging.info("✅ Token successfully saved in config.json")
+            client.set_token(token)
+            if save_token:
+                config = utils.load_config()
+                config.setdefault("auth", {})["BearerToken"] = token
+                utils.save_config(config)
+                logging.info("✅ Token successfully saved in config.json")
             print("✅ Login successful")
             return response
         else:
@@ -84,10 +97,11 @@ def login():
 
     except requests.HTTPError as http_err:
         error_message = f"❌ API Request Error: {http_err}"
+        response = http_err.response
         try:
             error_body = response.json()  # Attempt to extract JSON response
         except Exception:
-            error_body = response.text  # If JSON parsing fails, log raw text
+            error_body = response.text if response is not None else None  # If JSON parsing fails, log raw text
 
         logging.error(f"{error_message}\nResponse Body:\n{error_body}")
         logging.error(f"🔹 Full Traceback:\n{traceback.format_exc()}")
@@ -98,4 +112,27 @@ def login():
         logging.error(f"{error_message}\n🔹 Full Traceback:\n{traceback.format_exc()}")
         print("❌ Login failed (check log)")
 
+    except (KeyError, ValueError) as e:
+        logging.error(f"❌ Invalid credentials or login response: {e!r}")
+        print("❌ Login failed (check log)")
+
     return None
+
+
+def request_token():
+    """
+    Requests a new access token without persisting it.
+
+    Used by `API.token_manager.TokenManager` to refresh the token before it expires: unlike
+    `login()` it prints nothing and logs neither the secret key nor the token.
+
+    @return: The JWT string, or `None` if the login failed.
+    """
+    try:
+        _, token = _login_request(_load_credentials())
+    except (OSError, KeyError, ValueError, requests.RequestException) as e:
+        logging.error(f"❌ Token refresh failed: {e!r}")
+        return None
+    if not token:
+        logging.warning("⚠️ Token refresh: no token received from the API response")
+    return token
@@ -0,0 +1,160 @@
+import os
+import sys
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+import API.http_client as http_client
+import API.exporting_etls_config.GET_all_etls as GET_all_etls
+import API.exporting_etls_config.POST_etl_configuration as POST_etl_configuration
+import API.updating_etls_config.PUT_etl_config as PUT_etl_config
+import API.updating_etls_config.POST_etl_config as POST_etl_config
+import API.datamart.retrive_datamart_data as retrive_datamart_data
+import API.datamart.retrieve_datamart_metadata as retrieve_datamart_metadata
+import API.domain.retrieve_domain_entities as retrieve_domain_entities
+
+
+class BoundedExecutor:
+    """
+    Esegue le funzioni API sincrone in un pool di thread, limitando con un
+    semaforo il numero di chiamate contemporanee.
+
+    Le chiamate condividono il client HTTP (e quindi il pool di connessioni) di
+    `http_client.get_client()`.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, int(concurrency))
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="bhco-api")
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # Un semaforo per event loop: asyncio.run() crea ogni volta un loop nuovo
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.concurrency)
+                self._semaphores = {l: s for l, s in self._semaphores.items() if not l.is_closed()}
+                self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def run(self, fn, *args, **kwargs):
+        """
+        Esegue `fn(*args, **kwargs)` nel pool, rispettando il limite di concorrenza.
+        """
+        async with self._semaphore():
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+    async def map(self, fn, items):
+        """
+        Esegue `fn(item)` per ogni elemento e restituisce i risultati nello stesso ordine di `items`.
+        """
+        return await asyncio.gather(*(self.run(fn, item) for item in items))
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> BoundedExecutor:
+    """
+    Restituisce l'executor condiviso, creandolo al primo utilizzo.
+
+    Requirements:
+    - `config.json` may contain `http.concurrency` (default: `http.pool_size` del client HTTP).
+    """
+    global _executor
+    if _executor is not None:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None:
+            http_config = utils.load_config().get("http", {})
+            concurrency = http_config.get("concurrency", http_client.get_client().pool_size)
+            _executor = BoundedExecutor(concurrency)
+            logging.info(f"🔹 Async API executor initialised (concurrency: {_executor.concurrency})")
+    return _executor
+
+
+# ---------------------------------------------------------------------------
+# Varianti asincrone delle funzioni API
+# ---------------------------------------------------------------------------
+
+async def get_all_etls(executor: BoundedExecutor = None):
+    return await (executor or get_executor()).run(GET_all_etls.get_all_etls)
+
+
+async def post_etl_configuration(erid: str, executor: BoundedExecutor = None):
+    return await (executor or get_executor()).run(POST_etl_configuration.post_etl_configuration, erid)
+
+
+async def put_etl_configuration(erid: str, modified_body: dict, executor: BoundedExecutor = None):
+    return await (executor or get_executor()).run(PUT_etl_config.put_etl_configuration, erid, modified_body)
+
+
+async def patch_etl_configuration(etl_id: str, new_properties: dict = None, properties_to_delete: dict = None,
+                                  executor: BoundedExecutor = None):
+    return await (executor or get_executor()).run(
+        POST_etl_config.patch_etl_configuration, etl_id, new_properties, properties_to_delete
+    )
+
+
+async def post_datamart_data(datamart_id: str, executor: BoundedExecutor = None):
+    return await (executor or get_executor()).run(retrive_datamart_data.post_datamart_data, datamart_id)
+
+
+async def get_datamart_metadata(datamart_id: str, executor: BoundedExecutor = None):
+    return await (executor or get_executor()).run(retrieve_datamart_metadata.get_datamart_metadata, datamart_id)
+
+
+async def get_entity_tree(entity_id: str, executor: BoundedExecutor = None):
+    return await (executor or get_executor()).run(retrieve_domain_entities.get_entity_tree, entity_id)
+
+
+async def apply_tag_to_entities(entity_ids, executor: BoundedExecutor = None):
+    """
+    Applica il tag alle entità in parallelo (una richiesta per entità).
+    """
+    executor = executor or get_executor()
+    await executor.map(lambda entity_id: retrieve_domain_entities.apply_tag_to_entities([entity_id]), entity_ids)
+
+
+# ---------------------------------------------------------------------------
+# Wrapper sincroni per i workflow che non usano asyncio
+# ---------------------------------------------------------------------------
+
+def fetch_etl_configurations(erids) -> list:
+    """
+    Recupera in parallelo la configurazione di più ETL.
+
+    @param erids: Lista di ERID.
+    @return: Lista delle risposte di `post_etl_configuration`, nello stesso ordine di `erids`
+             (`None` per gli ETL la cui richiesta è fallita).
+    """
+    return asyncio.run(get_executor().map(POST_etl_configuration.post_etl_configuration, list(erids)))
+
+
+def fetch_datamart_metadata(datamart_ids) -> list:
+    """
+    Recupera in parallelo i metadati di più DataMart, nello stesso ordine di `datamart_ids`.
+    """
+    return asyncio.run(get_executor().map(retrieve_datamart_metadata.get_datamart_metadata, list(datamart_ids)))
+
+
+def fetch_entity_trees(entity_ids) -> list:
+    """
+    Recupera in parallelo l'albero di più entità, nello stesso ordine di `entity_ids`.
+    """
+    return asyncio.run(get_executor().map(retrieve_domain_entities.get_entity_tree, list(entity_ids)))
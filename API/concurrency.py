@@ -0,0 +1,122 @@
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+DEFAULT_INITIAL_LIMIT = 4
+DEFAULT_MIN_LIMIT = 1
+DEFAULT_DECREASE_FACTOR = 0.5
+DEFAULT_LATENCY_TOLERANCE = 2.0
+DEFAULT_LATENCY_SMOOTHING = 0.1
+
+# Gli ID numerici nei path vengono normalizzati, così /etls/123 e /etls/456 condividono la latenza di riferimento
+_ID_PATTERN = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_key(method: str, url: str) -> str:
+    """
+    Chiave della "famiglia" di endpoint usata per la latenza di riferimento (es. `POST /backend/etls/{id}/configuration`).
+    """
+    path = url.split('?', 1)[0]
+    path = re.sub(r'^https?://[^/]+', '', path)
+    return f"{method.upper()} {_ID_PATTERN.sub('/{id}', path)}"
+
+
+class AdaptiveLimiter:
+    """
+    Limite adattivo (AIMD) al numero di richieste HTTP contemporanee.
+
+    - Aumento additivo: ogni `limit` risposte sane il limite cresce di 1.
+    - Diminuzione moltiplicativa: su 429/5xx, errori di rete o latenza oltre
+      `latency_tolerance` volte la media dell'endpoint il limite viene moltiplicato
+      per `decrease_factor` (al massimo una volta per finestra di latenza).
+
+    Il limite corrente è esposto da `limit` ed è loggato ad ogni variazione.
+    """
+
+    def __init__(self, initial_limit: int = DEFAULT_INITIAL_LIMIT, min_limit: int = DEFAULT_MIN_LIMIT,
+                 max_limit: int = 10, decrease_factor: float = DEFAULT_DECREASE_FACTOR,
+                 latency_tolerance: float = DEFAULT_LATENCY_TOLERANCE,
+                 latency_smoothing: float = DEFAULT_LATENCY_SMOOTHING):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.latency_smoothing = latency_smoothing
+
+        self._limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self._in_flight = 0
+        self._baselines = {}
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self):
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self, key: str, latency: float, status: int = None, error: bool = False):
+        """
+        Libera uno slot e aggiorna il limite in base all'esito della richiesta.
+
+        @param key: Famiglia di endpoint (vedi `endpoint_key`).
+        @param latency: Durata della richiesta in secondi.
+        @param status: Status HTTP ricevuto (`None` se la richiesta è fallita prima della risposta).
+        @param error: `True` per errori di rete/timeout.
+        """
+        with self._condition:
+            self._in_flight -= 1
+            old_limit = self.limit
+            baseline = self._baselines.get(key)
+            overloaded = error or status == 429 or (status is not None and status >= 500)
+            slow = baseline is not None and latency > baseline * self.latency_tolerance
+
+            if overloaded or slow:
+                now = time.monotonic()
+                # Le risposte della stessa "ondata" non devono dimezzare il limite più volte
+                if now - self._last_decrease >= (baseline or latency):
+                    self._limit = max(self.min_limit, self._limit * self.decrease_factor)
+                    self._last_decrease = now
+            else:
+                self._limit = min(self.max_limit, self._limit + 1 / self._limit)
+
+            if not overloaded:
+                # Solo le risposte valide contribuiscono alla latenza di riferimento
+                self._baselines[key] = latency if baseline is None else (
+                    baseline + self.latency_smoothing * (latency - baseline))
+
+            if self.limit != old_limit:
+                if overloaded:
+                    reason = f"status {status}" if status else "network error"
+                else:
+                    reason = "latency spike" if slow else "stable latency"
+                logging.info(f"🔹 HTTP concurrency limit {old_limit} → {self.limit} ({reason}, {latency:.2f}s on {key})")
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self, method: str, url: str):
+        """
+        Context manager che occupa uno slot per la durata della richiesta.
+
+        Il chiamante imposta `outcome["status"]` con lo status HTTP ricevuto; un'eccezione
+        viene registrata come errore di rete.
+        """
+        self.acquire()
+        outcome = {"status": None}
+        start = time.monotonic()
+        try:
+            yield outcome
+        except Exception:
+            self.release(endpoint_key(method, url), time.monotonic() - start, error=True)
+            raise
+        self.release(endpoint_key(method, url), time.monotonic() - start, status=outcome["status"])
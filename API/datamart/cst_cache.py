@@ -0,0 +1,332 @@
+import os
+import re
+import sys
+import gzip
+import time
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+
+# Default di `cst_cache` in config.json
+DEFAULT_TTL = 300
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Letterali stringa ('...' con '' come escape) e identificatori quotati ("...") non vengono normalizzati
+_QUOTED = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+_FROM_CLAUSE = re.compile(r'\b(?:from|join)\s+(.+?)(?=\b(?:where|group|order|having|limit|union|join|on|using|'
+                          r'left|right|inner|outer|cross|full|natural)\b|\)|;|$)')
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Forma canonica di una query SQL, condivisa da tutto ciò che identifica una query dal
+    testo: chiave di questa cache e di quella di `DB.local_query`, id delle estrazioni di `cst_extract`.
+
+    Spazi e a capo ridondanti vengono compressi e il testo portato in minuscolo, tranne
+    i letterali stringa e gli identificatori tra doppi apici, che restano invariati
+    (`WHERE name = 'Foo'` e `where NAME='foo'` sono query diverse).
+    """
+    parts = []
+    for index, part in enumerate(_QUOTED.split(sql.strip().rstrip(";").strip())):
+        if index % 2:
+            parts.append(part)
+        else:
+            # Gli spazi attorno a virgole, parentesi e operatori di confronto non cambiano la query
+            part = re.sub(r'\s+', ' ', part).lower()
+            parts.append(re.sub(r' ?([(),=<>]) ?', r'\1', part))
+    return "".join(parts)
+
+
+def referenced_tables(sql: str) -> list:
+    """
+    Tabelle citate nelle clausole FROM/JOIN della query (minuscole, senza apici), per l'invalidazione.
+    """
+    unquoted = _QUOTED.sub(lambda match: match.group(0).lower() if match.group(0).startswith('"') else "''",
+                           normalize_sql(sql))
+    tables = set()
+    for clause in _FROM_CLAUSE.findall(unquoted):
+        for item in clause.split(","):
+            fields = item.strip().split()
+            if fields and not fields[0].startswith("("):
+                name = fields[0].replace('"', '')
+                tables.add(name)
+                tables.add(name.rsplit(".", 1)[-1])
+    return sorted(tables)
+
+
+class CSTQueryCache:
+    """
+    Cache su disco dei risultati delle query CST (`post_datamart_cst.post_cst_query`).
+
+    La chiave è l'hash della query normalizzata (`normalize_sql`); i risultati sono salvati
+    compressi in `cache/cst/<hash>.json.gz` e un indice SQLite (`index.db`) tiene scadenza,
+    ultimo accesso, dimensione e tabelle citate di ogni voce. Oltre `max_bytes` vengono
+    eliminate le voci usate meno di recente (LRU); `invalidate_table` elimina tutte le voci
+    che leggono una tabella. Hit e miss sono conteggiati nell'indice, così il rapporto di hit
+    copre anche le esecuzioni precedenti.
+    """
+
+    def __init__(self, cache_dir: str, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_BYTES,
+                 enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(cache_dir, "index.db"), isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key         TEXT PRIMARY KEY,
+                sql         TEXT NOT NULL,
+                stored_at   REAL NOT NULL,
+                expires_at  REAL NOT NULL,
+                last_access REAL NOT NULL,
+                size        INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_lru ON entries (last_access)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entry_tables (
+                key        TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                PRIMARY KEY (table_name, key)
+            )
+        """)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+
+    @staticmethod
+    def key_for(sql: str) -> str:
+        return hashlib.sha256(normalize_sql(sql).encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json.gz")
+
+    def _count(self, name: str, amount: int = 1):
+        self._conn.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                           "ON CONFLICT (name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def _delete(self, keys: list):
+        for key in keys:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM entry_tables WHERE key = ?", (key,))
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def get(self, sql: str):
+        """
+        Risultato in cache (JSON serializzato) della query, oppure `None` se assente o scaduto.
+        """
+        if not self.enabled:
+            return None
+        key = self.key_for(sql)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None or row[0] <= now:
+                if row is not None:
+                    self._delete([key])
+                self._count("misses")
+                return None
+            try:
+                with gzip.open(self._path(key), 'rt', encoding='utf-8') as f:
+                    text = f.read()
+            except (OSError, EOFError):
+                self._delete([key])
+                self._count("misses")
+                return None
+            self._conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._count("hits")
+        return text
+
+    def put(self, sql: str, text: str, ttl: float = None):
+        """
+        Salva il risultato di una query e applica il limite di dimensione (LRU).
+        """
+        if not self.enabled:
+            return
+        key = self.key_for(sql)
+        ttl = self.ttl if ttl is None else ttl
+        data = gzip.compress(text.encode("utf-8"), compresslevel=6)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logging.warning(f"⚠️ Unable to write CST cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute("INSERT OR REPLACE INTO entries (key, sql, stored_at, expires_at, last_access, size) "
+                                   "VALUES (?, ?, ?, ?, ?, ?)", (key, normalize_sql(sql), now, now + ttl, now, len(data)))
+                self._conn.execute("DELETE FROM entry_tables WHERE key = ?", (key,))
+                self._conn.executemany("INSERT OR IGNORE INTO entry_tables (key, table_name) VALUES (?, ?)",
+                                       [(key, table) for table in referenced_tables(sql)])
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now: float):
+        expired = [key for key, in self._conn.execute("SELECT key FROM entries WHERE expires_at <= ?", (now,))]
+        self._delete(expired)
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        evicted = []
+        if total > self.max_bytes:
+            for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+                if total <= self.max_bytes:
+                    break
+                evicted.append(key)
+                total -= size
+            self._delete(evicted)
+            self._count("evictions", len(evicted))
+            logging.info(f"💾 CST cache: evicted {len(evicted)} least recently used entries")
+
+    def invalidate(self, sql: str) -> bool:
+        """
+        Elimina la voce di una query. @return: `True` se era presente.
+        """
+        key = self.key_for(sql)
+        with self._lock:
+            present = self._conn.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone() is not None
+            self._delete([key])
+        return present
+
+    def invalidate_table(self, table: str) -> int:
+        """
+        Elimina tutte le voci delle query che leggono `table` (es. dopo un caricamento ETL).
+
+        @return: Numero di voci eliminate.
+        """
+        name = table.strip().strip('"').lower()
+        with self._lock:
+            keys = [key for key, in self._conn.execute("SELECT key FROM entry_tables WHERE table_name = ?", (name,))]
+            self._delete(keys)
+        logging.info(f"💾 CST cache: {len(keys)} entries invalidated for table {name}")
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            keys = [key for key, in self._conn.execute("SELECT key FROM entries")]
+            self._delete(keys)
+
+    def stats(self) -> dict:
+        """
+        Statistiche della cache: voci, byte su disco, hit, miss, evizioni e rapporto di hit.
+        """
+        with self._lock:
+            entries, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counters = dict(self._conn.execute("SELECT name, value FROM counters"))
+        hits, misses = counters.get("hits", 0), counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": hits,
+            "misses": misses,
+            "evictions": counters.get("evictions", 0),
+            "hit_ratio": hits / (hits + misses) if hits + misses else 0.0,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM counters")
+
+    def close(self):
+        self._conn.close()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> CSTQueryCache:
+    """
+    Cache condivisa in `cache/cst/`.
+
+    Requirements:
+    - `config.json` may contain `cst_cache` with:
+        - `enabled`: Disattiva la cache se `false` (default `true`).
+        - `ttl_sec`: Validità di un risultato in secondi (default 300).
+        - `max_bytes`: Dimensione massima su disco, compressa (default 256 MB).
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = utils.load_config().get("cst_cache", {})
+            _cache = CSTQueryCache(utils.get_cache_dir("cst"), ttl=config.get("ttl_sec", DEFAULT_TTL),
+                                   max_bytes=config.get("max_bytes", DEFAULT_MAX_BYTES),
+                                   enabled=config.get("enabled", True))
+        return _cache
+
+
+def lookup(sql: str):
+    """
+    Risultato in cache della query dalla cache condivisa; un errore della cache vale come miss.
+    """
+    try:
+        return get_cache().get(sql)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"⚠️ CST cache lookup failed: {e}")
+        return None
+
+
+def store(sql: str, text: str, ttl: float = None):
+    """
+    Salva il risultato della query nella cache condivisa; un errore della cache viene solo registrato.
+    """
+    try:
+        get_cache().put(sql, text, ttl)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"⚠️ CST cache store failed: {e}")
+
+
+def invalidate_table(table: str) -> int:
+    """
+    Elimina dalla cache condivisa i risultati delle query che leggono `table`.
+    """
+    return get_cache().invalidate_table(table)
+
+
+def log_stats():
+    """
+    Scrive nel log (e stampa) il rapporto di hit della cache condivisa.
+    """
+    stats = get_cache().stats()
+    message = (f"💾 CST cache: {stats['hits']} hits / {stats['misses']} misses "
+               f"({stats['hit_ratio']:.0%} hit ratio), {stats['entries']} entries, {stats['bytes']} bytes")
+    logging.info(message)
+    print(message)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or invalidate the CST query result cache.")
+    parser.add_argument("--invalidate", metavar="TABLE", action="append", help="drop the results that read TABLE")
+    parser.add_argument("--clear", action="store_true", help="drop every cached result")
+    args = parser.parse_args()
+    utils.setup_logging()
+    if args.clear:
+        get_cache().clear()
+    for table_name in args.invalidate or []:
+        print(f"💾 {invalidate_table(table_name)} entries invalidated for {table_name}")
+    log_stats()
@@ -0,0 +1,214 @@
+import os
+import sys
+import re
+import json
+import logging
+from datetime import datetime, timezone
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import API.datamart.retrieve_datamart_metadata as retrieve_datamart_metadata
+
+# Tipi logici delle colonne, indipendenti dal formato di destinazione (Parquet, SQLite, ...)
+INTEGER = "integer"
+FLOAT = "float"
+BOOLEAN = "boolean"
+TIMESTAMP = "timestamp"
+STRING = "string"
+
+# Campi in cui i metadati del datamart possono riportare l'elenco delle colonne
+_COLUMN_LIST_KEYS = ("columns", "fields", "metadata", "data")
+_NAME_KEYS = ("name", "columnName", "column_name", "id")
+_TYPE_KEYS = ("type", "dataType", "datatype", "data_type", "columnType")
+# Flag con cui i metadati possono dichiarare le colonne della chiave
+_KEY_FLAGS = ("primaryKey", "primary_key", "isKey", "is_key", "key")
+
+# Nomi dei tipi SQL/BHCO (senza lunghezza/precisione e modificatori), confrontati per intero:
+# `LONGTEXT`, `LONG VARCHAR` o `INTERVAL` restano testo
+_TYPE_NAMES = {
+    BOOLEAN: ("BOOL", "BOOLEAN"),
+    TIMESTAMP: ("TIMESTAMP", "TIMESTAMPTZ", "DATETIME", "DATETIME2", "SMALLDATETIME", "DATE", "TIME", "TS"),
+    INTEGER: ("INT", "INTEGER", "BIGINT", "SMALLINT", "TINYINT", "MEDIUMINT", "INT2", "INT4", "INT8",
+              "LONG", "SHORT", "SERIAL", "BIGSERIAL"),
+    FLOAT: ("FLOAT", "FLOAT4", "FLOAT8", "DOUBLE", "DOUBLE PRECISION", "REAL", "DECIMAL", "NUMERIC", "NUMBER"),
+}
+_LOGICAL_BY_TYPE_NAME = {name: logical for logical, names in _TYPE_NAMES.items() for name in names}
+_TYPE_MODIFIERS = re.compile(r'\b(?:UNSIGNED|SIGNED|WITH(?:OUT)?(?: LOCAL)? TIME ZONE)\b')
+
+# Valori non convertibili segnalati nel log (per tipo logico) prima di limitarsi a contarli
+_MAX_LOGGED_FAILURES = 10
+_conversion_failures = {}
+
+
+def logical_type(type_name) -> str:
+    """
+    Converte il tipo dichiarato nei metadati (es. `VARCHAR(255)`, `NUMBER(10,2)`, `TIMESTAMP`) nel tipo logico.
+    """
+    name = re.sub(r'\(.*?\)', ' ', str(type_name or "")).upper()
+    name = " ".join(_TYPE_MODIFIERS.sub(" ", name).split())
+    return _LOGICAL_BY_TYPE_NAME.get(name, STRING)
+
+
+def _column_list(metadata):
+    if isinstance(metadata, list):
+        return metadata
+    if isinstance(metadata, dict):
+        for key in _COLUMN_LIST_KEYS:
+            value = metadata.get(key)
+            if isinstance(value, list) and value and isinstance(value[0], dict):
+                return value
+            if isinstance(value, dict):
+                nested = _column_list(value)
+                if nested:
+                    return nested
+    return []
+
+
+def parse_columns(metadata) -> list:
+    """
+    Estrae le colonne dalla risposta di `get_datamart_metadata`.
+
+    @param metadata: La risposta decodificata (o la stringa JSON restituita da `get_datamart_metadata`).
+    @return: Lista di `{"name": ..., "type": <tipo logico>, "source_type": <tipo dichiarato>, "key": <bool>}`
+             nell'ordine dei metadati (`key` indica una colonna dichiarata come chiave).
+    """
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+
+    columns = []
+    for column in _column_list(metadata):
+        name = next((column[key] for key in _NAME_KEYS if column.get(key) is not None), None)
+        if name is None:
+            continue
+        source_type = next((column[key] for key in _TYPE_KEYS if column.get(key) is not None), None)
+        key = any(column.get(flag) is True or str(column.get(flag)).lower() == "true" for flag in _KEY_FLAGS)
+        columns.append({"name": str(name), "type": logical_type(source_type), "source_type": source_type, "key": key})
+    return columns
+
+
+def get_datamart_columns(datamart_id: str, refresh: bool = False) -> list:
+    """
+    Restituisce le colonne tipizzate di un datamart a partire dai suoi metadati.
+
+    @param datamart_id: The ID of the DataMart.
+    @param refresh: If `True`, bypasses the local HTTP cache.
+    @return: Lista di colonne (vedi `parse_columns`); vuota se i metadati non sono disponibili.
+    """
+    metadata = retrieve_datamart_metadata.get_datamart_metadata(datamart_id, refresh=refresh)
+    if not metadata:
+        logging.warning(f"⚠️ No metadata available for DataMart {datamart_id}")
+        return []
+    columns = parse_columns(metadata)
+    if not columns:
+        logging.warning(f"⚠️ No column definitions found in the metadata of DataMart {datamart_id}")
+    else:
+        logging.info(f"🔹 DataMart {datamart_id}: {len(columns)} columns from metadata")
+    return columns
+
+
+def _value_type(value):
+    if isinstance(value, bool):
+        return BOOLEAN
+    if isinstance(value, int):
+        return INTEGER
+    if isinstance(value, float):
+        return FLOAT
+    return STRING
+
+
+def infer_columns(records) -> list:
+    """
+    Deduce le colonne dai record (usato quando i metadati non riportano le colonne).
+
+    Un intero misto a decimali diventa `float`; qualsiasi altro conflitto diventa `string`.
+    """
+    types = {}
+    for record in records:
+        for name, value in record.items():
+            if value is None:
+                types.setdefault(name, None)
+                continue
+            current, found = types.get(name), _value_type(value)
+            if current is None or current == found:
+                types[name] = found
+            elif {current, found} == {INTEGER, FLOAT}:
+                types[name] = FLOAT
+            else:
+                types[name] = STRING
+    return [{"name": name, "type": logical or STRING, "source_type": None} for name, logical in types.items()]
+
+
+def to_datetime(value):
+    """
+    Converte un timestamp del datamart (epoch in secondi o millisecondi, oppure ISO 8601) in `datetime` UTC.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = value / 1000 if abs(value) >= 1e11 else value
+        return datetime.fromtimestamp(seconds, tz=timezone.utc)
+    text = str(value).strip()
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    try:
+        parsed = datetime.fromisoformat(text)
+    except ValueError:
+        try:
+            return to_datetime(float(text))
+        except ValueError:
+            return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _to_bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1", "yes", "y", "t")
+    return bool(value)
+
+
+def _conversion_failed(value, logical: str):
+    count = _conversion_failures[logical] = _conversion_failures.get(logical, 0) + 1
+    if count <= _MAX_LOGGED_FAILURES:
+        logging.warning(f"⚠️ Value {str(value)[:100]!r} is not a valid {logical}: stored as NULL"
+                        + (" (further failures are only counted)" if count == _MAX_LOGGED_FAILURES else ""))
+    return None
+
+
+def conversion_failures() -> dict:
+    """
+    Valori non convertibili (diventati `None`) per tipo logico, dall'avvio del processo.
+    """
+    return dict(_conversion_failures)
+
+
+def convert_value(value, logical: str, report: bool = True):
+    """
+    Converte un valore JSON nel tipo logico della colonna.
+
+    I valori non convertibili diventano `None`: i primi vengono segnalati nel log, tutti
+    vengono contati (`conversion_failures`). Con `report=False` (quando si sta solo
+    verificando se un valore è, ad esempio, numerico) non vengono né segnalati né contati.
+    """
+    if value is None:
+        return None
+    failed = _conversion_failed if report else (lambda value, logical: None)
+    try:
+        if logical == INTEGER:
+            if isinstance(value, float) and not value.is_integer():
+                return failed(value, logical)
+            return int(value)
+        if logical == FLOAT:
+            return float(value)
+        if logical == BOOLEAN:
+            return _to_bool(value)
+        if logical == TIMESTAMP:
+            converted = to_datetime(value)
+            return converted if converted is not None or value == "" else failed(value, logical)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return failed(value, logical)
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value if isinstance(value, str) else str(value)
@@ -9,12 +9,15 @@ import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
 
-def get_datamart_custom_table_data(datamart_id: str):
+def get_datamart_custom_table_data(datamart_id: str, refresh: bool = False):
     """
     Sends a GET request to retrieve custom table data for a specific DataMart.
 
     @param datamart_id: The ERID of the DataMart.
+    @param refresh: If `True`, bypasses the local HTTP cache and downloads the response again.
 
     Requirements:
     - `config.json` must contain:
@@ -26,30 +29,24 @@ def get_datamart_custom_table_data(datamart_id: str):
     - Logs and exits if `datamart_id` or `BearerToken` is missing.
     - Logs detailed information about the request, response, or errors.
     """
-    config = utils.load_config()
-    credentials = utils.load_credentials()
     utils.setup_logging()
+    client = http_client.get_client()
 
     if not datamart_id:
         logging.error("❌ DataMart ID not provided as input argument.")
         print("❌ GET failed (check log)")
         return
 
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ GET failed (check log)")
         return
 
-    url = f"{credentials['base_url']}/opt/api/v1/datamartservice/datamarts/{datamart_id}/cst"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url(f"/opt/api/v1/datamartservice/datamarts/{datamart_id}/cst")
 
     try:
         logging.info(f"🔹 GET Request URL: {url}")
-        response = requests.get(url, headers=headers)
+        response = client.get(url, refresh=refresh)
         response.raise_for_status()
 
         logging.info(f"✅ GET request successfully sent for DataMart ID: {datamart_id}")
@@ -60,13 +57,8 @@ def get_datamart_custom_table_data(datamart_id: str):
             print("✅ GET successful (empty response)")
             return None
 
-        response_data = response.json()
-        formatted_json = json.dumps(response_data, indent=4)
-        logging.info(f"✅ Response Body:\n{formatted_json}")
-
-        json_path = utils.get_response_json_path("getDatamartCustomTableData", f"datamart_{datamart_id}")
-        with open(json_path, 'w') as f:
-            json.dump(response_data, f, indent=4)
+        response_data = http_client.parse_json(response)
+        formatted_json = response_capture.capture_response("getDatamartCustomTableData", f"datamart_{datamart_id}", response_data)
 
         print("✅ GET successful")
         return formatted_json
@@ -0,0 +1,153 @@
+import math
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+# Le pagine del datamartservice partono da 1 (`pagenum: -1` = tutto il dataset in un'unica risposta)
+FIRST_PAGE = 1
+DEFAULT_PAGE_SIZE = 10000
+
+# Campi in cui il server può riportare il numero totale di record
+TOTAL_COUNT_KEYS = ("totalcount", "totalCount", "total_count", "totalRecords", "total")
+
+
+def page_records(page) -> list:
+    """
+    Restituisce i record contenuti in una pagina (`data` della risposta).
+    """
+    if not page:
+        return []
+    return page.get("data", []) or []
+
+
+def total_count(page):
+    """
+    Numero totale di record dichiarato dal server nella pagina, oppure `None` se assente.
+    """
+    if not page:
+        return None
+    for key in TOTAL_COUNT_KEYS:
+        value = page.get(key)
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    return None
+
+
+def is_last_page(records: int, page_size: int, received: int, total) -> bool:
+    """
+    Indica se la pagina appena ricevuta è l'ultima.
+
+    Se il server riporta il totale si prosegue finché non sono arrivati tutti i record
+    (una pagina più corta di `page_size` può voler dire solo che il server limita la
+    dimensione delle pagine); altrimenti l'ultima pagina è la prima incompleta.
+
+    @param records: Record della pagina appena ricevuta.
+    @param received: Record ricevuti finora, pagina compresa.
+    @param total: Totale dichiarato dal server (`total_count`), oppure `None`.
+    """
+    if records == 0:
+        return True
+    if total is not None:
+        return received >= total
+    return records < page_size
+
+
+def iter_pages(fetch_page, page_size: int = DEFAULT_PAGE_SIZE, first_page: int = FIRST_PAGE):
+    """
+    Richiede le pagine in sequenza fino all'ultima (vedi `is_last_page`).
+
+    @param fetch_page: Funzione `(pagenum, pagesize) -> dict` che scarica una pagina.
+    @param page_size: Numero di record per pagina.
+    @param first_page: Numero della prima pagina da richiedere.
+    @return: Generatore delle pagine (dict) nell'ordine del server.
+    """
+    pagenum = first_page
+    total = None
+    received = 0
+    while True:
+        page = fetch_page(pagenum, page_size)
+        records = page_records(page)
+        total = total_count(page) if total is None else total
+        received += len(records)
+        logging.info(f"🔹 Page {pagenum}: {len(records)} records")
+        if records:
+            yield page
+        if is_last_page(len(records), page_size, received, total):
+            return
+        if len(records) < page_size and pagenum == first_page:
+            logging.warning(f"⚠️ The server returned {len(records)} of {page_size} requested records per page "
+                            f"({total} in total): continuing with smaller pages")
+        pagenum += 1
+
+
+def iter_records(pages):
+    """
+    Appiattisce un iterabile di pagine nei singoli record.
+    """
+    for page in pages:
+        yield from page_records(page)
+
+
+def iter_pages_parallel(fetch_page, page_size: int = DEFAULT_PAGE_SIZE, concurrency: int = 4,
+                        max_buffered_pages: int = None, first_page: int = FIRST_PAGE):
+    """
+    Scarica le pagine in parallelo e le restituisce nell'ordine originale.
+
+    La prima pagina viene scaricata da sola per conoscere il numero totale di record;
+    le successive vengono richieste con al massimo `concurrency` download contemporanei.
+    Le pagine arrivate fuori ordine attendono in un buffer di riordino: tra pagine in
+    download e pagine in attesa non ce ne sono mai più di `max_buffered_pages`, così la
+    memoria resta limitata anche se il consumatore è lento.
+    Se il server non riporta il totale, le pagine vengono richieste in anticipo fino alla
+    prima pagina incompleta; se lo riporta ma restituisce pagine più piccole di `page_size`,
+    il numero di pagine viene calcolato sulla dimensione effettiva della prima.
+
+    @param fetch_page: Funzione `(pagenum, pagesize) -> dict` che scarica una pagina (thread-safe).
+    @param page_size: Numero di record per pagina.
+    @param concurrency: Download contemporanei.
+    @param max_buffered_pages: Pagine al massimo in volo o nel buffer (default: `2 * concurrency`).
+    @return: Generatore delle pagine (dict) in ordine di `pagenum`.
+    """
+    window = max(concurrency, max_buffered_pages or 2 * concurrency)
+
+    first = fetch_page(first_page, page_size)
+    first_records = page_records(first)
+    if not first_records:
+        return
+    yield first
+    total = total_count(first)
+    received = len(first_records)
+    if is_last_page(len(first_records), page_size, received, total):
+        return
+
+    # Con il totale noto, una prima pagina incompleta indica la dimensione massima imposta dal server
+    served_size = len(first_records)
+    if served_size < page_size:
+        logging.warning(f"⚠️ The server returned {served_size} of {page_size} requested records per page "
+                        f"({total} in total): continuing with smaller pages")
+    last_page = first_page + math.ceil(total / served_size) - 1 if total is not None else None
+    logging.info(f"🔹 Parallel paging: {total if total is not None else 'unknown'} records, "
+                 f"{concurrency} concurrent downloads, up to {window} buffered pages")
+
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bhco-page")
+    pending = {}
+    next_submit = next_yield = first_page + 1
+    try:
+        while last_page is None or next_yield <= last_page:
+            while (last_page is None or next_submit <= last_page) and next_submit - next_yield < window:
+                pending[next_submit] = executor.submit(fetch_page, next_submit, page_size)
+                next_submit += 1
+
+            page = pending.pop(next_yield).result()
+            records = page_records(page)
+            received += len(records)
+            logging.info(f"🔹 Page {next_yield}: {len(records)} records")
+            if records:
+                yield page
+            if is_last_page(len(records), served_size, received, total):
+                # Ultima pagina: le richieste successive (speculative) non servono
+                break
+            next_yield += 1
+    finally:
+        for future in pending.values():
+            future.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
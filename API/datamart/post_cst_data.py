@@ -9,6 +9,10 @@ import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
+import API.datamart.paging as paging
+import API.datamart.record_table as record_table
 
 def post_custom_table_data(table_name: str):
     """
@@ -26,26 +30,20 @@ def post_custom_table_data(table_name: str):
     - Logs and exits if `table_name` or `BearerToken` is missing.
     - Logs detailed information about the request, response, or errors.
     """
-    config = utils.load_config()
-    credentials = utils.load_credentials()
     utils.setup_logging()
+    client = http_client.get_client()
 
     if not table_name:
         logging.error("❌ Custom Table name not provided as input argument.")
         print("❌ POST failed (check log)")
         return
 
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ POST failed (check log)")
         return
 
-    url = f"{credentials['base_url']}/opt/api/v1/datamartservice/datamarts/cst"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url("/opt/api/v1/datamartservice/datamarts/cst")
 
     # Example payload format for retrieving data from a custom table
     payload = {
@@ -66,24 +64,25 @@ def post_custom_table_data(table_name: str):
         return
 
     try:
-        response = requests.post(url, headers=headers, data=payload_json)
+        response = client.post(url, data=payload_json, idempotent=True, stream=True)
         response.raise_for_status()
 
         logging.info(f"✅ POST request successfully sent for custom table: {table_name}")
         logging.info(f"✅ Response Code: {response.status_code}")
 
-        if response.status_code == 204 or not response.text.strip():
+        # Body decompresso in streaming, senza passare da `response.text`
+        try:
+            response_data = http_client.read_json(response) if response.status_code != 204 else None
+        except json.JSONDecodeError as e:
+            logging.error(f"❌ Response for custom table {table_name} was not valid JSON: {e}")
+            print("❌ POST failed (check log)")
+            return None
+        if response_data is None:
             logging.info("⚠️ No content in response (204 No Content), skipping saving response.")
             print("✅ POST successful")
             return None
 
-        response_data = response.json()
-        formatted_json = json.dumps(response_data, indent=4)
-        logging.info(f"✅ Response Body:\n{formatted_json}")
-
-        json_path = utils.get_response_json_path("postCustomTableData", f"custom_table_{table_name}")
-        with open(json_path, 'w') as f:
-            json.dump(response_data, f, indent=4)
+        formatted_json = response_capture.capture_response("postCustomTableData", f"custom_table_{table_name}", response_data)
 
         print("✅ POST successful")
         return formatted_json
@@ -99,4 +98,135 @@ def post_custom_table_data(table_name: str):
 
     except requests.RequestException as e:
         logging.error(f"❌ Network/API request failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
-        print("❌ POST failed (check log)")
\ No newline at end of file
+        print("❌ POST failed (check log)")
+
+
+def fetch_custom_table_page(table_name: str, pagenum: int, pagesize: int):
+    """
+    Sends a POST request to retrieve a single page of a custom table (CST).
+
+    @param table_name: The name of the custom table to query.
+    @param pagenum: The page number (`options.pagenum`).
+    @param pagesize: The number of records per page (`options.pagesize`).
+    @return: The decoded page (`{"data": [...], ...}`), or `None` if the server returned no content.
+
+    Raises:
+    - `requests.RequestException` if the request fails (after the client's retries).
+    """
+    client = http_client.get_client()
+    url = client.url("/opt/api/v1/datamartservice/datamarts/cst")
+    payload = {
+        "tableName": table_name,
+        "options": {
+            "pagenum": pagenum,
+            "pagesize": pagesize
+        }
+    }
+
+    response = client.post(url, data=json.dumps(payload), idempotent=True, stream=True)
+    response.raise_for_status()
+    if response.status_code == 204:
+        return None
+    return http_client.read_json(response)
+
+
+def iter_custom_table_pages(table_name: str, page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1,
+                            max_buffered_pages: int = None):
+    """
+    Iterates over the pages of a custom table (CST).
+
+    @param table_name: The name of the custom table to query.
+    @param page_size: The number of records per page.
+    @param concurrency: Pages downloaded concurrently. With `1` pages are requested one at a time;
+                        otherwise the first page gives the total count and the rest are fetched in parallel.
+    @param max_buffered_pages: Upper bound on pages in flight or waiting to be consumed (default `2 * concurrency`).
+    @return: A generator of pages (dicts with a `data` list), always in page order.
+
+    Raises:
+    - `requests.RequestException` if a page cannot be retrieved (the error is logged first).
+    """
+    utils.setup_logging()
+    logging.info(f"🔹 Paged retrieval of custom table {table_name} (page size: {page_size}, concurrency: {concurrency})")
+
+    def fetch_page(pagenum, pagesize):
+        return fetch_custom_table_page(table_name, pagenum, pagesize)
+
+    try:
+        if concurrency > 1:
+            yield from paging.iter_pages_parallel(fetch_page, page_size, concurrency, max_buffered_pages)
+        else:
+            yield from paging.iter_pages(fetch_page, page_size)
+    except requests.RequestException as e:
+        logging.error(f"❌ Paged retrieval of custom table {table_name} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        raise
+
+
+def iter_custom_table_records(table_name: str, page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1,
+                              max_buffered_pages: int = None):
+    """
+    Iterates over the records of a custom table page by page, keeping a bounded number of pages in memory.
+
+    @param table_name: The name of the custom table to query.
+    @param page_size: The number of records per page.
+    @param concurrency: Pages downloaded concurrently (see `iter_custom_table_pages`).
+    @param max_buffered_pages: Upper bound on pages held in memory (see `iter_custom_table_pages`).
+    @return: A generator of records (dicts), in table order.
+    """
+    return paging.iter_records(iter_custom_table_pages(table_name, page_size, concurrency, max_buffered_pages))
+
+
+def stream_custom_table_records(table_name: str, pagenum: int = -1, pagesize: int = -1, fields: dict = None):
+    """
+    Retrieves a whole custom table (CST) in a single request and yields its records while the response is still arriving.
+
+    The body is parsed incrementally, so only the record being processed is held in memory.
+
+    @param table_name: The name of the custom table to query.
+    @param pagenum: The page number (`options.pagenum`, default `-1` = the whole table).
+    @param pagesize: The number of records per page (`options.pagesize`, default `-1` = the whole table).
+    @param fields: Optional dict that receives the other top-level response fields (e.g. `totalcount`) once all records are read.
+    @return: A generator of records (dicts).
+
+    Raises:
+    - `requests.RequestException` if the request fails (the error is logged first).
+    - `json.JSONDecodeError` if the response is not valid JSON.
+    """
+    utils.setup_logging()
+    client = http_client.get_client()
+    url = client.url("/opt/api/v1/datamartservice/datamarts/cst")
+    payload = {"tableName": table_name, "options": {"pagenum": pagenum, "pagesize": pagesize}}
+    what = f"custom table {table_name}" if pagesize < 0 else f"custom table {table_name} page {pagenum}"
+    logging.info(f"🔹 Streaming POST Request URL: {url}")
+
+    try:
+        response = client.post(url, data=json.dumps(payload), idempotent=True, stream=True)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logging.error(f"❌ {what} request failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        raise
+    if response.status_code == 204:
+        logging.info("⚠️ No content in response (204 No Content).")
+        return
+
+    count = 0
+    for record in http_client.iter_json_items(response, "data", fields):
+        count += 1
+        yield record
+    logging.info(f"✅ Streamed {count} records from {what}")
+
+
+def get_custom_table(table_name: str, page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1):
+    """
+    Retrieves a whole custom table into a column-backed `RecordTable` instead of a list of dicts.
+
+    @param table_name: The name of the custom table to query.
+    @param page_size: The number of records per page.
+    @param concurrency: Pages downloaded concurrently (see `iter_custom_table_pages`).
+    @return: A `RecordTable` (use `.to_dicts()` for the classic list of dicts).
+
+    Raises:
+    - `requests.RequestException` if a page cannot be retrieved (the error is logged first).
+    """
+    table = record_table.RecordTable.from_records(iter_custom_table_records(table_name, page_size, concurrency))
+    logging.info(f"✅ Custom table {table_name}: {table}, ~{table.nbytes()} bytes of column data")
+    return table
@@ -9,16 +9,26 @@ import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
+import API.datamart.record_table as record_table
+import API.datamart.cst_cache as cst_cache
 
-def post_cst_query(cst_query: str):
+def post_cst_query(cst_query: str, refresh: bool = False, ttl: float = None):
     """
     Sends a POST request using a CST query to retrieve DataMart data.
 
+    Results are cached on disk by normalized SQL (see `cst_cache`): the same query
+    re-issued within its TTL is served locally without calling the server.
+
     @param cst_query: The CST (Capacity Scripting Tool) query to execute.
+    @param refresh: If `True`, skips the cache lookup and re-executes the query (the cache is updated).
+    @param ttl: Validity of this result in the cache, in seconds (default `cst_cache.ttl_sec`).
 
     Requirements:
     - `config.json` must contain:
         - `auth.BearerToken`: The authentication token.
+    - `config.json` may contain `cst_cache` (`enabled`, `ttl_sec`, `max_bytes`).
     - Logging is configured via `utils.setup_logging()`.
     - API response is saved in `logs/response/`.
 
@@ -26,26 +36,27 @@ def post_cst_query(cst_query: str):
     - Logs and exits if `cst_query` or `BearerToken` is missing.
     - Logs detailed information about the request, response, or errors.
     """
-    config = utils.load_config()
-    credentials = utils.load_credentials()
     utils.setup_logging()
+    client = http_client.get_client()
 
     if not cst_query:
         logging.error("❌ CST query not provided.")
         print("❌ POST failed (check log)")
         return
 
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not refresh:
+        cached = cst_cache.lookup(cst_query)
+        if cached is not None:
+            logging.info(f"💾 CST cache hit: {cst_cache.normalize_sql(cst_query)[:200]}")
+            print("✅ POST successful (cached)")
+            return cached
+
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ POST failed (check log)")
         return
 
-    url = f"{credentials['base_url']}/opt/api/v1/datamartservice/datamarts/cst"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url("/opt/api/v1/datamartservice/datamarts/cst")
 
     payload = {
         "query": cst_query,
@@ -65,7 +76,7 @@ def post_cst_query(cst_query: str):
         return
 
     try:
-        response = requests.post(url, headers=headers, data=payload_json)
+        response = client.post(url, data=payload_json, idempotent=True)
         response.raise_for_status()
 
         logging.info("✅ POST request successfully sent for CST query")
@@ -77,12 +88,8 @@ def post_cst_query(cst_query: str):
             return None
 
         response_data = response.json()
-        formatted_json = json.dumps(response_data, indent=4)
-        logging.info(f"✅ Response Body:\n{formatted_json}")
-
-        json_path = utils.get_response_json_path("postCstQuery", "datamart_cst_result")
-        with open(json_path, 'w') as f:
-            json.dump(response_data, f, indent=4)
+        formatted_json = response_capture.capture_response("postCstQuery", "datamart_cst_result", response_data)
+        cst_cache.store(cst_query, formatted_json, ttl)
 
         print("✅ POST successful")
         return formatted_json
@@ -98,4 +105,63 @@ def post_cst_query(cst_query: str):
 
     except requests.RequestException as e:
         logging.error(f"❌ Network/API request failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
-        print("❌ POST failed (check log)")
\ No newline at end of file
+        print("❌ POST failed (check log)")
+
+
+def stream_cst_query_records(cst_query: str, pagenum: int = -1, pagesize: int = -1, fields: dict = None):
+    """
+    Executes a CST query and yields the result records while the response is still arriving.
+
+    The body is parsed incrementally, so only the record being processed is held in memory.
+
+    @param cst_query: The CST (Capacity Scripting Tool) query to execute.
+    @param pagenum: The page number (`options.pagenum`, default `-1` = the whole result).
+    @param pagesize: The number of records per page (`options.pagesize`, default `-1` = the whole result).
+    @param fields: Optional dict that receives the other top-level response fields (e.g. `totalcount`) once all records are read.
+    @return: A generator of records (dicts).
+
+    Raises:
+    - `requests.RequestException` if the request fails (the error is logged first).
+    - `json.JSONDecodeError` if the response is not valid JSON.
+    """
+    utils.setup_logging()
+    client = http_client.get_client()
+    url = client.url("/opt/api/v1/datamartservice/datamarts/cst")
+    payload = {"query": cst_query, "options": {"pagenum": pagenum, "pagesize": pagesize}}
+    what = "CST query" if pagesize < 0 else f"CST query page {pagenum}"
+    logging.info(f"🔹 Streaming POST Request URL: {url}")
+
+    try:
+        response = client.post(url, data=json.dumps(payload), idempotent=True, stream=True)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logging.error(f"❌ {what} request failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        raise
+    if response.status_code == 204:
+        logging.info("⚠️ No content in response (204 No Content).")
+        return
+
+    count = 0
+    for record in http_client.iter_json_items(response, "data", fields):
+        count += 1
+        yield record
+    logging.info(f"✅ Streamed {count} records from {what}")
+
+
+def get_cst_query_table(cst_query: str):
+    """
+    Executes a CST query and collects the result into a column-backed `RecordTable`.
+
+    The response is parsed incrementally and each record is folded into the columns
+    as soon as it is decoded, so the full list of dicts is never built.
+
+    @param cst_query: The CST (Capacity Scripting Tool) query to execute.
+    @return: A `RecordTable` (use `.to_dicts()` for the classic list of dicts).
+
+    Raises:
+    - `requests.RequestException` if the request fails (the error is logged first).
+    - `json.JSONDecodeError` if the response is not valid JSON.
+    """
+    table = record_table.RecordTable.from_records(stream_cst_query_records(cst_query))
+    logging.info(f"✅ CST query: {table}, ~{table.nbytes()} bytes of column data")
+    return table
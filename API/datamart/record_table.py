@@ -0,0 +1,217 @@
+import sys
+from array import array
+from collections.abc import Mapping
+
+# Tipi di colonna: array tipizzati per numeri e booleani, liste di stringhe internate per il testo
+_INT = "q"
+_FLOAT = "d"
+_BOOL = "b"
+_STR = "str"
+_OBJ = "obj"
+
+
+def _kind(value):
+    if isinstance(value, bool):
+        return _BOOL
+    if isinstance(value, int):
+        return _INT if -2 ** 63 <= value < 2 ** 63 else _OBJ
+    if isinstance(value, float):
+        return _FLOAT
+    if isinstance(value, str):
+        return _STR
+    return _OBJ
+
+
+class _Column:
+    """
+    Valori di una colonna. Finché i valori sono omogenei sono tenuti in un `array`
+    (int64, float64, int8 per i booleani) con una maschera dei null; le stringhe sono
+    internate, così i valori ripetuti (nomi di entità, metriche...) esistono una volta sola.
+    Un valore di tipo diverso promuove la colonna (int → float, altrimenti lista generica).
+    """
+
+    __slots__ = ("kind", "values", "nulls")
+
+    def __init__(self, length: int = 0):
+        self.kind = None
+        self.values = [None] * length
+        self.nulls = None
+
+    def _convert(self, kind):
+        old = self.values if self.nulls is None else \
+            [None if null else value for value, null in zip(self.values, self.nulls)]
+        if self.kind == _BOOL:
+            old = [None if value is None else bool(value) for value in old]
+        self.kind = kind
+        if kind in (_INT, _FLOAT, _BOOL):
+            self.nulls = bytearray(1 if value is None else 0 for value in old)
+            zero = 0.0 if kind == _FLOAT else 0
+            self.values = array(kind, (zero if value is None else value for value in old))
+        else:
+            self.nulls = None
+            self.values = list(old)
+
+    def append(self, value):
+        if value is None:
+            if self.nulls is None:
+                self.values.append(None)
+            else:
+                self.values.append(0)
+                self.nulls.append(1)
+            return
+
+        kind = _kind(value)
+        if kind != self.kind:
+            if self.kind is None:
+                self._convert(kind)
+            elif self.kind == _INT and kind == _FLOAT:
+                self._convert(_FLOAT)
+            elif self.kind == _FLOAT and kind == _INT:
+                value = float(value)
+                kind = _FLOAT
+            elif self.kind != _OBJ:
+                self._convert(_OBJ)
+        if self.kind == _STR:
+            self.values.append(sys.intern(value))
+        elif self.nulls is None:
+            self.values.append(value)
+        else:
+            self.values.append(value)
+            self.nulls.append(0)
+
+    def get(self, index: int):
+        if self.nulls is not None:
+            if self.nulls[index]:
+                return None
+            value = self.values[index]
+            return bool(value) if self.kind == _BOOL else value
+        return self.values[index]
+
+    def to_list(self) -> list:
+        return [self.get(index) for index in range(len(self.values))]
+
+    def nbytes(self) -> int:
+        if isinstance(self.values, array):
+            return self.values.itemsize * len(self.values) + len(self.nulls)
+        return 8 * len(self.values)
+
+
+class RowView(Mapping):
+    """
+    Vista di sola lettura su una riga di un `RecordTable`, utilizzabile come un dict
+    (`row["TS"]`, `row.get(...)`, `row.keys()`, `csv.DictWriter.writerow(row)`).
+    I valori vengono letti dalle colonne solo quando richiesti.
+    """
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table, index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, name):
+        column = self._table._columns.get(name)
+        if column is None:
+            raise KeyError(name)
+        return column.get(self._index)
+
+    def __iter__(self):
+        return iter(self._table._columns)
+
+    def __len__(self):
+        return len(self._table._columns)
+
+    def to_dict(self) -> dict:
+        return {name: column.get(self._index) for name, column in self._table._columns.items()}
+
+    def __repr__(self):
+        return f"RowView({self.to_dict()!r})"
+
+
+class RecordTable:
+    """
+    Contenitore colonnare per i record di datamart e query CST.
+
+    Al posto di una lista di dict (un dict e un riferimento al nome di colonna per ogni
+    valore) tiene un array tipizzato per colonna, con le stringhe internate. Le righe sono
+    accessibili come viste pigre (`RowView`) compatibili con il codice che si aspetta dei dict;
+    `to_dicts()` restituisce la lista di dict classica quando serve (es. `json.dumps`).
+    """
+
+    def __init__(self, columns: list = None):
+        self._columns = {}
+        self._length = 0
+        for name in columns or []:
+            self._columns[name] = _Column()
+
+    @classmethod
+    def from_records(cls, records, columns: list = None):
+        """
+        Costruisce la tabella da un iterabile di record (dict), consumandolo una sola volta.
+
+        @param records: Iterabile di record, es. `iter_datamart_records(...)`.
+        @param columns: Ordine delle colonne (opzionale; le colonne nuove vengono aggiunte in coda).
+        """
+        table = cls(columns)
+        table.extend(records)
+        return table
+
+    @property
+    def columns(self) -> list:
+        return list(self._columns)
+
+    def append(self, record):
+        for name in record:
+            if name not in self._columns:
+                self._columns[name] = _Column(self._length)
+        for name, column in self._columns.items():
+            column.append(record.get(name))
+        self._length += 1
+
+    def extend(self, records):
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [RowView(self, i) for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("RecordTable index out of range")
+        return RowView(self, index)
+
+    def __iter__(self):
+        for index in range(self._length):
+            yield RowView(self, index)
+
+    def column(self, name: str) -> list:
+        """
+        Valori di una colonna (con `None` per i valori mancanti).
+        """
+        return self._columns[name].to_list()
+
+    def column_type(self, name: str) -> str:
+        """
+        Tipo di memorizzazione della colonna: `int`, `float`, `bool`, `str`, `object` (o `None` se tutta nulla).
+        """
+        kind = self._columns[name].kind
+        return {_INT: "int", _FLOAT: "float", _BOOL: "bool", _STR: "str", _OBJ: "object"}.get(kind)
+
+    def to_dicts(self) -> list:
+        """
+        Adattatore verso il formato classico: lista di dict, una per riga.
+        """
+        return [row.to_dict() for row in self]
+
+    def nbytes(self) -> int:
+        """
+        Stima dei byte occupati dai dati delle colonne (esclusi gli oggetti stringa condivisi).
+        """
+        return sum(column.nbytes() for column in self._columns.values())
+
+    def __repr__(self):
+        return f"RecordTable({self._length} rows, {len(self._columns)} columns)"
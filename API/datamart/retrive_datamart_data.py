@@ -9,6 +9,10 @@ import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
+import API.datamart.paging as paging
+import API.datamart.record_table as record_table
 
 def post_datamart_data(datamart_id: str = None):
     """
@@ -30,8 +34,8 @@ def post_datamart_data(datamart_id: str = None):
 
     # Load configuration and setup logging
     config = utils.load_config()
-    credentials = utils.load_credentials()
     utils.setup_logging()
+    client = http_client.get_client()
 
     # Retrieve datamart_id if not passed
     if datamart_id is None:
@@ -42,19 +46,14 @@ def post_datamart_data(datamart_id: str = None):
             return
 
     # Retrieve token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ POST failed (check log)")
         return
     
-    # Build URL and headers
+    # Build URL
     
-    url = f"{credentials["base_url"]}/opt/api/v1/datamartservice/datamarts/{datamart_id}/data"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url(f"/opt/api/v1/datamartservice/datamarts/{datamart_id}/data")
 
     # Payload
     payload = {
@@ -74,32 +73,29 @@ def post_datamart_data(datamart_id: str = None):
         return
 
     try:
-        response = requests.post(url, headers=headers, data=payload_json)
+        response = client.post(url, data=payload_json, idempotent=True, stream=True)
         response.raise_for_status()
 
         logging.info(f"✅ POST request successfully sent for DataMart ID: {datamart_id}")
         logging.info(f"✅ Response Code: {response.status_code}")
 
-        if response.status_code == 204 or not response.text.strip():
+        # Body decompresso in streaming, senza passare da `response.text`
+        try:
+            response_data = http_client.read_json(response) if response.status_code != 204 else None
+        except json.JSONDecodeError:
+            logging.warning("⚠️ Response was not valid JSON, skipping saving response.")
+            print("❌ POST failed (check log)")
+            return None
+        if response_data is None:
             logging.info("⚠️ No content in response (204 No Content), skipping saving response.")
             print("✅ POST successful")
             return None
 
         # Process and save JSON response
-        try:
-            response_data = response.json()
-            formatted_json = json.dumps(response_data, indent=4)
-            logging.info(f"✅ Response Body:\n{formatted_json}")
-
-            json_path = utils.get_response_json_path("postDatamartData", f"datamart_{datamart_id}")
-            with open(json_path, 'w') as f:
-                json.dump(response_data, f, indent=4)
+        formatted_json = response_capture.capture_response("postDatamartData", f"datamart_{datamart_id}", response_data)
 
-            print("✅ POST successful")
-            return formatted_json
-
-        except json.JSONDecodeError:
-            logging.warning("⚠️ Response was not valid JSON, skipping saving response.")
+        print("✅ POST successful")
+        return formatted_json
 
     except requests.HTTPError as http_err:
         error_message = f"❌ API Request Error: {http_err}"
@@ -115,3 +111,146 @@ def post_datamart_data(datamart_id: str = None):
         error_message = f"❌ Network/API request failed: {e}"
         logging.error(f"{error_message}\n🔹 Full Traceback:\n{traceback.format_exc()}")
         print("❌ POST failed (check log)")
+
+
+def fetch_datamart_page(datamart_id: str, pagenum: int, pagesize: int, filters: list = None, progress=None):
+    """
+    Sends a POST request to retrieve a single page of data from a DataMart.
+
+    @param datamart_id: The ID of the DataMart to query.
+    @param pagenum: The page number (`options.pagenum`).
+    @param pagesize: The number of records per page (`options.pagesize`).
+    @param filters: Optional row filters sent as `filters` (e.g. `[{"name": "TS", "operator": ">=", "value": "..."}]`).
+    @param progress: Optional `TransferProgress` updated with the rows and bytes of the page.
+    @return: The decoded page (`{"data": [...], ...}`), or `None` if the server returned no content.
+
+    Raises:
+    - `requests.RequestException` if the request fails (after the client's retries).
+    """
+    client = http_client.get_client()
+    url = client.url(f"/opt/api/v1/datamartservice/datamarts/{datamart_id}/data")
+    payload = {
+        "options": {
+            "pagenum": pagenum,
+            "pagesize": pagesize
+        }
+    }
+    if filters:
+        payload["filters"] = filters
+
+    response = client.post(url, data=json.dumps(payload), idempotent=True, stream=True)
+    response.raise_for_status()
+    if response.status_code == 204:
+        return None
+    page = http_client.read_json(response)
+    if progress is not None:
+        progress.update(len(paging.page_records(page)), getattr(response, "decoded_bytes", 0), paging.total_count(page))
+    return page
+
+
+def iter_datamart_pages(datamart_id: str, page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1,
+                        max_buffered_pages: int = None, filters: list = None, progress=None):
+    """
+    Iterates over the pages of a DataMart.
+
+    @param datamart_id: The ID of the DataMart to query.
+    @param page_size: The number of records per page.
+    @param concurrency: Pages downloaded concurrently. With `1` pages are requested one at a time;
+                        otherwise the first page gives the total count and the rest are fetched in parallel.
+    @param max_buffered_pages: Upper bound on pages in flight or waiting to be consumed (default `2 * concurrency`).
+    @param filters: Optional row filters (see `fetch_datamart_page`).
+    @param progress: Optional `TransferProgress` (see `fetch_datamart_page`).
+    @return: A generator of pages (dicts with a `data` list), always in page order.
+
+    Raises:
+    - `requests.RequestException` if a page cannot be retrieved (the error is logged first).
+    """
+    utils.setup_logging()
+    logging.info(f"🔹 Paged retrieval of DataMart {datamart_id} (page size: {page_size}, concurrency: {concurrency})")
+
+    def fetch_page(pagenum, pagesize):
+        return fetch_datamart_page(datamart_id, pagenum, pagesize, filters, progress)
+
+    try:
+        if concurrency > 1:
+            yield from paging.iter_pages_parallel(fetch_page, page_size, concurrency, max_buffered_pages)
+        else:
+            yield from paging.iter_pages(fetch_page, page_size)
+    except requests.RequestException as e:
+        logging.error(f"❌ Paged retrieval of DataMart {datamart_id} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        raise
+
+
+def iter_datamart_records(datamart_id: str, page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1,
+                          max_buffered_pages: int = None, filters: list = None, progress=None):
+    """
+    Iterates over the records of a DataMart page by page, keeping a bounded number of pages in memory.
+
+    @param datamart_id: The ID of the DataMart to query.
+    @param page_size: The number of records per page.
+    @param concurrency: Pages downloaded concurrently (see `iter_datamart_pages`).
+    @param max_buffered_pages: Upper bound on pages held in memory (see `iter_datamart_pages`).
+    @param filters: Optional row filters (see `fetch_datamart_page`).
+    @param progress: Optional `TransferProgress` (see `fetch_datamart_page`).
+    @return: A generator of records (dicts), in DataMart order.
+    """
+    return paging.iter_records(iter_datamart_pages(datamart_id, page_size, concurrency, max_buffered_pages, filters,
+                                                   progress))
+
+
+def stream_datamart_records(datamart_id: str):
+    """
+    Retrieves a whole DataMart in a single request and yields its records while the response is still arriving.
+
+    The body is parsed incrementally, so only the record being processed is held in memory
+    (instead of the full object tree built by `response.json()`).
+
+    @param datamart_id: The ID of the DataMart to query.
+    @return: A generator of records (dicts).
+
+    Raises:
+    - `requests.RequestException` if the request fails (the error is logged first).
+    - `json.JSONDecodeError` if the response is not valid JSON.
+    """
+    utils.setup_logging()
+    client = http_client.get_client()
+    url = client.url(f"/opt/api/v1/datamartservice/datamarts/{datamart_id}/data")
+    payload = {"options": {"pagenum": -1, "pagesize": -1}}
+    what = f"DataMart {datamart_id}"
+    logging.info(f"🔹 Streaming POST Request URL: {url}")
+
+    try:
+        response = client.post(url, data=json.dumps(payload), idempotent=True, stream=True)
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logging.error(f"❌ {what} request failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        raise
+    if response.status_code == 204:
+        logging.info("⚠️ No content in response (204 No Content).")
+        return
+
+    count = 0
+    for record in http_client.iter_json_items(response, "data"):
+        count += 1
+        yield record
+    logging.info(f"✅ Streamed {count} records from {what}")
+
+
+def get_datamart_table(datamart_id: str, page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1):
+    """
+    Retrieves a whole DataMart into a column-backed `RecordTable` instead of a list of dicts.
+
+    Records are folded into the columns as pages arrive, so each page's dicts can be
+    released right away; rows remain accessible as dict-like views.
+
+    @param datamart_id: The ID of the DataMart to query.
+    @param page_size: The number of records per page.
+    @param concurrency: Pages downloaded concurrently (see `iter_datamart_pages`).
+    @return: A `RecordTable` (use `.to_dicts()` for the classic list of dicts).
+
+    Raises:
+    - `requests.RequestException` if a page cannot be retrieved (the error is logged first).
+    """
+    table = record_table.RecordTable.from_records(iter_datamart_records(datamart_id, page_size, concurrency))
+    logging.info(f"✅ DataMart {datamart_id}: {table}, ~{table.nbytes()} bytes of column data")
+    return table
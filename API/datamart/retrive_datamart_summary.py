@@ -9,50 +9,42 @@ import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
 
-def get_datamart_summary(datamart_id: str):
+def get_datamart_summary(datamart_id: str, refresh: bool = False):
     """
     GET /opt/api/v1/datamartservice/datamarts/{erid}/summary
     Restituisce la definizione (metadati) del DataMart.
+
+    @param refresh: Se `True`, ignora la cache HTTP locale e riscarica la risposta.
     """
-    # Carica configurazione e credenziali
+    # Carica configurazione, logging e client HTTP condiviso
     config      = utils.load_config()
-    creds       = utils.load_credentials()
-    # Imposta il logging
     utils.setup_logging()
+    client      = http_client.get_client()
 
     logging.info(f"🔹 Starting get_datamart_summary for ERID: {datamart_id}")
 
-    token = config.get("auth", {}).get("BearerToken")
-    if not token:
+    if not client.token:
         logging.error("❌ BearerToken mancante in config.json")
         print("❌ GET summary failed (check log)")
         return None
 
-    url = f"{creds['base_url'].rstrip('/')}/opt/api/v1/datamartservice/datamarts/{datamart_id}/summary"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Accept":        "application/json"
-    }
+    url = client.url(f"/opt/api/v1/datamartservice/datamarts/{datamart_id}/summary")
 
     logging.info(f"🔹 GET Request URL: {url}")
     try:
-        response = requests.get(url, headers=headers, timeout=config.get("timeout", 30))
+        response = client.get(url, timeout=config.get("timeout", 30), refresh=refresh)
         logging.info(f"🔹 Response Code: {response.status_code}")
         response.raise_for_status()
 
-        summary = response.json()
-        logging.info("✅ Summary received:")
-        logging.info(json.dumps(summary, indent=2))
+        summary = http_client.parse_json(response)
 
-        # Salva il JSON di risposta
-        path = utils.get_response_json_path("getDatamartSummary", f"datamart_{datamart_id}_summary")
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(summary, f, indent=2)
-        logging.info(f"✅ Summary saved to: {path}")
+        # Riepilogo nel log e salvataggio del JSON di risposta
+        response_capture.capture_response("getDatamartSummary", f"datamart_{datamart_id}_summary", summary)
 
-        print(f"✅ GET summary successful: {path}")
+        print("✅ GET summary successful")
         return summary
 
     except requests.HTTPError as he:
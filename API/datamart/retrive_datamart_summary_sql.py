@@ -10,6 +10,8 @@ import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
 
 def post_datamart_summary_properties(byerid: str = None):
     """
@@ -19,10 +21,10 @@ def post_datamart_summary_properties(byerid: str = None):
     @param byerid: ID del DataMart SQL da cui generare il summary.
                    Se non fornito, prova a leggerlo da `config.json` sotto `datamart.byerid`.
     """
-    # Carica config e credenziali, setup logging
+    # Carica config, setup logging e client HTTP condiviso
     config      = utils.load_config()
-    credentials = utils.load_credentials()
     utils.setup_logging()
+    client      = http_client.get_client()
 
     logging.info(f"🔹 Starting post_datamart_summary_properties for SQL ERID: {byerid}")
 
@@ -35,19 +37,13 @@ def post_datamart_summary_properties(byerid: str = None):
             return None
 
     # Recupera token
-    token = config.get("auth", {}).get("BearerToken")
-    if not token:
+    if not client.token:
         logging.error("❌ BearerToken mancante in config.json. Effettua prima il login.")
         print("❌ POST summary properties failed (check log)")
         return None
 
-    # Costruisci URL, headers e payload
-    url = f"{credentials['base_url'].rstrip('/')}/opt/api/v1/datamartservice/datamarts/summary"
-    headers = {
-        "Content-Type":  "application/json",
-        "Accept":        "application/json",
-        "Authorization": f"Bearer {token}"
-    }
+    # Costruisci URL e payload
+    url = client.url("/opt/api/v1/datamartservice/datamarts/summary")
 
     # Esempio di payload di summary: include ora il campo "name" obbligatorio
     payload = {
@@ -62,26 +58,17 @@ def post_datamart_summary_properties(byerid: str = None):
 
     try:
         body = json.dumps(payload)
-        response = requests.post(url, headers=headers, data=body, timeout=config.get("timeout", 30))
+        response = client.post(url, data=body, timeout=config.get("timeout", 30))
         logging.info(f"🔹 Response Code: {response.status_code}")
         response.raise_for_status()
 
         data = response.json()
         props = data.get("summary_datamart", data)
-        logging.info("✅ Summary properties received:")
-        logging.info(json.dumps(props, indent=2))
-
-        # Salva la risposta
-        path = utils.get_response_json_path(
-            "postDatamartSummaryProperties",
-            f"sql_{byerid}_summary_props"
-        )
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4)
-        logging.info(f"✅ Summary properties salvate in: {path}")
-
-        print(f"✅ POST summary properties successful: {path}")
+
+        # Riepilogo nel log e salvataggio della risposta
+        response_capture.capture_response("postDatamartSummaryProperties", f"sql_{byerid}_summary_props", data)
+
+        print("✅ POST summary properties successful")
         return props
 
     except requests.HTTPError as he:
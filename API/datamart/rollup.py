@@ -0,0 +1,231 @@
+import os
+import sys
+import math
+import warnings
+from datetime import datetime, timezone
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import API.datamart.datamart_schema as datamart_schema
+
+try:
+    import numpy as np
+except ImportError:  # NumPy è opzionale: senza, il calcolo avviene in Python puro
+    np = None
+
+# Ampiezza dei periodi di aggregazione (secondi)
+PERIODS = {"hour": 3600, "day": 86400}
+DEFAULT_PERIOD = "hour"
+DEFAULT_PERCENTILE = 95
+
+# Colonne dei risultati, oltre a quelle dell'entità
+TS_COLUMN = "TS"
+DURATION_COLUMN = "DURATION"
+METRIC_COLUMN = "METRIC"
+SAMPLES_COLUMN = "SAMPLES"
+AVG_COLUMN = "AVG"
+MAX_COLUMN = "MAX"
+
+
+def percentile_column(percentile: float) -> str:
+    """
+    Nome della colonna del percentile, es. `P95`.
+    """
+    return f"P{percentile:g}"
+
+
+def result_columns(entity_columns: list, percentile: float = DEFAULT_PERCENTILE) -> list:
+    """
+    Colonne tipizzate dei risultati (vedi `datamart_schema.parse_columns`), per CSV e SQLite.
+    """
+    columns = [{"name": name, "type": datamart_schema.STRING, "source_type": None} for name in entity_columns]
+    columns += [
+        {"name": TS_COLUMN, "type": datamart_schema.TIMESTAMP, "source_type": None},
+        {"name": DURATION_COLUMN, "type": datamart_schema.INTEGER, "source_type": None},
+        {"name": METRIC_COLUMN, "type": datamart_schema.STRING, "source_type": None},
+        {"name": SAMPLES_COLUMN, "type": datamart_schema.INTEGER, "source_type": None},
+        {"name": AVG_COLUMN, "type": datamart_schema.FLOAT, "source_type": None},
+        {"name": MAX_COLUMN, "type": datamart_schema.FLOAT, "source_type": None},
+        {"name": percentile_column(percentile), "type": datamart_schema.FLOAT, "source_type": None},
+    ]
+    return columns
+
+
+def _column_values(data, name: str) -> list:
+    if isinstance(data, dict):
+        return list(data[name])
+    if hasattr(data, "column"):  # RecordTable
+        return data.column(name)
+    return [record.get(name) for record in data]
+
+
+def _epoch(value):
+    parsed = datamart_schema.to_datetime(value)
+    return parsed.timestamp() if parsed is not None else None
+
+
+def _number(value):
+    value = datamart_schema.convert_value(value, datamart_schema.FLOAT, report=False)
+    return None if value is None or math.isnan(value) else value
+
+
+def _label(value) -> str:
+    return "" if value is None else str(value)
+
+
+def _format_ts(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# -- implementazione vettoriale (NumPy) ------------------------------------
+
+def _np_epoch(values: list):
+    sample = next((value for value in values if value is not None and value != ""), None)
+    if isinstance(sample, str):
+        # Testo ISO senza fuso (es. le tabelle `datamart_<id>`): conversione vettoriale in un colpo solo
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            try:
+                stamps = np.array([value or None for value in values], dtype="datetime64[ms]")
+                return np.where(np.isnat(stamps), np.nan, stamps.astype("int64") / 1000.0)
+            except (ValueError, TypeError, Warning):
+                pass
+    elif isinstance(sample, (int, float)) and not isinstance(sample, bool):
+        try:
+            seconds = np.array(values, dtype=float)
+            return np.where(np.abs(seconds) >= 1e11, seconds / 1000.0, seconds)
+        except (ValueError, TypeError):
+            pass
+    return np.array([_epoch(value) for value in values], dtype=float)
+
+
+def _np_numbers(values: list):
+    try:
+        return np.array(values, dtype=float)
+    except (ValueError, TypeError):
+        return np.array([_number(value) for value in values], dtype=float)
+
+
+def _np_codes(values: list):
+    labels, codes = np.unique(np.array([_label(value) for value in values], dtype=str), return_inverse=True)
+    return labels, codes.reshape(-1).astype(np.int64)
+
+
+def _np_rollup(data, timestamp_column, entity_columns, value_columns, step, percentile):
+    seconds = _np_epoch(_column_values(data, timestamp_column))
+    has_ts = ~np.isnan(seconds)
+    buckets = np.zeros(len(seconds), dtype=np.int64)
+    buckets[has_ts] = np.floor(seconds[has_ts] / step).astype(np.int64)
+    first_bucket = int(buckets[has_ts].min()) if has_ts.any() else 0
+    span = int(buckets[has_ts].max()) - first_bucket + 1 if has_ts.any() else 1
+
+    # Chiave di gruppo intera: (codici delle entità in base mista) * span + indice del periodo
+    entity_labels, radixes = [], []
+    entity_key = np.zeros(len(seconds), dtype=np.int64)
+    for name in entity_columns:
+        labels, codes = _np_codes(_column_values(data, name))
+        entity_key = entity_key * len(labels) + codes
+        entity_labels.append(labels)
+        radixes.append(len(labels))
+    keys = entity_key * span + (buckets - first_bucket)
+
+    results = []
+    for metric in value_columns:
+        values = _np_numbers(_column_values(data, metric))
+        valid = has_ts & ~np.isnan(values)
+        if not valid.any():
+            continue
+        group_keys, group_values = keys[valid], values[valid]
+
+        # Ordinando per (chiave, valore) ogni gruppo è un tratto contiguo già ordinato:
+        # il massimo è l'ultimo elemento e il percentile un'interpolazione tra due posizioni
+        order = np.lexsort((group_values, group_keys))
+        group_keys, group_values = group_keys[order], group_values[order]
+        starts = np.flatnonzero(np.r_[True, group_keys[1:] != group_keys[:-1]])
+        counts = np.diff(np.r_[starts, len(group_keys)])
+        sums = np.add.reduceat(group_values, starts)
+        maxima = group_values[starts + counts - 1]
+        position = (counts - 1) * (percentile / 100.0)
+        lower = np.floor(position).astype(np.int64)
+        upper = np.ceil(position).astype(np.int64)
+        low_values, high_values = group_values[starts + lower], group_values[starts + upper]
+        percentiles = low_values + (high_values - low_values) * (position - lower)
+
+        entity_part, bucket_part = np.divmod(group_keys[starts], span)
+        entity_values = []
+        for labels, radix in zip(reversed(entity_labels), reversed(radixes)):
+            entity_part, code = np.divmod(entity_part, radix)
+            entity_values.insert(0, labels[code].tolist())
+
+        entities = zip(*entity_values) if entity_values else [()] * len(starts)
+        results.extend(zip(entities, (bucket_part + first_bucket).tolist(), [metric] * len(starts), counts.tolist(),
+                           (sums / counts).tolist(), maxima.tolist(), percentiles.tolist()))
+    return results
+
+
+# -- implementazione in Python puro ----------------------------------------
+
+def _py_rollup(data, timestamp_column, entity_columns, value_columns, step, percentile):
+    buckets = [None if seconds is None else math.floor(seconds / step)
+               for seconds in map(_epoch, _column_values(data, timestamp_column))]
+    entities = list(zip(*[[_label(value) for value in _column_values(data, name)] for name in entity_columns])) \
+        if entity_columns else [()] * len(buckets)
+
+    results = []
+    for metric in value_columns:
+        groups = {}
+        for entity, bucket, value in zip(entities, buckets, map(_number, _column_values(data, metric))):
+            if bucket is not None and value is not None:
+                groups.setdefault((entity, bucket), []).append(value)
+        for (entity, bucket), values in sorted(groups.items()):
+            values.sort()
+            position = (len(values) - 1) * (percentile / 100.0)
+            lower, upper = math.floor(position), math.ceil(position)
+            p = values[lower] + (values[upper] - values[lower]) * (position - lower)
+            results.append((entity, bucket, metric, len(values), sum(values) / len(values), values[-1], p))
+    return results
+
+
+def rollup(data, timestamp_column: str, entity_columns: list, value_columns: list,
+           period: str = DEFAULT_PERIOD, percentile: float = DEFAULT_PERCENTILE) -> list:
+    """
+    Aggrega localmente i campioni di un datamart per entità e per periodo (ora o giorno).
+
+    Per ogni entità, periodo e metrica calcola numero di campioni, media, massimo e
+    percentile (interpolazione lineare, come `numpy.percentile`). Con NumPy installato il
+    raggruppamento è vettoriale (chiave intera per entità+periodo, un ordinamento per metrica,
+    riduzioni per segmenti); altrimenti si usa l'implementazione in Python puro, con gli stessi risultati.
+
+    @param data: Record già scaricati: `RecordTable`, lista di dict, oppure dict `{colonna: valori}`.
+    @param timestamp_column: Colonna del timestamp (epoch s/ms oppure ISO 8601).
+    @param entity_columns: Colonne che identificano l'entità (es. `["ENTNAME"]`; lista vuota = tutto il datamart).
+    @param value_columns: Colonne numeriche da aggregare.
+    @param period: `hour` oppure `day` (periodi UTC).
+    @param percentile: Percentile da calcolare (default 95).
+    @return: Lista di righe (dict) ordinate per entità, periodo e metrica: le colonne dell'entità
+             (come testo), `TS` (inizio del periodo), `DURATION`, `METRIC`, `SAMPLES`, `AVG`, `MAX`, `P<percentile>`.
+
+    Raises:
+    - ValueError: If `period` is not supported.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unsupported rollup period '{period}' (use one of: {', '.join(PERIODS)})")
+    step = PERIODS[period]
+    implementation = _np_rollup if np is not None else _py_rollup
+    groups = implementation(data, timestamp_column, list(entity_columns), list(value_columns), step, percentile)
+
+    metric_order = {metric: index for index, metric in enumerate(value_columns)}
+    groups.sort(key=lambda group: (group[0], group[1], metric_order[group[2]]))
+    p_column = percentile_column(percentile)
+    period_starts = {}
+    rows = []
+    for entity, bucket, metric, samples, average, maximum, p in groups:
+        ts = period_starts.get(bucket)
+        if ts is None:
+            ts = period_starts[bucket] = _format_ts(bucket * step)
+        row = dict(zip(entity_columns, entity))
+        row.update({TS_COLUMN: ts, DURATION_COLUMN: step, METRIC_COLUMN: metric,
+                    SAMPLES_COLUMN: samples, AVG_COLUMN: average, MAX_COLUMN: maximum, p_column: p})
+        rows.append(row)
+    return rows
@@ -9,14 +9,15 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
+import API.http_client as http_client
 
 # Funzione per ottenere le entità del dominio
-def get_subdomains(domain_id: str = None):
+def get_subdomains(domain_id: str = None, refresh: bool = False):
 
     # Load configuration and setup logging
     config = utils.load_config()
-    credentials = utils.load_credentials()
     utils.setup_logging()
+    client = http_client.get_client()
 
     # Retrieve domain_id if not passed
     if domain_id is None:
@@ -27,62 +28,51 @@ def get_subdomains(domain_id: str = None):
             return
 
     # Retrieve token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ GET failed (check log)")
         return
 
-    url = f"{credentials["base_url"]}/opt/api/v1/catalog/explore/domains/{domain_id}/tree"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url(f"/opt/api/v1/catalog/explore/domains/{domain_id}/tree")
     params = {
         "group": "all", # Sostituisci "all" con il valore appropriato per il tuo caso
         "depth": -1
     }
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = client.get(url, params=params, refresh=refresh)
         response.raise_for_status()
-        return response.json()
+        return http_client.parse_json(response)
     except requests.HTTPError as http_err:
         logging.error(f"❌ Errore HTTP: {http_err}")
         logging.error(f"🔹 Corpo della risposta: {response.text}")
         logging.error(f"🔹 Traceback completo:\n{traceback.format_exc()}")
-        exit(1)
+        print("❌ GET fallita (controlla il log)")
     except requests.RequestException as e:
         logging.error(f"❌ Errore nella richiesta: {e}")
         logging.error(f"🔹 Traceback completo:\n{traceback.format_exc()}")
-        exit(1)
+        print("❌ GET fallita (controlla il log)")
 
-def get_entity_tree(entity_id):
-    # Carica la configurazione e le credenziali
-    config = utils.load_config()
-    credentials = utils.load_credentials()
+def get_entity_tree(entity_id, refresh: bool = False):
+    # Imposta il logging e il client HTTP condiviso
     utils.setup_logging()
+    client = http_client.get_client()
 
     # Recupera il token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ Nessun Bearer Token trovato! Effettua il login utilizzando `POST_login.py`.")
         print("❌ GET fallita (controlla il log)")
         return
 
-    url = f"{credentials['base_url']}/opt/api/v1/catalog/explore/entities/{entity_id}/tree"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url(f"/opt/api/v1/catalog/explore/entities/{entity_id}/tree")
     params = {
         "group": "all",
         "depth": -1
     }
 
     try:
-        response = requests.get(url, headers=headers, params=params)
+        response = client.get(url, params=params, refresh=refresh)
         response.raise_for_status()
-        response_data = response.json()
+        response_data = http_client.parse_json(response)
         return response_data
     except requests.HTTPError as http_err:
         logging.error(f"❌ Errore HTTP: {http_err}")
@@ -95,23 +85,16 @@ def get_entity_tree(entity_id):
         print("❌ GET fallita (controlla il log)")
 
 def apply_tag_to_entities(entity_ids):
-    # Carica la configurazione e le credenziali
-    config = utils.load_config()
-    credentials = utils.load_credentials()
+    # Imposta il logging e il client HTTP condiviso
     utils.setup_logging()
+    client = http_client.get_client()
 
     # Recupera il token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ Nessun Bearer Token trovato! Effettua il login utilizzando `POST_login.py`.")
         print("❌ Operazione fallita (controlla il log)")
         return
 
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
-
     payload = [
         {
             "type": "Generic",
@@ -120,9 +103,9 @@ def apply_tag_to_entities(entity_ids):
     ]
 
     for entity_id in entity_ids:
-        url = f"{credentials['base_url']}/opt/api/v1/catalog/entities/{entity_id}/tags"
+        url = client.url(f"/opt/api/v1/catalog/entities/{entity_id}/tags")
         try:
-            response = requests.post(url, headers=headers, data=json.dumps(payload))
+            response = client.post(url, data=json.dumps(payload))
             response.raise_for_status()
             logging.info(f"✅ Tag 'Italy' applicato con successo all'entità {entity_id}")
             print(f"✅ Tag 'Italy' applicato all'entità {entity_id}")
@@ -4,12 +4,15 @@ import logging
 import json
 import traceback
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
 
 
-def get_all_etls():
+def get_all_etls(refresh: bool = False):
     """
     Retrieves a list of all ETLs from the API.
 
+    @param refresh: If `True`, bypasses the local HTTP cache and downloads the response again.
     @return: A list of ETL processes as dictionaries.
 
     Requirements:
@@ -24,40 +27,33 @@ def get_all_etls():
     """
 
     # ✅ Load Configuration & Setup Logging
-    config = utils.load_config()
     utils.setup_logging()
-    credentials = utils.load_credentials()
+    client = http_client.get_client()
     # ✅ Retrieve Bearer Token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ GET failed (check log)")
         return None
 
-    url = f"{credentials['base_url']}/opt/api/v1/backend/etls/"
-
-    headers = {'Authorization': f'Bearer {token}'}
+    url = client.url("/opt/api/v1/backend/etls/")
 
     # ✅ Log request details
     logging.info(f"🔹 GET Request URL: {url}")
-    #logging.info(f"🔹 GET Headers: {headers}")
 
     try:
-        response = requests.get(url, headers=headers)
+        response = client.get(url, refresh=refresh)
         response.raise_for_status()
 
         # ✅ Log full response
         logging.info("✅ GET request completed successfully!")
         logging.info(f"✅ Response Code: {response.status_code}")
-        logging.info(f"✅ Response Body:\n{response.text}")
 
-        # ✅ Save response JSON
-        json_path = utils.get_response_json_path("getEtl", "success")
-        with open(json_path, 'w') as f:
-            json.dump(response.json(), f, indent=4)
+        # ✅ Log summary and save response JSON
+        response_data = http_client.parse_json(response)
+        response_capture.capture_response("getEtl", "success", response_data)
 
         print("✅ GET successful")
-        return response.json()
+        return response_data
 
     except requests.HTTPError as http_err:
         error_message = f"❌ API Request Error: {http_err}"
@@ -3,6 +3,9 @@ import json
 import logging
 import traceback
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
+import DB.snapshot_store as snapshot_store
 
 
 def post_etl_configuration(erid: str = None):
@@ -28,7 +31,7 @@ def post_etl_configuration(erid: str = None):
     # ✅ Load Configuration & Setup Logging
     config = utils.load_config()
     utils.setup_logging()
-    credentials = utils.load_credentials()
+    client = http_client.get_client()
     # ✅ Retrieve ERID
     if erid is None:
         erid = config.get("etl", {}).get("erid", None)
@@ -38,8 +41,7 @@ def post_etl_configuration(erid: str = None):
             return
 
     # ✅ Retrieve Bearer Token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ POST failed (check log)")
         return
@@ -51,18 +53,12 @@ def post_etl_configuration(erid: str = None):
         print("❌ POST failed (check log)")
         return
 
-    url = f"{credentials['base_url']}/opt/api/v1/backend/etls/{erid}/configuration"
-
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url(f"/opt/api/v1/backend/etls/{erid}/configuration")
 
     # ✅ Construct payload and validate JSON
     try:
         payload = json.dumps({"encryption_passphrase": encrypt_pwd}, indent=4)
         #logging.info(f"🔹 POST Request URL: {url}")
-        #logging.info(f"🔹 POST Headers: {headers}")
         #logging.info(f"🔹 POST Payload:\n{payload}")
     except TypeError as e:
         logging.error(f"❌ Failed to serialize JSON: {e}")
@@ -70,21 +66,18 @@ def post_etl_configuration(erid: str = None):
         return
 
     try:
-        response = requests.post(url, headers=headers, data=payload)
+        response = client.post(url, data=payload, idempotent=True)
         response.raise_for_status()
 
         # ✅ Log full response
         logging.info(f"✅ POST ETL configuration successfully sent for ERID: {erid}")
         logging.info(f"✅ Response Code: {response.status_code}")
-        #logging.info(f"✅ Response Body:\n{response.text}")
 
         # ✅ Save response JSON
-        json_path = utils.get_response_json_path("postEtl", f"erid_{erid}")
-        with open(json_path, 'w') as f:
-            json.dump(response.json(), f, indent=4)
+        formatted_json = response_capture.capture_response("postEtl", f"erid_{erid}", response.json())
 
         print(f"✅ POST successful {erid}")
-        return json.dumps(response.json(), indent=4)
+        return formatted_json
     except requests.HTTPError as http_err:
         error_message = f"❌ API Request Error: {http_err}"
         try:
@@ -100,3 +93,13 @@ def post_etl_configuration(erid: str = None):
         error_message = f"❌ Network/API request failed: {e}"
         logging.error(f"{error_message}\n🔹 Full Traceback:\n{traceback.format_exc()}")
         print("❌ POST failed (check log)")
+
+
+def get_last_etl_configuration(erid: str):
+    """
+    Restituisce l'ultima configurazione scaricata per un ETL, letta dall'archivio degli snapshot.
+
+    @param erid: The ETL process ID.
+    @return: La configurazione (dict), oppure `None` se non è mai stata scaricata.
+    """
+    return snapshot_store.latest_snapshot("postEtl", f"erid_{erid}")
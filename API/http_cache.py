@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import requests
+from requests.structures import CaseInsensitiveDict
+
+# TTL (secondi) per famiglia di endpoint; sovrascrivibili da `http.cache.ttl` in config.json
+DEFAULT_TTLS = {
+    "datamart_metadata": 24 * 3600,
+    "datamart_summary": 3600,
+    "datamart_cst": 3600,
+    "etl_list": 600,
+    "catalog_tree": 3600,
+}
+
+ENDPOINT_FAMILIES = [
+    ("datamart_metadata", re.compile(r'/datamartservice/datamarts/\d+/metadata$')),
+    ("datamart_summary", re.compile(r'/datamartservice/datamarts/\d+/summary$')),
+    ("datamart_cst", re.compile(r'/datamartservice/datamarts/\d+/cst$')),
+    ("etl_list", re.compile(r'/backend/etls/?$')),
+    ("catalog_tree", re.compile(r'/catalog/explore/(domains|entities)/[^/]+/tree$')),
+]
+
+# Header della risposta conservati nella cache
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+
+def cache_key(method: str, url: str, params: dict = None, body=None) -> str:
+    """
+    Chiave della cache: hash di metodo, URL (con parametri ordinati) e body.
+    """
+    parts = [method.upper(), url, json.dumps(params or {}, sort_keys=True)]
+    if body is not None:
+        parts.append(body if isinstance(body, str) else json.dumps(body, sort_keys=True))
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+
+class CacheEntry:
+    def __init__(self, meta: dict, body: bytes):
+        self.meta = meta
+        self.body = body
+
+    @property
+    def etag(self):
+        return self.meta["headers"].get("ETag")
+
+    @property
+    def last_modified(self):
+        return self.meta["headers"].get("Last-Modified")
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.meta["expires_at"]
+
+    def to_response(self) -> requests.Response:
+        """
+        Ricostruisce un `requests.Response` equivalente a quello originale.
+        """
+        response = requests.Response()
+        response.status_code = self.meta["status"]
+        response.url = self.meta["url"]
+        response.headers = CaseInsensitiveDict(self.meta["headers"])
+        response.encoding = self.meta.get("encoding")
+        response._content = self.body
+        response.from_cache = True
+        return response
+
+
+class HTTPCache:
+    """
+    Cache su disco delle risposte HTTP di sola lettura (metadati, summary, catalogo ETL, alberi di dominio).
+
+    Ogni voce è salvata in `cache/http/<hash>.json` (metadati) + `<hash>.body` (contenuto).
+    Una voce scaduta con ETag/Last-Modified viene rivalidata con una richiesta
+    condizionale: su 304 il contenuto in cache viene riutilizzato e la scadenza rinnovata.
+    """
+
+    def __init__(self, cache_dir: str, ttls: dict = None, enabled: bool = True):
+        self.cache_dir = cache_dir
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.enabled = enabled
+
+    def ttl_for(self, url: str):
+        """
+        TTL della famiglia di endpoint a cui appartiene `url`, oppure `None` se non va messa in cache.
+        """
+        if not self.enabled:
+            return None
+        path = url.split('?', 1)[0]
+        for family, pattern in ENDPOINT_FAMILIES:
+            if pattern.search(path):
+                return self.ttls.get(family)
+        return None
+
+    def _paths(self, key: str):
+        base = os.path.join(self.cache_dir, key)
+        return f"{base}.json", f"{base}.body"
+
+    def get(self, key: str):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(body_path, 'rb') as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(meta, body)
+
+    def put(self, key: str, response: requests.Response, ttl: float) -> CacheEntry:
+        """
+        Salva una risposta 200 nella cache.
+        """
+        headers = {name: response.headers[name] for name in _STORED_HEADERS if name in response.headers}
+        meta = {
+            "url": response.url,
+            "status": response.status_code,
+            "headers": headers,
+            "encoding": response.encoding,
+            "stored_at": time.time(),
+            "expires_at": time.time() + ttl,
+        }
+        entry = CacheEntry(meta, response.content)
+        self._write(key, entry)
+        return entry
+
+    def touch(self, entry: CacheEntry, key: str, ttl: float):
+        """
+        Rinnova la scadenza di una voce rivalidata (304 Not Modified).
+        """
+        entry.meta["expires_at"] = time.time() + ttl
+        meta_path, _ = self._paths(key)
+        self._atomic_write(meta_path, json.dumps(entry.meta).encode("utf-8"))
+
+    def _write(self, key: str, entry: CacheEntry):
+        meta_path, body_path = self._paths(key)
+        self._atomic_write(body_path, entry.body)
+        self._atomic_write(meta_path, json.dumps(entry.meta).encode("utf-8"))
+
+    def _atomic_write(self, path: str, data: bytes):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"⚠️ Unable to write HTTP cache file {path}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def clear(self):
+        for name in os.listdir(self.cache_dir):
+            os.remove(os.path.join(self.cache_dir, name))
@@ -0,0 +1,423 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import logging
+import threading
+import requests
+from urllib.parse import urlencode
+from requests.adapters import HTTPAdapter
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+from API.token_manager import TokenManager, DEFAULT_REFRESH_MARGIN
+import API.rate_limit as rate_limit
+import API.concurrency as concurrency
+from API.single_flight import SingleFlight
+from API.json_stream import JsonArrayStream
+import API.http_cache as http_cache
+
+# Valori di default, sovrascrivibili dalla sezione `http` di config.json
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+
+# Dimensione dei blocchi letti dalle risposte in streaming e soglia oltre la quale il body va su disco
+STREAM_CHUNK_SIZE = 1024 * 1024
+SPOOL_MAX_SIZE = 64 * 1024 * 1024
+
+# urllib3 decodifica `br` solo se è installato brotli (o brotlicffi)
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        ACCEPT_ENCODING = "gzip, deflate, br"
+    except ImportError:
+        ACCEPT_ENCODING = "gzip, deflate"
+
+
+class BHCOClient:
+    """
+    Client HTTP condiviso verso BHCO.
+
+    Mantiene una `requests.Session` con un pool di connessioni keep-alive, così le
+    chiamate successive riutilizzano la stessa connessione TCP/TLS invece di
+    rifare l'handshake ad ogni richiesta.
+    Base URL, header di autenticazione e timeout di default sono impostati una
+    sola volta sul client.
+    Il Bearer Token è gestito da un `TokenManager`: viene rinnovato prima della
+    scadenza del JWT e, se il server risponde comunque 401, la richiesta viene
+    ripetuta una volta con un token nuovo.
+    Tutte le richieste passano da un rate limiter condiviso e gli errori transitori
+    (429/502/503/504, errori di rete) sono ripetuti secondo la `RetryPolicy`.
+    Il numero di richieste contemporanee è regolato da un `AdaptiveLimiter` (AIMD)
+    in base a latenza ed errori osservati; il limite corrente è `concurrency_limit`.
+    Le GET identiche contemporanee condividono un'unica richiesta HTTP (single-flight).
+    Le GET di metadati e cataloghi passano dalla cache su disco `HTTPCache`, se configurata.
+    """
+
+    def __init__(self, base_url: str, token_manager: TokenManager = None, pool_size: int = DEFAULT_POOL_SIZE,
+                 timeout: tuple = (DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT),
+                 rate_limiter: rate_limit.TokenBucket = None, retry_policy: rate_limit.RetryPolicy = None,
+                 limiter: concurrency.AdaptiveLimiter = None, cache: http_cache.HTTPCache = None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.token_manager = token_manager or TokenManager(fetch_token=lambda: None)
+        self.rate_limiter = rate_limiter or rate_limit.TokenBucket(rate=None)
+        self.retry_policy = retry_policy or rate_limit.RetryPolicy()
+        self.limiter = limiter or concurrency.AdaptiveLimiter(max_limit=pool_size)
+        self._flights = SingleFlight()
+        self.cache = cache
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            'Content-Type': 'application/json',
+            'Accept': 'application/json',
+            'Accept-Encoding': ACCEPT_ENCODING
+        })
+
+    @property
+    def concurrency_limit(self) -> int:
+        """
+        Numero massimo di richieste contemporanee attualmente consentito dal controllo adattivo.
+        """
+        return self.limiter.limit
+
+    @property
+    def token(self):
+        """
+        Il Bearer Token corrente (rinnovato se mancante o in scadenza), oppure `None`.
+        """
+        return self.token_manager.get_token()
+
+    def set_token(self, token: str):
+        """
+        Imposta il Bearer Token usato da tutte le richieste (es. dopo il login).
+        """
+        self.token_manager.set_token(token)
+
+    def url(self, path: str) -> str:
+        """
+        Restituisce l'URL assoluto per un path relativo al base URL.
+        """
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, authenticated: bool = True, idempotent: bool = None,
+                coalesce: bool = True, refresh: bool = False, **kwargs) -> requests.Response:
+        """
+        Invia una richiesta HTTP riutilizzando il pool di connessioni.
+
+        @param method: Metodo HTTP (`GET`, `POST`, `PUT`, ...).
+        @param path: Path relativo al base URL (es. `/opt/api/v1/backend/etls/`) oppure URL assoluto.
+        @param authenticated: Se `False` l'header `Authorization` non viene inviato (es. login).
+        @param idempotent: Se la richiesta può essere ripetuta anche dopo 502/504 o errori di rete.
+                           Di default vale per GET/PUT/DELETE; va indicato esplicitamente per le POST di sola lettura.
+        @param coalesce: Per le GET, condivide la risposta con eventuali richieste identiche già in corso.
+                         La risposta restituita può quindi essere la stessa per più chiamanti: va letta, non modificata.
+        @param refresh: Ignora le voci ancora valide della cache HTTP e scarica di nuovo la risposta.
+        @param kwargs: Argomenti passati a `requests.Session.request` (`params`, `data`, `json`, `headers`, ...).
+        @return: L'oggetto `requests.Response`.
+
+        Raises:
+        - `requests.RequestException` se la richiesta fallisce anche dopo i retry.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+
+        ttl = self.cache.ttl_for(url) if self.cache is not None and method.upper() == "GET" else None
+        if ttl is not None and not kwargs.get("stream"):
+            return self._cached_get(url, ttl, refresh, authenticated, idempotent, coalesce, **kwargs)
+        return self._coalesced(method, url, authenticated, idempotent, coalesce, **kwargs)
+
+    def _cached_get(self, url: str, ttl: float, refresh: bool, authenticated: bool, idempotent: bool,
+                    coalesce: bool, **kwargs) -> requests.Response:
+        """
+        GET servita dalla cache su disco, con rivalidazione condizionale delle voci scadute.
+        """
+        key = http_cache.cache_key("GET", url, kwargs.get("params"))
+        entry = self.cache.get(key)
+
+        if entry is not None and entry.is_fresh() and not refresh:
+            logging.info(f"💾 HTTP cache hit: GET {url}")
+            return entry.to_response()
+
+        if entry is not None:
+            headers = dict(kwargs.pop("headers", None) or {})
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+            kwargs["headers"] = headers
+
+        response = self._coalesced("GET", url, authenticated, idempotent, coalesce, **kwargs)
+
+        if response.status_code == 304 and entry is not None:
+            logging.info(f"💾 HTTP cache revalidated (304 Not Modified): GET {url}")
+            self.cache.touch(entry, key, ttl)
+            return entry.to_response()
+        if response.status_code == 200:
+            self.cache.put(key, response, ttl)
+        return response
+
+    def _coalesced(self, method: str, url: str, authenticated: bool, idempotent: bool, coalesce: bool,
+                   **kwargs) -> requests.Response:
+        if coalesce and method.upper() == "GET" and not kwargs.get("stream"):
+            params = kwargs.get("params") or {}
+            key = f"GET {url}?{urlencode(sorted(params.items()))}" if params else f"GET {url}"
+            if kwargs.get("headers"):
+                key += f" {sorted(kwargs['headers'].items())}"
+            return self._flights.do(key, lambda: self._request(method, url, authenticated, idempotent, **kwargs))
+        return self._request(method, url, authenticated, idempotent, **kwargs)
+
+    def _request(self, method: str, url: str, authenticated: bool, idempotent: bool, **kwargs) -> requests.Response:
+        headers = dict(kwargs.pop("headers", None) or {})
+        if idempotent is None:
+            idempotent = method.upper() in rate_limit.IDEMPOTENT_METHODS
+
+        if not authenticated:
+            return self._send(method, url, headers, idempotent, **kwargs)
+
+        token = self.token_manager.get_token()
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        response = self._send(method, url, headers, idempotent, **kwargs)
+
+        if response.status_code == 401:
+            # Token scaduto o revocato: si rinnova e si riprova una sola volta
+            logging.warning(f"⚠️ 401 Unauthorized for {method} {url}, refreshing token and retrying once")
+            new_token = self.token_manager.refresh(stale_token=token)
+            if new_token and new_token != token:
+                response.close()
+                headers['Authorization'] = f'Bearer {new_token}'
+                response = self._send(method, url, headers, idempotent, **kwargs)
+        return response
+
+    def _send(self, method: str, url: str, headers: dict, idempotent: bool, **kwargs) -> requests.Response:
+        """
+        Invia la richiesta rispettando il rate limiter e ripetendola sugli errori transitori.
+        """
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                with self.limiter.slot(method, url) as outcome:
+                    response = self.session.request(method, url, headers=headers, **kwargs)
+                    outcome["status"] = response.status_code
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if not self.retry_policy.can_retry(attempt, idempotent):
+                    raise
+                delay = self.retry_policy.backoff(attempt)
+                logging.warning(f"⚠️ {method} {url} failed ({e}), retry {attempt + 1}/{self.retry_policy.max_retries} in {delay:.1f}s")
+            else:
+                status = response.status_code
+                if not self.retry_policy.can_retry(attempt, idempotent, status):
+                    return response
+                delay = self.retry_policy.delay(attempt, response)
+                if status == 429:
+                    # Il server ci sta limitando: si ferma anche il resto delle richieste
+                    self.rate_limiter.pause(delay)
+                logging.warning(f"⚠️ {method} {url} returned {status}, retry {attempt + 1}/{self.retry_policy.max_retries} in {delay:.1f}s")
+                response.close()
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def read_json(response: requests.Response):
+    """
+    Legge in streaming il body JSON di una risposta ottenuta con `stream=True`.
+
+    Il contenuto viene decompresso (gzip/deflate/br) man mano che arriva e accumulato in
+    un file temporaneo che passa su disco oltre `SPOOL_MAX_SIZE`, invece di essere tenuto
+    in memoria come `response.content` + `response.text`.
+
+    I byte decompressi letti restano disponibili in `response.decoded_bytes`.
+
+    @return: Il JSON decodificato, oppure `None` se il body è vuoto.
+
+    Raises:
+    - `json.JSONDecodeError` se il body non è JSON valido.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as spool:
+        decoded_bytes = 0
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            spool.write(chunk)
+            decoded_bytes += len(chunk)
+        log_transfer(response, decoded_bytes)
+        response.decoded_bytes = decoded_bytes
+
+        spool.seek(0)
+        if decoded_bytes < STREAM_CHUNK_SIZE and not spool.read().strip():
+            return None
+        spool.seek(0)
+        return json.load(spool)
+
+
+def iter_json_items(response: requests.Response, key: str = "data", fields: dict = None):
+    """
+    Restituisce uno alla volta gli elementi dell'array `key` di una risposta ottenuta con `stream=True`.
+
+    Il body viene decompresso e analizzato in modo incrementale (`JsonArrayStream`):
+    ogni elemento è disponibile appena arriva, senza costruire l'intero documento.
+    La connessione viene rilasciata a fine iterazione (o se il consumatore si ferma prima).
+    Se indicato, `fields` riceve a fine iterazione gli altri campi di primo livello (es. `totalcount`).
+
+    Raises:
+    - `json.JSONDecodeError` se il body non è JSON valido.
+    """
+    decoded_bytes = 0
+
+    def chunks():
+        nonlocal decoded_bytes
+        for chunk in response.iter_content(chunk_size=STREAM_CHUNK_SIZE):
+            decoded_bytes += len(chunk)
+            yield chunk
+
+    try:
+        stream = JsonArrayStream(chunks(), key=key, encoding=response.encoding or "utf-8")
+        yield from stream
+        if fields is not None:
+            fields.update(stream.fields)
+        log_transfer(response, decoded_bytes)
+    finally:
+        response.close()
+
+
+def log_transfer(response: requests.Response, decoded_bytes: int):
+    """
+    Logga i byte ricevuti in rete rispetto a quelli decompressi.
+    """
+    raw = getattr(response, "raw", None)
+    wire_bytes = raw.tell() if raw is not None and hasattr(raw, "tell") else decoded_bytes
+    encoding = response.headers.get("Content-Encoding", "identity")
+    ratio = f", ratio {decoded_bytes / wire_bytes:.1f}x" if wire_bytes else ""
+    logging.info(f"📦 Received {wire_bytes} bytes on the wire ({encoding}), {decoded_bytes} bytes decoded{ratio}")
+
+
+def parse_json(response: requests.Response):
+    """
+    Restituisce il body JSON della risposta, decodificandolo una sola volta.
+
+    Le risposte condivise dal single-flight vengono così decodificate una volta sola
+    e tutti i chiamanti ricevono lo stesso oggetto (da trattare in sola lettura).
+    """
+    lock = response.__dict__.setdefault("_bhco_json_lock", threading.Lock())
+    with lock:
+        if "_bhco_json" not in response.__dict__:
+            response._bhco_json = response.json()
+    return response._bhco_json
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> BHCOClient:
+    """
+    Restituisce il client HTTP condiviso, creandolo al primo utilizzo.
+
+    Requirements:
+    - `EnvironmentCredentials/credentials.json` must contain `base_url`.
+    - `config.json` may contain:
+        - `auth.BearerToken`: The authentication token (rinnovato automaticamente via `POST_login.request_token`).
+        - `auth.refresh_margin_sec`: Secondi di anticipo sulla scadenza del JWT per il rinnovo.
+        - `http.pool_size`: Dimensione del pool di connessioni keep-alive.
+        - `http.connect_timeout` / `http.read_timeout`: Timeout di default in secondi.
+        - `http.rate_limit.requests_per_second` / `http.rate_limit.burst`: Quota di richieste (0 = nessun limite).
+        - `http.retry.max_retries` / `backoff_base` / `backoff_max` / `retry_after_max`: Politica di retry.
+        - `http.adaptive_concurrency.initial` / `min` / `max` / `latency_tolerance`: Controllo AIMD delle
+          richieste contemporanee (`max` di default pari a `http.pool_size`).
+        - `http.cache.enabled`: Abilita la cache su disco delle GET di metadati/cataloghi (default `true`).
+        - `http.cache.ttl`: TTL in secondi per famiglia di endpoint (vedi `http_cache.DEFAULT_TTLS`).
+    """
+    global _client
+    if _client is not None:
+        return _client
+
+    with _client_lock:
+        if _client is None:
+            config = utils.load_config()
+            credentials = utils.load_credentials()
+            http_config = config.get("http", {})
+            auth_config = config.get("auth", {})
+            rate_config = http_config.get("rate_limit", {})
+            retry_config = http_config.get("retry", {})
+            adaptive_config = http_config.get("adaptive_concurrency", {})
+            cache_config = http_config.get("cache", {})
+            pool_size = http_config.get("pool_size", DEFAULT_POOL_SIZE)
+
+            token_manager = TokenManager(
+                fetch_token=_request_token,
+                token=auth_config.get("BearerToken", None),
+                refresh_margin=auth_config.get("refresh_margin_sec", DEFAULT_REFRESH_MARGIN)
+            )
+            _client = BHCOClient(
+                base_url=credentials["base_url"],
+                token_manager=token_manager,
+                pool_size=pool_size,
+                timeout=(http_config.get("connect_timeout", DEFAULT_CONNECT_TIMEOUT),
+                         http_config.get("read_timeout", DEFAULT_READ_TIMEOUT)),
+                rate_limiter=rate_limit.TokenBucket(
+                    rate=rate_config.get("requests_per_second", rate_limit.DEFAULT_REQUESTS_PER_SECOND),
+                    capacity=rate_config.get("burst", rate_limit.DEFAULT_BURST)
+                ),
+                retry_policy=rate_limit.RetryPolicy(
+                    max_retries=retry_config.get("max_retries", rate_limit.DEFAULT_MAX_RETRIES),
+                    backoff_base=retry_config.get("backoff_base", rate_limit.DEFAULT_BACKOFF_BASE),
+                    backoff_max=retry_config.get("backoff_max", rate_limit.DEFAULT_BACKOFF_MAX),
+                    retry_after_max=retry_config.get("retry_after_max", rate_limit.DEFAULT_RETRY_AFTER_MAX)
+                ),
+                limiter=concurrency.AdaptiveLimiter(
+                    initial_limit=adaptive_config.get("initial", concurrency.DEFAULT_INITIAL_LIMIT),
+                    min_limit=adaptive_config.get("min", concurrency.DEFAULT_MIN_LIMIT),
+                    max_limit=adaptive_config.get("max", pool_size),
+                    latency_tolerance=adaptive_config.get("latency_tolerance", concurrency.DEFAULT_LATENCY_TOLERANCE)
+                ),
+                cache=http_cache.HTTPCache(
+                    cache_dir=utils.get_cache_dir("http"),
+                    ttls=cache_config.get("ttl", {}),
+                    enabled=cache_config.get("enabled", True)
+                )
+            )
+            logging.info(f"🔹 HTTP client initialised for {_client.base_url} "
+                         f"(pool size: {_client.pool_size}, concurrency limit: {_client.concurrency_limit})")
+    return _client
+
+
+def _request_token():
+    # Import locale: POST_login usa a sua volta il client condiviso
+    import API.POST_login as POST_login
+    return POST_login.request_token()
+
+
+def reset_client():
+    """
+    Chiude e scarta il client condiviso (verrà ricreato alla prossima `get_client()`).
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
@@ -0,0 +1,131 @@
+import json
+import codecs
+
+_WHITESPACE = " \t\n\r"
+# Oltre questa soglia la parte già consumata del buffer viene scartata
+_COMPACT_THRESHOLD = 1024 * 1024
+
+
+class JsonArrayStream:
+    """
+    Parser JSON incrementale che restituisce uno alla volta gli elementi di un array.
+
+    Legge un documento del tipo `{"data": [ {...}, {...}, ... ], "altro": ...}` da un
+    iterabile di blocchi di byte (es. `response.iter_content()`) e produce ogni elemento
+    di `data` appena è completo, senza costruire l'intero documento in memoria.
+    Gli altri campi di primo livello sono raccolti in `fields` (quelli che seguono
+    l'array sono disponibili solo a iterazione conclusa).
+    Con `key=None` il documento deve essere direttamente un array.
+    """
+
+    def __init__(self, chunks, key: str = "data", encoding: str = "utf-8"):
+        self.key = key
+        self.fields = {}
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    # -- lettura del buffer ------------------------------------------------
+
+    def _fill(self, min_chars: int = 1) -> bool:
+        """
+        Aggiunge al buffer almeno `min_chars` caratteri (o quanto resta). Restituisce `False` a fine stream.
+        """
+        if self._eof:
+            return False
+        if self._pos > _COMPACT_THRESHOLD:
+            self._buf = self._buf[self._pos:]
+            self._pos = 0
+        parts = []
+        added = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk) if chunk else ""
+            parts.append(text)
+            added += len(text)
+            if added >= min_chars:
+                self._buf += "".join(parts)
+                return True
+        parts.append(self._decoder.decode(b"", final=True))
+        added += len(parts[-1])
+        self._buf += "".join(parts)
+        self._eof = True
+        return added > 0
+
+    def _peek(self) -> str:
+        """
+        Primo carattere non blank, senza consumarlo ("" a fine stream).
+        """
+        while True:
+            while self._pos < len(self._buf) and self._buf[self._pos] in _WHITESPACE:
+                self._pos += 1
+            if self._pos < len(self._buf):
+                return self._buf[self._pos]
+            if not self._fill():
+                return ""
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self._buf, self._pos)
+        self._pos += 1
+
+    def _value(self):
+        """
+        Decodifica il prossimo valore JSON completo, leggendo altri blocchi se è troncato.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                # Valore troncato: si raddoppia almeno la parte in sospeso, così i valori
+                # più grandi di un blocco non vengono ridecodificati ad ogni blocco
+                if not self._fill(len(self._buf) - self._pos):
+                    raise
+                continue
+            # Un numero a fine buffer potrebbe continuare nel blocco successivo
+            if end == len(self._buf) and not self._eof and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    # -- iterazione --------------------------------------------------------
+
+    def _iter_array(self):
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            separator = self._peek()
+            self._pos += 1
+            if separator == "]":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' or ']'", self._buf, self._pos - 1)
+
+    def __iter__(self):
+        if self.key is None:
+            yield from self._iter_array()
+            return
+
+        self._expect("{")
+        if self._peek() == "}":
+            return
+        while True:
+            name = self._value()
+            self._expect(":")
+            if name == self.key:
+                yield from self._iter_array()
+            else:
+                self.fields[name] = self._value()
+            separator = self._peek()
+            self._pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' or '}'", self._buf, self._pos - 1)
@@ -0,0 +1,95 @@
+import time
+import logging
+import threading
+
+# Intervallo minimo (secondi) tra due righe di avanzamento nel log per la stessa operazione
+DEFAULT_LOG_INTERVAL = 10.0
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(size) < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class TransferProgress:
+    """
+    Avanzamento di un download a pagine: righe, byte, throughput ed ETA.
+
+    Thread-safe: può essere aggiornato dai thread che scaricano le pagine in parallelo.
+    L'ETA è disponibile quando il server dichiara il numero totale di record.
+    """
+
+    def __init__(self, name: str, log_interval: float = DEFAULT_LOG_INTERVAL):
+        self.name = name
+        self.log_interval = log_interval
+        self.rows = 0
+        self.bytes = 0
+        self.total_rows = None
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self._last_log = self.started_at
+        self._lock = threading.Lock()
+
+    def update(self, rows: int = 0, nbytes: int = 0, total_rows: int = None):
+        """
+        Registra una pagina ricevuta (`rows` record, `nbytes` byte decompressi).
+        """
+        with self._lock:
+            self.rows += rows
+            self.bytes += nbytes
+            if total_rows is not None:
+                self.total_rows = total_rows
+            now = time.monotonic()
+            due = now - self._last_log >= self.log_interval
+            if due:
+                self._last_log = now
+        if due:
+            logging.info(f"🔄 {self.describe()}")
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def eta(self):
+        """
+        Secondi stimati alla fine, oppure `None` se il totale non è noto.
+        """
+        if self.total_rows is None or not self.rows:
+            return None
+        remaining = max(self.total_rows - self.rows, 0)
+        return remaining * self.elapsed / self.rows
+
+    def snapshot(self) -> dict:
+        elapsed = self.elapsed
+        return {
+            "rows": self.rows,
+            "bytes": self.bytes,
+            "total_rows": self.total_rows,
+            "seconds": round(elapsed, 1),
+            "rows_per_sec": round(self.rows / elapsed, 1) if elapsed else 0.0,
+            "bytes_per_sec": round(self.bytes / elapsed, 1) if elapsed else 0.0,
+            "eta_seconds": None if self.eta() is None else round(self.eta(), 1),
+        }
+
+    def describe(self) -> str:
+        """
+        Riga di avanzamento leggibile, es. `DataMart 3631: 120000/1000000 rows (12%), 45.3 MB, 8500 rows/s, 2.1 MB/s, ETA 1m43s`.
+        """
+        stats = self.snapshot()
+        rows = f"{self.rows}/{self.total_rows} rows ({100 * self.rows / self.total_rows:.0f}%)" \
+            if self.total_rows else f"{self.rows} rows"
+        eta = stats["eta_seconds"]
+        return (f"{self.name}: {rows}, {format_bytes(self.bytes)}, {stats['rows_per_sec']:.0f} rows/s, "
+                f"{format_bytes(stats['bytes_per_sec'])}/s" + (f", ETA {format_duration(eta)}" if eta is not None else ""))
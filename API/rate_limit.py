@@ -0,0 +1,131 @@
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+# Status per cui una richiesta viene ripetuta
+RETRY_STATUSES = {429, 502, 503, 504}
+# Status che indicano che il server non ha elaborato la richiesta: ripetibili anche per metodi non idempotenti
+REJECTED_STATUSES = {429, 503}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_BACKOFF_BASE = 1.0
+DEFAULT_BACKOFF_MAX = 60.0
+DEFAULT_RETRY_AFTER_MAX = 300.0
+DEFAULT_REQUESTS_PER_SECOND = 10.0
+DEFAULT_BURST = 20
+
+
+class TokenBucket:
+    """
+    Rate limiter a token bucket condiviso tra thread.
+
+    Ogni richiesta consuma un token; i token si ricaricano a `rate` al secondo fino a
+    un massimo di `capacity`. `acquire()` blocca finché un token è disponibile.
+    """
+
+    def __init__(self, rate: float = DEFAULT_REQUESTS_PER_SECOND, capacity: int = DEFAULT_BURST):
+        self.rate = float(rate) if rate else None
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Attende un token libero (e l'eventuale pausa imposta da `pause()`).
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    if self.rate is None:
+                        return
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """
+        Sospende tutte le richieste per `seconds` (es. dopo un 429 con Retry-After).
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class RetryPolicy:
+    """
+    Politica di retry con backoff esponenziale "full jitter" che rispetta l'header Retry-After.
+    """
+
+    def __init__(self, max_retries: int = DEFAULT_MAX_RETRIES, backoff_base: float = DEFAULT_BACKOFF_BASE,
+                 backoff_max: float = DEFAULT_BACKOFF_MAX, retry_after_max: float = DEFAULT_RETRY_AFTER_MAX,
+                 statuses=RETRY_STATUSES):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.statuses = set(statuses)
+
+    def can_retry(self, attempt: int, idempotent: bool, status: int = None) -> bool:
+        """
+        @param attempt: Numero di retry già effettuati.
+        @param idempotent: Se la richiesta può essere ripetuta senza effetti collaterali.
+        @param status: Status HTTP ricevuto (`None` per errori di rete/timeout).
+        """
+        if attempt >= self.max_retries:
+            return False
+        if status is None:
+            return idempotent
+        if status not in self.statuses:
+            return False
+        return idempotent or status in REJECTED_STATUSES
+
+    def backoff(self, attempt: int) -> float:
+        """
+        Attesa per il retry numero `attempt` (0-based): uniforme in [0, min(max, base * 2^attempt)].
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def delay(self, attempt: int, response=None) -> float:
+        """
+        Attesa prima del prossimo tentativo: Retry-After se presente, altrimenti backoff con jitter.
+        """
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.retry_after_max)
+        return self.backoff(attempt)
+
+
+def parse_retry_after(value):
+    """
+    Interpreta l'header Retry-After (secondi oppure data HTTP).
+
+    @return: Secondi di attesa, oppure `None` se l'header è assente o non valido.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        logging.warning(f"⚠️ Invalid Retry-After header: {value}")
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
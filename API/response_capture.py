@@ -0,0 +1,107 @@
+import os
+import sys
+import gzip
+import json
+import random
+import logging
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+import DB.snapshot_store as snapshot_store
+
+# Modalità di cattura delle risposte API (`response_capture.mode` in config.json)
+MODE_OFF = "off"          # Solo riepilogo nel log, nessun file
+MODE_PREVIEW = "preview"  # Riepilogo + anteprima troncata del body nel log, nessun file
+MODE_COMPACT = "compact"  # Riepilogo nel log + dump JSON compatto in logs/response/
+MODE_GZIP = "gzip"        # Riepilogo nel log + dump JSON compresso (.json.gz) in logs/response/
+MODE_SAMPLED = "sampled"  # Riepilogo nel log + dump compatto solo per una frazione delle risposte
+MODES = (MODE_OFF, MODE_PREVIEW, MODE_COMPACT, MODE_GZIP, MODE_SAMPLED)
+
+DEFAULT_MODE = MODE_COMPACT
+DEFAULT_PREVIEW_CHARS = 2000
+DEFAULT_SAMPLE_RATE = 0.1
+
+
+def get_policy(api_name: str) -> dict:
+    """
+    Politica di cattura per `api_name`.
+
+    Requirements:
+    - `config.json` may contain `response_capture` with:
+        - `mode`: One of `off`, `preview`, `compact`, `gzip`, `sampled` (default `compact`).
+        - `preview_chars`: Caratteri del body riportati nel log in modalità `preview`.
+        - `sample_rate`: Frazione di risposte salvate in modalità `sampled`.
+        - `overrides`: Dizionario `api_name -> mode` per cambiare modalità su singole API.
+    """
+    config = utils.load_config().get("response_capture", {})
+    mode = config.get("overrides", {}).get(api_name, config.get("mode", DEFAULT_MODE))
+    if mode not in MODES:
+        logging.warning(f"⚠️ Unknown response_capture mode '{mode}', using '{DEFAULT_MODE}'")
+        mode = DEFAULT_MODE
+    return {
+        "mode": mode,
+        "preview_chars": config.get("preview_chars", DEFAULT_PREVIEW_CHARS),
+        "sample_rate": config.get("sample_rate", DEFAULT_SAMPLE_RATE),
+    }
+
+
+def count_rows(data):
+    """
+    Numero di righe di una risposta: lunghezza della lista o del campo `data`, se presenti.
+    """
+    if isinstance(data, list):
+        return len(data)
+    if isinstance(data, dict) and isinstance(data.get("data"), list):
+        return len(data["data"])
+    return None
+
+
+def capture_response(api_name: str, details: str, data) -> str:
+    """
+    Registra una risposta API secondo la politica configurata e restituisce il JSON serializzato.
+
+    Il payload viene serializzato una sola volta (JSON compatto); la stessa stringa è usata
+    per l'anteprima, per il dump su file, per l'archivio degli snapshot (`snapshot_store`)
+    e come valore di ritorno. Nel log finisce un riepilogo (dimensione, numero di righe)
+    invece del body completo.
+
+    @param api_name: Nome dell'API (es. `getDatamartMetadata`), usato per il nome del file.
+    @param details: Dettaglio del file (es. `datamart_3569`).
+    @param data: La risposta decodificata.
+    @return: Il JSON compatto della risposta.
+    """
+    policy = get_policy(api_name)
+    mode = policy["mode"]
+    text = json.dumps(data, separators=(",", ":"))
+
+    snapshot_store.save_snapshot(api_name, details, text)
+
+    rows = count_rows(data)
+    summary = f"{len(text)} bytes" + (f", {rows} rows" if rows is not None else "")
+    logging.info(f"✅ Response {api_name} [{details}]: {summary}")
+
+    if mode == MODE_PREVIEW:
+        limit = policy["preview_chars"]
+        preview = text if len(text) <= limit else f"{text[:limit]}... ({len(text) - limit} more chars)"
+        logging.info(f"✅ Response Body (preview):\n{preview}")
+    elif mode == MODE_COMPACT or (mode == MODE_SAMPLED and random.random() < policy["sample_rate"]):
+        _dump(utils.get_response_json_path(api_name, details), text, compress=False)
+    elif mode == MODE_GZIP:
+        _dump(utils.get_response_json_path(api_name, details) + ".gz", text, compress=True)
+
+    return text
+
+
+def _dump(path: str, text: str, compress: bool):
+    try:
+        if compress:
+            with gzip.open(path, 'wt', encoding='utf-8', compresslevel=6) as f:
+                f.write(text)
+        else:
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(text)
+        logging.info(f"✅ Response saved to: {path}")
+    except OSError as e:
+        logging.error(f"❌ Unable to save response to {path}: {e}")
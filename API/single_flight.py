@@ -0,0 +1,55 @@
+import logging
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalescenza di chiamate identiche contemporanee.
+
+    Se più thread chiedono la stessa chiave mentre una chiamata è in corso, solo il
+    primo la esegue; gli altri attendono e ricevono lo stesso risultato (o la stessa eccezione).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        Esegue `fn()` per `key`, condividendo il risultato con le chiamate concorrenti sulla stessa chiave.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+            else:
+                call.waiters += 1
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            if call.waiters:
+                logging.info(f"🔹 Coalesced {call.waiters} duplicate request(s) for {key}")
+            call.event.set()
+        return call.result
@@ -0,0 +1,100 @@
+import json
+import time
+import base64
+import logging
+import threading
+
+# Secondi di anticipo rispetto alla scadenza del JWT con cui viene rinnovato il token
+DEFAULT_REFRESH_MARGIN = 60
+
+
+def decode_jwt_expiry(token: str):
+    """
+    Legge il claim `exp` dal payload di un JWT (senza verificarne la firma).
+
+    @param token: Il JWT (`header.payload.signature`).
+    @return: Timestamp epoch di scadenza, oppure `None` se il token non contiene un `exp` leggibile.
+    """
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        exp = claims.get("exp")
+        return float(exp) if exp is not None else None
+    except (IndexError, ValueError, TypeError, AttributeError):
+        return None
+
+
+class TokenManager:
+    """
+    Mantiene in memoria il Bearer Token e lo rinnova prima della scadenza.
+
+    Il token viene richiesto tramite `fetch_token` (una funzione senza argomenti che
+    restituisce un nuovo JWT oppure `None`) quando manca, quando mancano meno di
+    `refresh_margin` secondi al suo `exp`, oppure quando il server lo rifiuta con 401.
+    """
+
+    def __init__(self, fetch_token, token: str = None, refresh_margin: float = DEFAULT_REFRESH_MARGIN):
+        self._fetch_token = fetch_token
+        self.refresh_margin = refresh_margin
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = None
+        self.set_token(token)
+
+    def set_token(self, token: str):
+        """
+        Imposta il token corrente (es. dopo un login esplicito).
+        """
+        self._token = token or None
+        self._expires_at = decode_jwt_expiry(token) if token else None
+        if self._expires_at:
+            logging.info(f"🔹 Bearer Token valid until {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self._expires_at))}")
+
+    @property
+    def expires_at(self):
+        return self._expires_at
+
+    def _needs_refresh(self) -> bool:
+        if not self._token:
+            return True
+        if self._expires_at is None:
+            return False  # Scadenza sconosciuta: si rinnova solo su 401
+        return time.time() >= self._expires_at - self.refresh_margin
+
+    def get_token(self):
+        """
+        Restituisce un token valido, rinnovandolo se è mancante o prossimo alla scadenza.
+
+        @return: Il token, oppure `None` se non è stato possibile ottenerlo.
+        """
+        if not self._needs_refresh():
+            return self._token
+
+        with self._lock:
+            # Un altro thread potrebbe averlo già rinnovato
+            if self._needs_refresh():
+                self._refresh()
+            return self._token
+
+    def refresh(self, stale_token: str = None):
+        """
+        Forza il rinnovo del token (es. dopo una risposta 401).
+
+        @param stale_token: Il token rifiutato dal server. Se nel frattempo un altro
+                            thread ha già ottenuto un token diverso, il rinnovo viene saltato.
+        @return: Il nuovo token, oppure `None` se il rinnovo è fallito.
+        """
+        with self._lock:
+            if stale_token is None or self._token == stale_token:
+                self._refresh()
+            return self._token
+
+    def _refresh(self):
+        logging.info("🔄 Refreshing Bearer Token...")
+        token = self._fetch_token()
+        if token:
+            self.set_token(token)
+            logging.info("✅ Bearer Token refreshed")
+        else:
+            logging.error("❌ Unable to refresh the Bearer Token (check credentials)")
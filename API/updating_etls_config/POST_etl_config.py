@@ -1,6 +1,8 @@
 import requests
 import json
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
 import logging
 import traceback
 
@@ -19,7 +21,7 @@ def patch_etl_configuration(etl_id: str = None,
     # Carica config e logging
     config = utils.load_config()
     utils.setup_logging()
-    credentials = utils.load_credentials()
+    client = http_client.get_client()
     # 1) Recupero ETL ID, se non specificato
     if etl_id is None:
         etl_id = config.get("etl", {}).get("erid")
@@ -29,8 +31,7 @@ def patch_etl_configuration(etl_id: str = None,
             return
 
     # 2) Recupero Bearer Token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ Nessun Bearer Token. Esegui prima il login.")
         print("❌ Patch failed (check log)")
         return
@@ -46,19 +47,19 @@ def patch_etl_configuration(etl_id: str = None,
     if properties_to_delete:
         payload["properties_to_delete"] = properties_to_delete
 
-    url = f"{credentials['base_url']}/opt/api/v1/backend/etls/{etl_id}/configuration/update"
-    headers = {
-        "Authorization": f"Bearer {token}",
-        "Content-Type": "application/json"
-    }
+    url = client.url(f"/opt/api/v1/backend/etls/{etl_id}/configuration/update")
 
     # 4) Invio richiesta
     try:
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        response = client.post(url, data=json.dumps(payload))
         response.raise_for_status()
 
         logging.info(f"✅ PATCH su ETL {etl_id} eseguito correttamente. (Status code: {response.status_code})")
-        logging.info(f"Response Body:\n{response.text}")
+        if response.text.strip():
+            try:
+                response_capture.capture_response("patchEtl", f"etl_{etl_id}", response.json())
+            except ValueError:
+                logging.warning("No valid JSON in the response body.")
 
         print(f"✅ Patch eseguita su ETL {etl_id}.")
     except requests.HTTPError as http_err:
@@ -1,6 +1,8 @@
 import requests
 import json
 import utils
+import API.http_client as http_client
+import API.response_capture as response_capture
 import logging
 import traceback
 
@@ -15,7 +17,7 @@ def put_etl_configuration(erid: str = None, modified_body: dict = None):
     # Load Configuration & Setup Logging
     config = utils.load_config()
     utils.setup_logging()
-    credentials = utils.load_credentials()
+    client = http_client.get_client()
 
     # Retrieve ERID
     if erid is None:
@@ -26,8 +28,7 @@ def put_etl_configuration(erid: str = None, modified_body: dict = None):
             return
 
     # Retrieve Bearer Token
-    token = config.get("auth", {}).get("BearerToken", None)
-    if not token:
+    if not client.token:
         logging.error("❌ No Bearer Token found! Please log in using `POST_login.py`.")
         print("❌ PUT failed (check log)")
         return
@@ -52,11 +53,7 @@ def put_etl_configuration(erid: str = None, modified_body: dict = None):
     # Ensure encryption passphrase is added
     modified_body['encryption_passphrase'] = config.get("auth", {}).get("encryption_passphrase", None)
     
-    url = f"{credentials['base_url']}/opt/api/v1/backend/etls/{erid}/configuration"
-    headers = {
-        'Content-Type': 'application/json',
-        'Authorization': f'Bearer {token}'
-    }
+    url = client.url(f"/opt/api/v1/backend/etls/{erid}/configuration")
 
     try:
         payload = json.dumps(modified_body, indent=4)
@@ -68,16 +65,14 @@ def put_etl_configuration(erid: str = None, modified_body: dict = None):
         return
 
     try:
-        response = requests.put(url, headers=headers, data=payload)
+        response = client.put(url, data=payload)
         response.raise_for_status()
 
         # Log full response
         logging.info(f"✅ PUT ETL configuration updated successfully for ERID: {erid}")
         logging.info(f"✅ Response Code: {response.status_code}")
-        logging.info(f"✅ Response Body:\n{response.text}")
 
         # Save JSON response only if present (e.g. status != 204)
-        json_path = utils.get_response_json_path("putEtl", f"erid_{erid}")
         data = {}
         if response.status_code != 204 and response.text.strip():
             try:
@@ -85,8 +80,7 @@ def put_etl_configuration(erid: str = None, modified_body: dict = None):
             except ValueError:
                 logging.warning("No valid JSON in the response body.")
 
-        with open(json_path, 'w') as f:
-            json.dump(data, f, indent=4)
+        response_capture.capture_response("putEtl", f"erid_{erid}", data)
 
         print(f"✅ PUT successful {erid}")
 
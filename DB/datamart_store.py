@@ -0,0 +1,365 @@
+import os
+import sys
+import time
+import logging
+import sqlite3
+from datetime import timezone
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+import API.datamart.datamart_schema as datamart_schema
+
+# Righe per ogni `executemany` e righe per transazione durante il caricamento massivo
+DEFAULT_BATCH_SIZE = 10000
+DEFAULT_TRANSACTION_ROWS = 500000
+# Cache di pagine SQLite durante il caricamento (KiB, valore negativo = dimensione in KiB)
+LOAD_CACHE_SIZE_KIB = 256 * 1024
+
+# Attesa massima (secondi) del lock di scrittura quando più caricamenti scrivono sullo stesso DB
+DEFAULT_BUSY_TIMEOUT = 600
+
+# Colonne di testo indicizzate di default (confronto sul nome, senza distinzione maiuscole/minuscole)
+DEFAULT_INDEX_NAME_HINTS = ("ENTID", "ENTNAME", "ENTITY", "SYSNM", "SYSTEM", "HOST")
+
+_SQLITE_TYPES = {
+    datamart_schema.INTEGER: "INTEGER",
+    datamart_schema.FLOAT: "REAL",
+    datamart_schema.BOOLEAN: "INTEGER",
+    datamart_schema.TIMESTAMP: "TEXT",
+    datamart_schema.STRING: "TEXT",
+}
+
+
+def quote(identifier: str) -> str:
+    """
+    Quota un identificatore SQLite (nome di tabella o colonna).
+    """
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def datamart_table(datamart_id) -> str:
+    """
+    Nome della tabella locale di un datamart.
+    """
+    return f"datamart_{datamart_id}"
+
+
+def connect(path: str = None) -> sqlite3.Connection:
+    """
+    Apre il database locale (default `DB/data.db`) in modalità WAL, con transazioni esplicite.
+
+    Più caricamenti contemporanei sullo stesso DB (es. `batch_export`) si alternano sul lock di
+    scrittura: chi lo trova occupato attende fino a `database.busy_timeout_sec` (config.json,
+    default 600s) invece di fallire dopo i 5s di default con `database is locked`.
+    """
+    timeout = utils.load_config().get("database", {}).get("busy_timeout_sec", DEFAULT_BUSY_TIMEOUT)
+    conn = sqlite3.connect(path or utils.get_db_path(), timeout=timeout, isolation_level=None,
+                           check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def to_sqlite_value(value, logical: str):
+    """
+    Converte un valore JSON nel formato usato nel DB: timestamp come testo ISO UTC
+    (`YYYY-MM-DD HH:MM:SS[.fff]`, ordinabile e leggibile dalle funzioni data di SQLite),
+    booleani come 0/1.
+    """
+    value = datamart_schema.convert_value(value, logical)
+    if value is None:
+        return None
+    if logical == datamart_schema.TIMESTAMP:
+        value = value.astimezone(timezone.utc)
+        text = value.strftime("%Y-%m-%d %H:%M:%S")
+        return f"{text}.{value.microsecond // 1000:03d}" if value.microsecond else text
+    if logical == datamart_schema.BOOLEAN:
+        return int(value)
+    return value
+
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone()
+    return row is not None
+
+
+def create_table(conn: sqlite3.Connection, table: str, columns: list, primary_key: list = None, replace: bool = False):
+    """
+    Crea la tabella tipizzata per le colonne del datamart.
+
+    @param table: Nome della tabella.
+    @param columns: Colonne tipizzate (`[{"name": ..., "type": ...}, ...]`).
+    @param primary_key: Colonne della chiave primaria (opzionale, necessaria per l'upsert).
+    @param replace: Se `True`, elimina prima la tabella esistente.
+    """
+    definitions = [f"{quote(column['name'])} {_SQLITE_TYPES.get(column['type'], 'TEXT')}" for column in columns]
+    if primary_key:
+        definitions.append(f"PRIMARY KEY ({', '.join(quote(name) for name in primary_key)})")
+    if replace:
+        conn.execute(f"DROP TABLE IF EXISTS {quote(table)}")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {quote(table)} ({', '.join(definitions)})")
+
+
+def staging_table(table: str) -> str:
+    """
+    Nome della tabella di appoggio usata durante il ricaricamento completo di `table`.
+    """
+    return f"{table}__loading"
+
+
+def drop_table(conn: sqlite3.Connection, table: str):
+    if conn.in_transaction:
+        conn.execute("ROLLBACK")
+    conn.execute(f"DROP TABLE IF EXISTS {quote(table)}")
+
+
+def swap_table(conn: sqlite3.Connection, source: str, table: str, datamart_id=None, rows: int = 0):
+    """
+    Sostituisce `table` con `source` (rinominata) in un'unica transazione.
+
+    Con `datamart_id` registra anche il caricamento completo (`record_full_load`) nella stessa
+    transazione, così tabella e stato di sync non possono risultare disallineati.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {quote(table)}")
+        conn.execute(f"ALTER TABLE {quote(source)} RENAME TO {quote(table)}")
+        if datamart_id is not None:
+            record_full_load(conn, datamart_id, table, rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def default_index_columns(columns: list) -> list:
+    """
+    Colonne da indicizzare di default: i timestamp e le colonne che identificano l'entità.
+    """
+    selected = []
+    for column in columns:
+        name = column["name"].upper()
+        if column["type"] == datamart_schema.TIMESTAMP or any(hint in name for hint in DEFAULT_INDEX_NAME_HINTS):
+            selected.append(column["name"])
+    return selected
+
+
+def create_indexes(conn: sqlite3.Connection, table: str, index_columns: list):
+    """
+    Crea (se mancanti) gli indici a colonna singola su `index_columns`.
+    """
+    for name in index_columns:
+        index = f"idx_{table}_{name}"
+        start = time.monotonic()
+        conn.execute(f"CREATE INDEX IF NOT EXISTS {quote(index)} ON {quote(table)} ({quote(name)})")
+        logging.info(f"🔹 Index {index} ready in {time.monotonic() - start:.1f}s")
+
+
+def _insert_sql(table: str, names: list, upsert_key: list = None) -> str:
+    placeholders = ", ".join("?" for _ in names)
+    sql = f"INSERT INTO {quote(table)} ({', '.join(quote(name) for name in names)}) VALUES ({placeholders})"
+    if upsert_key:
+        updates = [f"{quote(name)} = excluded.{quote(name)}" for name in names if name not in upsert_key]
+        conflict = f" ON CONFLICT ({', '.join(quote(name) for name in upsert_key)}) DO "
+        sql += conflict + (f"UPDATE SET {', '.join(updates)}" if updates else "NOTHING")
+    return sql
+
+
+def bulk_insert(conn: sqlite3.Connection, table: str, columns: list, records, upsert_key: list = None,
+                batch_size: int = DEFAULT_BATCH_SIZE, transaction_rows: int = DEFAULT_TRANSACTION_ROWS,
+                on_batch=None, before_commit=None) -> int:
+    """
+    Inserisce i record in `table` con `executemany` a blocchi, dentro transazioni grandi.
+
+    Durante il caricamento `synchronous` è disattivato e la cache di pagine ampliata;
+    le impostazioni vengono ripristinate al termine (anche in caso di errore, con rollback
+    dell'ultima transazione: i blocchi già confermati restano nel DB).
+
+    @param records: Iterabile di record (dict).
+    @param upsert_key: Se indicato, le righe con la stessa chiave vengono aggiornate (`ON CONFLICT ... DO UPDATE`).
+    @param on_batch: Callback opzionale `(rows_so_far)` invocata dopo ogni blocco.
+    @param before_commit: Callback opzionale `(rows)` eseguita dentro l'ultima transazione, prima del
+                          COMMIT (es. per salvare lo stato di un'estrazione insieme ai dati).
+    @return: Numero di righe inserite.
+    """
+    names = [column["name"] for column in columns]
+    converters = [(column["name"], column["type"]) for column in columns]
+    sql = _insert_sql(table, names, upsert_key)
+
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute(f"PRAGMA cache_size=-{LOAD_CACHE_SIZE_KIB}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    rows = 0
+    in_transaction = 0
+    batch = []
+    try:
+        # IMMEDIATE: il lock di scrittura viene preso subito (attendendo il busy timeout se occupato)
+        conn.execute("BEGIN IMMEDIATE")
+        for record in records:
+            batch.append(tuple(to_sqlite_value(record.get(name), logical) for name, logical in converters))
+            if len(batch) >= batch_size:
+                conn.executemany(sql, batch)
+                rows += len(batch)
+                in_transaction += len(batch)
+                batch.clear()
+                if in_transaction >= transaction_rows:
+                    conn.execute("COMMIT")
+                    conn.execute("BEGIN IMMEDIATE")
+                    in_transaction = 0
+                if on_batch:
+                    on_batch(rows)
+        if batch:
+            conn.executemany(sql, batch)
+            rows += len(batch)
+            if on_batch:
+                on_batch(rows)
+        if before_commit:
+            before_commit(rows)
+        conn.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA cache_size=-2000")
+        conn.execute("PRAGMA temp_store=DEFAULT")
+    return rows
+
+
+def create_unique_index(conn: sqlite3.Connection, table: str, key_columns: list):
+    """
+    Indice univoco sulla chiave di upsert (funziona anche su tabelle create senza chiave primaria).
+    """
+    index = f"uq_{table}"
+    conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {quote(index)} ON {quote(table)} "
+                 f"({', '.join(quote(name) for name in key_columns)})")
+
+
+# -- stato della sincronizzazione incrementale ----------------------------
+
+SYNC_STATE_TABLE = "_sync_state"
+
+
+def _ensure_sync_state(conn: sqlite3.Connection):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SYNC_STATE_TABLE} (
+            datamart_id      TEXT PRIMARY KEY,
+            table_name       TEXT NOT NULL,
+            watermark_column TEXT NOT NULL,
+            watermark        BLOB,  -- nessuna conversione: timestamp (testo) o chiave numerica
+            watermark_raw    TEXT,
+            rows             INTEGER NOT NULL DEFAULT 0,
+            synced_at        TEXT NOT NULL
+        )
+    """)
+
+
+def get_sync_state(conn: sqlite3.Connection, datamart_id) -> dict:
+    """
+    Stato dell'ultima sincronizzazione di un datamart, oppure `None` se non è mai stato sincronizzato.
+    """
+    _ensure_sync_state(conn)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute(f"SELECT * FROM {SYNC_STATE_TABLE} WHERE datamart_id = ?", (str(datamart_id),)).fetchone()
+    finally:
+        conn.row_factory = None
+    return dict(row) if row else None
+
+
+def save_sync_state(conn: sqlite3.Connection, datamart_id, table: str, watermark_column: str,
+                    watermark, watermark_raw: str):
+    """
+    Registra l'high-water mark raggiunto da una sincronizzazione.
+
+    `rows` è il numero di righe presenti nella tabella (non la somma delle righe scaricate:
+    le righe al confine del watermark vengono riscaricate e aggiornate a ogni sync).
+    """
+    _ensure_sync_state(conn)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {SYNC_STATE_TABLE} (datamart_id, table_name, watermark_column, watermark, watermark_raw, rows, synced_at)
+        VALUES (?, ?, ?, ?, ?, (SELECT COUNT(*) FROM {quote(table)}), datetime('now'))
+    """, (str(datamart_id), table, watermark_column, watermark, watermark_raw))
+
+
+def record_full_load(conn: sqlite3.Connection, datamart_id, table: str, rows: int):
+    """
+    Registra un caricamento completo (senza watermark): la tabella risulta aggiornata ad ora
+    e la prossima sincronizzazione incrementale ripartirà da zero.
+    """
+    _ensure_sync_state(conn)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {SYNC_STATE_TABLE} (datamart_id, table_name, watermark_column, watermark, watermark_raw, rows, synced_at)
+        VALUES (?, ?, '', NULL, NULL, ?, datetime('now'))
+    """, (str(datamart_id), table, rows))
+
+
+def get_sync_age(conn: sqlite3.Connection, datamart_id):
+    """
+    Secondi trascorsi dall'ultima sincronizzazione (o caricamento completo), oppure `None` se mai sincronizzato.
+    """
+    _ensure_sync_state(conn)
+    row = conn.execute(f"SELECT (julianday('now') - julianday(synced_at)) * 86400 FROM {SYNC_STATE_TABLE} "
+                       f"WHERE datamart_id = ?", (str(datamart_id),)).fetchone()
+    return row[0] if row else None
+
+
+def clear_sync_state(conn: sqlite3.Connection, datamart_id):
+    _ensure_sync_state(conn)
+    conn.execute(f"DELETE FROM {SYNC_STATE_TABLE} WHERE datamart_id = ?", (str(datamart_id),))
+
+
+# -- stato delle estrazioni CST a blocchi -----------------------------------
+
+EXTRACT_STATE_TABLE = "_extract_state"
+
+
+def _ensure_extract_state(conn: sqlite3.Connection):
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {EXTRACT_STATE_TABLE} (
+            extract_id   TEXT PRIMARY KEY,
+            source       TEXT NOT NULL,
+            mode         TEXT NOT NULL,
+            key_column   TEXT,
+            target       TEXT NOT NULL,
+            columns      TEXT,
+            next_page    INTEGER,
+            last_key_raw TEXT,
+            file_offset  INTEGER,
+            rows         INTEGER NOT NULL DEFAULT 0,
+            status       TEXT NOT NULL,
+            updated_at   TEXT NOT NULL
+        )
+    """)
+
+
+def get_extract_state(conn: sqlite3.Connection, extract_id: str) -> dict:
+    """
+    Stato di un'estrazione a blocchi (vedi `workflows.cst_extract`), oppure `None` se mai avviata.
+    """
+    _ensure_extract_state(conn)
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute(f"SELECT * FROM {EXTRACT_STATE_TABLE} WHERE extract_id = ?", (extract_id,)).fetchone()
+    finally:
+        conn.row_factory = None
+    return dict(row) if row else None
+
+
+def save_extract_state(conn: sqlite3.Connection, state: dict):
+    """
+    Registra lo stato di un'estrazione dopo un blocco completato (da chiamare nella stessa transazione dei dati).
+    """
+    _ensure_extract_state(conn)
+    names = ["extract_id", "source", "mode", "key_column", "target", "columns", "next_page", "last_key_raw",
+             "file_offset", "rows", "status"]
+    conn.execute(f"INSERT OR REPLACE INTO {EXTRACT_STATE_TABLE} ({', '.join(names)}, updated_at) "
+                 f"VALUES ({', '.join('?' for _ in names)}, datetime('now'))", [state.get(name) for name in names])
+
+
+def clear_extract_state(conn: sqlite3.Connection, extract_id: str):
+    _ensure_extract_state(conn)
+    conn.execute(f"DELETE FROM {EXTRACT_STATE_TABLE} WHERE extract_id = ?", (extract_id,))
@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import sqlite3
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CONFIG_TABLE = "etl_configurations"
+PROPERTY_TABLE = "etl_properties"
+SNAPSHOT_TABLE = "_etl_snapshot"
+
+# Campi in cui la configurazione può riportare le proprietà dell'ETL
+_PROPERTY_KEYS = ("properties", "etl_properties")
+
+
+def ensure_schema(conn: sqlite3.Connection):
+    """
+    Crea (se mancanti) le tabelle dello snapshot delle configurazioni ETL e i relativi indici.
+    """
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {CONFIG_TABLE} (
+            etl_id        TEXT PRIMARY KEY,
+            name          TEXT,
+            module_name   TEXT,
+            scheduler_id  INTEGER,
+            period_sec    INTEGER,
+            configuration TEXT NOT NULL,
+            fetched_at    TEXT NOT NULL
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {PROPERTY_TABLE} (
+            etl_id TEXT NOT NULL,
+            key    TEXT NOT NULL,
+            value  TEXT,
+            PRIMARY KEY (etl_id, key)
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+            id       INTEGER PRIMARY KEY CHECK (id = 1),
+            taken_at TEXT NOT NULL,
+            etls     INTEGER NOT NULL,
+            failed   INTEGER NOT NULL
+        )
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CONFIG_TABLE}_module_name ON {CONFIG_TABLE} (module_name)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CONFIG_TABLE}_scheduler_id ON {CONFIG_TABLE} (scheduler_id)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{CONFIG_TABLE}_period_sec ON {CONFIG_TABLE} (period_sec)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{PROPERTY_TABLE}_key ON {PROPERTY_TABLE} (key, value)")
+
+
+def _as_int(value):
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_fields(configuration: dict) -> dict:
+    """
+    Campi indicizzati di una configurazione ETL (`etl.name`, `etl.module_name`, `scheduling.scheduler_id`, `scheduling.period_sec`).
+    """
+    etl = configuration.get("etl") or {}
+    scheduling = configuration.get("scheduling") or {}
+    return {
+        "name": etl.get("name"),
+        "module_name": etl.get("module_name"),
+        "scheduler_id": _as_int(scheduling.get("scheduler_id")),
+        "period_sec": _as_int(scheduling.get("period_sec")),
+    }
+
+
+def extract_properties(configuration: dict) -> list:
+    """
+    Proprietà della configurazione come coppie `(chiave, valore testuale)`.
+
+    Accetta sia un dict `{chiave: valore}` sia una lista di `{"key"/"name": ..., "value": ...}`.
+    """
+    properties = next((configuration[key] for key in _PROPERTY_KEYS if configuration.get(key) is not None), None)
+    if properties is None:
+        properties = (configuration.get("etl") or {}).get("properties") or {}
+    if isinstance(properties, list):
+        properties = {item.get("key", item.get("name")): item.get("value")
+                      for item in properties if isinstance(item, dict) and item.get("key", item.get("name"))}
+    pairs = []
+    for key, value in properties.items():
+        if value is not None and not isinstance(value, str):
+            value = json.dumps(value)
+        pairs.append((str(key), value))
+    return pairs
+
+
+def save_configuration(conn: sqlite3.Connection, etl_id, configuration: dict):
+    """
+    Inserisce o aggiorna la configurazione di un ETL e le sue proprietà (da chiamare in una transazione).
+    """
+    etl_id = str(etl_id)
+    fields = extract_fields(configuration)
+    conn.execute(f"""
+        INSERT OR REPLACE INTO {CONFIG_TABLE} (etl_id, name, module_name, scheduler_id, period_sec, configuration, fetched_at)
+        VALUES (?, ?, ?, ?, ?, ?, datetime('now'))
+    """, (etl_id, fields["name"], fields["module_name"], fields["scheduler_id"], fields["period_sec"],
+          json.dumps(configuration)))
+    conn.execute(f"DELETE FROM {PROPERTY_TABLE} WHERE etl_id = ?", (etl_id,))
+    conn.executemany(f"INSERT OR REPLACE INTO {PROPERTY_TABLE} (etl_id, key, value) VALUES (?, ?, ?)",
+                     [(etl_id, key, value) for key, value in extract_properties(configuration)])
+
+
+def save_snapshot(conn: sqlite3.Connection, configurations: dict, failed: list = None):
+    """
+    Sostituisce lo snapshot con le configurazioni scaricate, in un'unica transazione.
+
+    @param configurations: `{etl_id: configurazione (dict)}` di tutti gli ETL scaricati.
+    @param failed: ETL la cui configurazione non è stata scaricata: la loro voce precedente
+                   (se presente) viene mantenuta, mentre gli ETL che non esistono più vengono eliminati.
+    """
+    ensure_schema(conn)
+    failed = [str(etl_id) for etl_id in failed or []]
+    keep = set(str(etl_id) for etl_id in configurations) | set(failed)
+    conn.execute("BEGIN")
+    try:
+        for etl_id, in conn.execute(f"SELECT etl_id FROM {CONFIG_TABLE}").fetchall():
+            if etl_id not in keep:
+                conn.execute(f"DELETE FROM {CONFIG_TABLE} WHERE etl_id = ?", (etl_id,))
+                conn.execute(f"DELETE FROM {PROPERTY_TABLE} WHERE etl_id = ?", (etl_id,))
+        for etl_id, configuration in configurations.items():
+            save_configuration(conn, etl_id, configuration)
+        conn.execute(f"INSERT OR REPLACE INTO {SNAPSHOT_TABLE} (id, taken_at, etls, failed) "
+                     f"VALUES (1, datetime('now'), ?, ?)", (len(configurations), len(failed)))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def get_snapshot_age(conn: sqlite3.Connection):
+    """
+    Secondi trascorsi dall'ultimo snapshot completo, oppure `None` se non è mai stato fatto.
+    """
+    ensure_schema(conn)
+    row = conn.execute(f"SELECT (julianday('now') - julianday(taken_at)) * 86400 FROM {SNAPSHOT_TABLE}").fetchone()
+    return row[0] if row else None
+
+
+def load_configurations(conn: sqlite3.Connection, etl_ids: list = None) -> list:
+    """
+    Configurazioni dello snapshot come `[(etl_id, configurazione), ...]` in ordine di ETL ID.
+    """
+    ensure_schema(conn)
+    sql = f"SELECT etl_id, configuration FROM {CONFIG_TABLE}"
+    params = []
+    if etl_ids is not None:
+        params = [str(etl_id) for etl_id in etl_ids]
+        sql += f" WHERE etl_id IN ({', '.join('?' for _ in params)})"
+    rows = conn.execute(sql + " ORDER BY CAST(etl_id AS INTEGER), etl_id", params).fetchall()
+    return [(etl_id, json.loads(configuration)) for etl_id, configuration in rows]
+
+
+def find_etls(conn: sqlite3.Connection, module_name: str = None, scheduler_id: int = None, period_sec: int = None,
+              property_key: str = None, property_value: str = None) -> list:
+    """
+    ETL ID dello snapshot che soddisfano tutti i criteri indicati (ricerche sugli indici).
+
+    @param property_key: Solo gli ETL che hanno questa proprietà ...
+    @param property_value: ... con questo valore (se indicato).
+    """
+    ensure_schema(conn)
+    conditions, params = [], []
+    for column, value in (("module_name", module_name), ("scheduler_id", scheduler_id), ("period_sec", period_sec)):
+        if value is not None:
+            conditions.append(f"c.{column} = ?")
+            params.append(value)
+    if property_key is not None:
+        subquery = f"SELECT etl_id FROM {PROPERTY_TABLE} WHERE key = ?"
+        params.append(property_key)
+        if property_value is not None:
+            subquery += " AND value = ?"
+            params.append(property_value)
+        conditions.append(f"c.etl_id IN ({subquery})")
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    rows = conn.execute(f"SELECT c.etl_id FROM {CONFIG_TABLE} c{where} ORDER BY CAST(c.etl_id AS INTEGER), c.etl_id",
+                        params).fetchall()
+    return [etl_id for etl_id, in rows]
@@ -0,0 +1,210 @@
+import os
+import re
+import sys
+import json
+import time
+import logging
+import sqlite3
+import threading
+import requests
+from collections import OrderedDict
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+import DB.datamart_store as datamart_store
+import API.datamart.cst_cache as cst_cache
+import API.datamart.post_datamart_cst as post_datamart_cst
+
+# Età massima (secondi) di una copia locale per essere interrogata senza passare dal server
+DEFAULT_MAX_AGE = 3600
+DEFAULT_CACHE_ENTRIES = 128
+DEFAULT_CACHE_TTL = 300
+
+_TABLE_PATTERN = re.compile(r'\bdatamart_(\d+)\b', re.IGNORECASE)
+
+
+def referenced_datamarts(sql: str) -> list:
+    """
+    ID dei datamart le cui tabelle locali (`datamart_<id>`) compaiono nella query.
+    """
+    return sorted(set(_TABLE_PATTERN.findall(sql)))
+
+
+class QueryCache:
+    """
+    Cache LRU in memoria dei risultati delle query locali.
+
+    La chiave include la "firma" del DB (mtime del file e del WAL): qualsiasi scrittura,
+    ad esempio una sincronizzazione, rende automaticamente obsoleti i risultati precedenti.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES, ttl: float = DEFAULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, rows: list):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), rows)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def _db_signature(db_path: str):
+    signature = []
+    for path in (db_path, f"{db_path}-wal"):
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def _settings() -> dict:
+    return utils.load_config().get("local_query", {})
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> QueryCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            settings = _settings()
+            _cache = QueryCache(settings.get("cache_entries", DEFAULT_CACHE_ENTRIES),
+                                settings.get("cache_ttl_sec", DEFAULT_CACHE_TTL))
+        return _cache
+
+
+def stale_datamarts(conn: sqlite3.Connection, datamart_ids: list, max_age: float) -> list:
+    """
+    Datamart mai sincronizzati o sincronizzati da più di `max_age` secondi.
+    """
+    stale = []
+    for datamart_id in datamart_ids:
+        age = datamart_store.get_sync_age(conn, datamart_id)
+        missing = not datamart_store.table_exists(conn, datamart_store.datamart_table(datamart_id))
+        if age is None or age > max_age or missing:
+            stale.append(datamart_id)
+    return stale
+
+
+def run_local(sql: str, params=(), db_path: str = None, use_cache: bool = True) -> list:
+    """
+    Esegue una query sul DB locale (in sola lettura) e restituisce le righe come dict.
+    """
+    db_path = db_path or utils.get_db_path()
+    key = (cst_cache.normalize_sql(sql), tuple(params), db_path, _db_signature(db_path))
+    cache = get_cache()
+    if use_cache:
+        rows = cache.get(key)
+        if rows is not None:
+            logging.info(f"🔹 Local query served from cache ({len(rows)} rows)")
+            return rows
+
+    start = time.monotonic()
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        conn.row_factory = sqlite3.Row
+        rows = [dict(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+    logging.info(f"✅ Local query: {len(rows)} rows in {(time.monotonic() - start) * 1000:.0f} ms")
+    if use_cache:
+        cache.put(key, rows)
+    return rows
+
+
+def _remote_records(remote_query: str, use_cache: bool = True) -> list:
+    """
+    Esegue la query CST sul server passando dalla cache su disco di `cst_cache` (come `post_cst_query`).
+    """
+    if use_cache:
+        cached = cst_cache.lookup(remote_query)
+        if cached is not None:
+            logging.info(f"💾 CST cache hit: {cst_cache.normalize_sql(remote_query)[:200]}")
+            result = json.loads(cached)
+            return result.get("data", []) if isinstance(result, dict) else result
+    fields = {}
+    records = list(post_datamart_cst.stream_cst_query_records(remote_query, fields=fields))
+    # Salvata nella stessa forma della risposta del server, così vale anche per `post_cst_query`
+    cst_cache.store(remote_query, json.dumps(dict(fields, data=records), separators=(",", ":")))
+    return records
+
+
+def query(sql: str, params=(), remote_query: str = None, datamart_ids: list = None, max_age: float = None,
+          db_path: str = None, use_cache: bool = True):
+    """
+    Interroga i datamart sincronizzati in locale, ricorrendo al server solo se la copia locale è vecchia.
+
+    Le tabelle locali si chiamano `datamart_<id>` (vedi `datamart_sync.sync_datamart` e
+    `datamart_data_to_sqlite.load_datamart_to_sqlite`, che creano anche gli indici su
+    timestamp ed entità). Se una delle tabelle usate non è stata sincronizzata negli
+    ultimi `max_age` secondi e `remote_query` è indicata, la query CST equivalente viene
+    eseguita sul server (`post_datamart_cst`, con la cache su disco di `cst_cache`);
+    altrimenti si usa comunque la copia locale.
+
+    @param sql: Query SQL sulle tabelle locali.
+    @param params: Parametri della query (placeholder `?`).
+    @param remote_query: Query CST equivalente da usare se la copia locale è vecchia.
+    @param datamart_ids: Datamart coinvolti (default: dedotti dai nomi `datamart_<id>` nella query).
+    @param max_age: Età massima della copia locale in secondi (default `local_query.max_age_sec` o 1h).
+    @param db_path: Percorso del DB SQLite (default `utils.get_db_path()`).
+    @param use_cache: Se `False`, non usa la cache dei risultati.
+    @return: Lista di righe (dict), oppure `None` in caso di errore.
+
+    Requirements:
+    - `config.json` may contain `local_query` with `max_age_sec`, `cache_entries`, `cache_ttl_sec`.
+    """
+    utils.setup_logging()
+    db_path = db_path or utils.get_db_path()
+    max_age = max_age if max_age is not None else _settings().get("max_age_sec", DEFAULT_MAX_AGE)
+    datamart_ids = [str(datamart_id) for datamart_id in (datamart_ids or referenced_datamarts(sql))]
+
+    try:
+        conn = datamart_store.connect(db_path)
+        try:
+            stale = stale_datamarts(conn, datamart_ids, max_age)
+        finally:
+            conn.close()
+
+        if stale:
+            if remote_query:
+                logging.info(f"🔹 Local copy of DataMart(s) {', '.join(stale)} is stale: running the CST query remotely")
+                return _remote_records(remote_query, use_cache)
+            logging.warning(f"⚠️ Local copy of DataMart(s) {', '.join(stale)} is stale or missing "
+                            f"and no remote query was given: using local data")
+
+        return run_local(sql, params, db_path, use_cache)
+
+    except sqlite3.Error as e:
+        logging.error(f"❌ Local query failed: {e}\n🔹 SQL: {cst_cache.normalize_sql(sql)}")
+        print("❌ Local query failed (check log)")
+    except (requests.RequestException, ValueError) as e:
+        logging.error(f"❌ Remote CST query failed: {e}")
+        print("❌ Local query failed (check log)")
+    return None
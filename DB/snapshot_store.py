@@ -0,0 +1,159 @@
+import os
+import sys
+import gzip
+import json
+import hashlib
+import logging
+import sqlite3
+import tempfile
+import threading
+
+# Add the project base path to sys.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utils
+
+# Le risposte più grandi di così (es. interi datamart) non vengono salvate come snapshot
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+
+
+class SnapshotStore:
+    """
+    Archivio delle risposte API indirizzato per contenuto.
+
+    Ogni payload è salvato una sola volta, compresso, in `objects/<hh>/<sha256>.json.gz`;
+    un indice SQLite (`index.db`) associa endpoint, chiave (es. `erid_123`) e momento del
+    download all'hash del contenuto. Payload identici scaricati in giorni diversi occupano
+    quindi spazio una volta sola, e "l'ultima configurazione scaricata per l'ERID X" è una
+    ricerca nell'indice.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "index.db"), isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots (
+                id         INTEGER PRIMARY KEY,
+                endpoint   TEXT NOT NULL,
+                key        TEXT NOT NULL,
+                fetched_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+                hash       TEXT NOT NULL,
+                size       INTEGER NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_lookup ON snapshots (endpoint, key, fetched_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_snapshots_hash ON snapshots (hash)")
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], f"{digest}.json.gz")
+
+    def put(self, endpoint: str, key: str, text: str) -> str:
+        """
+        Registra un payload (JSON serializzato) e restituisce il suo hash.
+        Il contenuto viene scritto solo se non è già presente nell'archivio.
+        """
+        data = text.encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(gzip.compress(data, compresslevel=6))
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        with self._lock:
+            self._conn.execute("INSERT INTO snapshots (endpoint, key, hash, size) VALUES (?, ?, ?, ?)",
+                               (endpoint, key, digest, len(data)))
+        return digest
+
+    def read(self, digest: str) -> str:
+        """
+        Contenuto (JSON serializzato) di un oggetto dell'archivio.
+        """
+        with gzip.open(self._object_path(digest), 'rt', encoding='utf-8') as f:
+            return f.read()
+
+    def history(self, endpoint: str, key: str, limit: int = None) -> list:
+        """
+        Snapshot di `endpoint`/`key` dal più recente: `[{"fetched_at", "hash", "size"}, ...]`.
+        """
+        sql = "SELECT fetched_at, hash, size FROM snapshots WHERE endpoint = ? AND key = ? ORDER BY fetched_at DESC, id DESC"
+        params = (endpoint, key)
+        if limit:
+            sql += " LIMIT ?"
+            params += (limit,)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [{"fetched_at": fetched_at, "hash": digest, "size": size} for fetched_at, digest, size in rows]
+
+    def latest(self, endpoint: str, key: str):
+        """
+        Ultimo payload scaricato per `endpoint`/`key` (decodificato), oppure `None`.
+        """
+        entries = self.history(endpoint, key, limit=1)
+        if not entries:
+            return None
+        return json.loads(self.read(entries[0]["hash"]))
+
+    def stats(self) -> dict:
+        """
+        Numero di snapshot, di oggetti distinti e byte logici (prima della deduplicazione).
+        """
+        with self._lock:
+            snapshots, objects, logical = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT hash), COALESCE(SUM(size), 0) FROM snapshots").fetchone()
+        return {"snapshots": snapshots, "objects": objects, "logical_bytes": logical}
+
+    def close(self):
+        self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SnapshotStore:
+    """
+    Archivio condiviso in `snapshots/` (fuori da `logs/`, quindi non cancellato da `utils.reset_log`).
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore(utils.get_snapshot_dir())
+        return _store
+
+
+def save_snapshot(api_name: str, details: str, text: str):
+    """
+    Salva una risposta API nell'archivio, secondo `response_capture.snapshots` in config.json.
+
+    Requirements:
+    - `config.json` may contain `response_capture.snapshots` with:
+        - `enabled`: Disattiva l'archivio se `false` (default `true`).
+        - `max_bytes`: Dimensione massima di una risposta archiviata (default 10 MB).
+    @return: L'hash del contenuto, oppure `None` se la risposta non è stata archiviata.
+    """
+    config = utils.load_config().get("response_capture", {}).get("snapshots", {})
+    if not config.get("enabled", True) or len(text) > config.get("max_bytes", DEFAULT_MAX_BYTES):
+        return None
+    try:
+        return get_store().put(api_name, details, text)
+    except (OSError, sqlite3.Error) as e:
+        logging.warning(f"⚠️ Unable to store snapshot of {api_name} [{details}]: {e}")
+        return None
+
+
+def latest_snapshot(api_name: str, details: str):
+    """
+    Ultima risposta archiviata per un'API e un dettaglio, es. `latest_snapshot("postEtl", "erid_123")`.
+    """
+    return get_store().latest(api_name, details)
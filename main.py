@@ -9,6 +9,13 @@ import workflows.change_scheduler as change_scheduler
 import workflows.change_module as change_module
 import API.datamart.retrive_datamart_data as retrive_datamart_data
 import workflows.datamart_data_to_csv as datamart_data_to_csv
+import workflows.datamart_data_to_parquet as datamart_data_to_parquet
+import workflows.datamart_data_to_sqlite as datamart_data_to_sqlite
+import workflows.datamart_sync as datamart_sync
+import workflows.batch_export as batch_export
+import workflows.datamart_rollup as datamart_rollup
+import workflows.cst_extract as cst_extract
+import workflows.etl_snapshot as etl_snapshot
 import workflows.domain_entities_to_csv as domain_entities_to_csv
 import API.datamart.retrieve_datamart_metadata as retrieve_datamart_metadata
 import API.datamart.get_datamart_summary as get_datamart_summary
@@ -25,7 +32,14 @@ def start():
 
 if __name__ == "__main__":
     start()
-    #datamart_data_to_csv.convert_datamart_json_to_csv()
+    #datamart_data_to_csv.convert_datamart_json_to_csv(3631)
+    #datamart_data_to_parquet.export_datamart_to_parquet(3569)
+    #datamart_data_to_sqlite.load_datamart_to_sqlite(3631)
+    #datamart_sync.sync_datamart(3631, key_columns=["TS", "ENTNAME"])
+    #batch_export.run_batch_export([3569, 3631], target="parquet")
+    #datamart_rollup.rollup_datamart(3631, period="day", target="csv")
+    #cst_extract.extract_cst(table_name="MY_CUSTOM_TABLE", chunk_size=50000)
+    #etl_snapshot.snapshot_etl_configurations()
     retrieve_datamart_metadata.get_datamart_metadata(3569)
     #get_datamart_summary.get_datamart_summary(3698)
     #get_cst_datamart.get_datamart_custom_table_data(3569)
@@ -2,7 +2,9 @@ import os
 import json
 import logging
 import glob
+import copy
 import shutil
+import threading
 # Funzione per ottenere il percorso base del progetto
 def get_base_dir():
     return os.path.dirname(os.path.abspath(__file__))
@@ -19,6 +21,18 @@ def get_response_dir():
     os.makedirs(response_dir, exist_ok=True)  # Crea la cartella response se non esiste
     return response_dir
 
+# Funzione per ottenere la cartella cache (sottocartella opzionale)
+def get_cache_dir(name=None):
+    cache_dir = os.path.join(get_base_dir(), 'cache', name) if name else os.path.join(get_base_dir(), 'cache')
+    os.makedirs(cache_dir, exist_ok=True)  # Crea la cartella cache se non esiste
+    return cache_dir
+
+# Funzione per ottenere la cartella degli snapshot delle risposte (non viene svuotata da reset_log)
+def get_snapshot_dir():
+    snapshot_dir = os.path.join(get_base_dir(), 'snapshots')
+    os.makedirs(snapshot_dir, exist_ok=True)  # Crea la cartella snapshots se non esiste
+    return snapshot_dir
+
 # ✅ **Percorso fisso per il log globale**
 def get_log_path():
     return os.path.join(get_logs_dir(), 'LOG.log')
@@ -27,34 +41,98 @@ def get_log_path():
 def get_response_json_path(api_name, details):
     return os.path.join(get_response_dir(), f'RESPONSE_{api_name}_{details}.json')
 
-# Funzione per caricare la configurazione JSON
-def load_config():
-    config_path = os.path.join(get_base_dir(), 'config.json')
-    if os.path.exists(config_path):
+# Percorso del database SQLite locale (DB/data.db, sovrascrivibile da `database.path` in config.json)
+def get_db_path():
+    path = os.path.join(get_base_dir(), load_config().get("database", {}).get("path") or os.path.join('DB', 'data.db'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def get_config_path():
+    return os.path.join(get_base_dir(), 'config.json')
+
+def get_credentials_path():
+    return os.path.join(get_base_dir(), 'EnvironmentCredentials', 'credentials.json')
+
+class CachedJsonFile:
+    """
+    File JSON letto una sola volta e tenuto in memoria.
+
+    Il file viene riletto solo quando cambia il suo mtime (o la dimensione), così
+    le chiamate ripetute a `load_config()` / `load_credentials()` non toccano il disco.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._signature = None
+        self._data = {}
+
+    def _stat_signature(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        """
+        Restituisce una copia del contenuto del file (dict vuoto se mancante, vuoto o corrotto).
+        """
+        signature = self._stat_signature()
+        with self._lock:
+            if signature != self._signature:
+                self._data = self._read() if signature is not None else {}
+                self._signature = signature
+            return copy.deepcopy(self._data)
+
+    def _read(self):
         try:
-            with open(config_path, 'r') as f:
+            with open(self.path, 'r') as f:
                 return json.load(f) or {}  # Se il file è vuoto, ritorna un dict vuoto
         except json.JSONDecodeError:
-            print(f"⚠️  Errore: {config_path} è corrotto. Ricreazione del file...")
-            return {}  
-    return {}  
+            print(f"⚠️  Errore: {self.path} è corrotto. Ricreazione del file...")
+            return {}
+
+    def invalidate(self):
+        with self._lock:
+            self._signature = None
+
+class Settings:
+    """
+    Impostazioni del progetto (`config.json` e credenziali), caricate una volta per processo.
+    """
+
+    def __init__(self):
+        self._config = CachedJsonFile(get_config_path())
+        self._credentials = CachedJsonFile(get_credentials_path())
+
+    @property
+    def config(self):
+        return self._config.load()
+
+    @property
+    def credentials(self):
+        return self._credentials.load()
+
+    def reload(self):
+        self._config.invalidate()
+        self._credentials.invalidate()
+
+settings = Settings()
+
+# Funzione per caricare la configurazione JSON
+def load_config():
+    return settings.config
 
 def load_credentials():
-    credentials_path = os.path.join(get_base_dir() ,'EnvironmentCredentials', 'credentials.json')
-    if os.path.exists(credentials_path):
-        try:
-            with open(credentials_path, 'r') as f:
-                return json.load(f) or {}  # Se il file è vuoto, ritorna un dict vuoto
-        except json.JSONDecodeError:
-            print(f"⚠️  Errore: {credentials_path} è corrotto. Ricreazione del file...")
-            return {}  
-    return {}  
+    return settings.credentials
 
 
 # Funzione per salvare la configurazione nel file JSON
 def save_config(config):
-    with open(os.path.join(get_base_dir(), 'config.json'), 'w') as f:
+    with open(get_config_path(), 'w') as f:
         json.dump(config, f, indent=4)
+    settings.reload()
 
 # Funzione per aggiungere un campo alla configurazione
 def update_config(key, value):
@@ -62,19 +140,37 @@ def update_config(key, value):
     config.setdefault("path", {})[key] = value  
     save_config(config)
 
-# ✅ **Funzione per configurare il logging globale**
-def setup_logging():
-    log_path = get_log_path()
+_logging_lock = threading.Lock()
+_logging_configured = False
 
-    # ✅ Resetta i gestori esistenti prima di riconfigurarlo
-    for handler in logging.root.handlers[:]:
-        logging.root.removeHandler(handler)
+# ✅ **Funzione per configurare il logging globale**
+def setup_logging(force=False):
+    """
+    Configura il logging globale su `logs/LOG.log`.
 
-    logging.basicConfig(
-        filename=log_path,
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s'
-    )
+    La configurazione avviene una sola volta per processo: le chiamate successive
+    non fanno nulla, a meno che `force=True` (es. dopo aver eliminato il file di log).
+    """
+    global _logging_configured
+    log_path = get_log_path()
+    if _logging_configured and not force:
+        return log_path
+
+    with _logging_lock:
+        if _logging_configured and not force:
+            return log_path
+
+        # ✅ Resetta i gestori esistenti prima di riconfigurarlo
+        for handler in logging.root.handlers[:]:
+            logging.root.removeHandler(handler)
+            handler.close()
+
+        logging.basicConfig(
+            filename=log_path,
+            level=logging.INFO,
+            format='%(asctime)s - %(levelname)s - %(message)s'
+        )
+        _logging_configured = True
     return log_path  # Restituisce il percorso del file log
 
 # ✅ **Funzione per eliminare il file di log e tutti i file nella cartella response**
@@ -95,7 +191,7 @@ def reset_log():
             print(f"🗑️ Eliminato file nella response: {f}")
 
     # Dopo la pulizia, ricrea il file di log
-    setup_logging()
+    setup_logging(force=True)
 
 def remove_pycache():
     """
@@ -0,0 +1,206 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import API.http_client as http_client
+import API.datamart.paging as paging
+import API.progress as api_progress
+import workflows.datamart_data_to_csv as datamart_data_to_csv
+import workflows.datamart_data_to_parquet as datamart_data_to_parquet
+import workflows.datamart_data_to_sqlite as datamart_data_to_sqlite
+import workflows.datamart_sync as datamart_sync
+
+TARGETS = ("csv", "parquet", "sqlite", "sync")
+DEFAULT_TARGET = "csv"
+# Budget di memoria complessivo e stima della dimensione di un record decodificato
+DEFAULT_MEMORY_BUDGET_MB = 1024
+DEFAULT_ROW_BYTES = 1024
+
+
+def load_jobs(source, target: str = DEFAULT_TARGET) -> list:
+    """
+    Legge l'elenco delle esportazioni da fare.
+
+    @param source: Lista di ID / dict, oppure percorso di un file:
+                   - `.json`: lista di ID o di `{"datamart_id": ..., "target": ..., "output": ...}`;
+                   - altro: una riga per datamart `<id> [target] [output]` (separatori spazio o virgola, `#` per i commenti).
+    @param target: Formato di destinazione di default (`csv`, `parquet`, `sqlite`, `sync`).
+    @return: Lista di job `{"datamart_id", "target", "output"}`.
+    """
+    if isinstance(source, str):
+        with open(source, 'r', encoding='utf-8') as f:
+            if source.lower().endswith(".json"):
+                entries = json.load(f)
+            else:
+                entries = []
+                for line in f:
+                    fields = line.split("#", 1)[0].replace(",", " ").split()
+                    if fields:
+                        entries.append(dict(zip(("datamart_id", "target", "output"), fields)))
+    else:
+        entries = source
+
+    jobs = []
+    for entry in entries:
+        if not isinstance(entry, dict):
+            entry = {"datamart_id": entry}
+        job = {
+            "datamart_id": str(entry["datamart_id"]),
+            "target": entry.get("target") or target,
+            "output": entry.get("output"),
+        }
+        if job["target"] not in TARGETS:
+            raise ValueError(f"Unknown export target '{job['target']}' for DataMart {job['datamart_id']}")
+        jobs.append(job)
+    return jobs
+
+
+def plan_workers(jobs: int, max_connections: int, page_concurrency: int, memory_budget_mb: int,
+                 page_size: int, row_bytes: int) -> int:
+    """
+    Numero di datamart esportati contemporaneamente.
+
+    Ogni export usa fino a `page_concurrency` connessioni e tiene in memoria fino a
+    `2 * page_concurrency` pagine (una sola se sequenziale); il numero di export paralleli
+    è il massimo che rispetta sia il budget di connessioni sia quello di memoria.
+    """
+    pages_per_job = 2 * page_concurrency if page_concurrency > 1 else 1
+    job_bytes = pages_per_job * page_size * row_bytes
+    by_connections = max_connections // page_concurrency
+    by_memory = (memory_budget_mb * 1024 * 1024) // job_bytes
+    return max(1, min(jobs, by_connections, by_memory))
+
+
+def _run_job(job: dict, output_dir: str, page_size: int, page_concurrency: int,
+             progress: api_progress.TransferProgress):
+    datamart_id, target, output = job["datamart_id"], job["target"], job["output"]
+    if target == "csv":
+        output = output or os.path.join(output_dir, f"Datamart_{datamart_id}.csv")
+        return datamart_data_to_csv.convert_datamart_json_to_csv(datamart_id, output, page_size, page_concurrency,
+                                                                 progress=progress)
+    if target == "parquet":
+        output = output or os.path.join(output_dir, f"Datamart_{datamart_id}.parquet")
+        return datamart_data_to_parquet.export_datamart_to_parquet(datamart_id, output, page_size, page_concurrency,
+                                                                   progress=progress)
+    if target == "sqlite":
+        return datamart_data_to_sqlite.load_datamart_to_sqlite(datamart_id, db_path=output, page_size=page_size,
+                                                               concurrency=page_concurrency, progress=progress)
+    return datamart_sync.sync_datamart(datamart_id, db_path=output, page_size=page_size,
+                                       concurrency=page_concurrency, progress=progress)
+
+
+def run_batch_export(source, target: str = DEFAULT_TARGET, output_dir: str = None, max_connections: int = None,
+                     memory_budget_mb: int = DEFAULT_MEMORY_BUDGET_MB, page_size: int = paging.DEFAULT_PAGE_SIZE,
+                     page_concurrency: int = 1, row_bytes: int = DEFAULT_ROW_BYTES, deadline_minutes: float = None):
+    """
+    Esporta più datamart in parallelo, con avanzamento per datamart e fallimenti isolati.
+
+    Gli export partono in parallelo entro un budget globale di connessioni (default: il
+    pool del client HTTP) e di memoria (pagine in volo × dimensione stimata dei record).
+    Per ogni datamart il log riporta righe, byte, throughput ed ETA; un errore su un
+    datamart viene registrato e non interrompe gli altri. Con `deadline_minutes` i job
+    non ancora avviati allo scadere della finestra vengono saltati. I job `sqlite`/`sync`
+    sullo stesso DB scaricano in parallelo e si alternano sulle transazioni di scrittura
+    (vedi `datamart_store.connect`).
+
+    @param source: Lista di ID / job oppure file (vedi `load_jobs`).
+    @param target: Formato di default (`csv`, `parquet`, `sqlite`, `sync`).
+    @param output_dir: Cartella dei file esportati (default `logs/`).
+    @param max_connections: Connessioni HTTP contemporanee in totale.
+    @param memory_budget_mb: Memoria complessiva per le pagine in volo (MB).
+    @param page_size: Record per pagina.
+    @param page_concurrency: Pagine scaricate in parallelo per ogni datamart.
+    @param row_bytes: Dimensione stimata di un record decodificato (byte).
+    @param deadline_minutes: Durata massima della finestra di esportazione.
+    @return: Lista dei risultati (`datamart_id`, `target`, `status`, `result`, `rows`, `bytes`, `seconds`, `error`).
+    """
+    utils.setup_logging()
+    jobs = load_jobs(source, target)
+    output_dir = output_dir or utils.get_logs_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    if max_connections is None:
+        max_connections = utils.load_config().get("http", {}).get("pool_size", http_client.DEFAULT_POOL_SIZE)
+    workers = plan_workers(len(jobs), max_connections, page_concurrency, memory_budget_mb, page_size, row_bytes)
+    deadline = time.monotonic() + deadline_minutes * 60 if deadline_minutes else None
+
+    logging.info(f"🔹 Batch export of {len(jobs)} DataMart(s): {workers} in parallel, "
+                 f"{page_concurrency} page download(s) each, budget {max_connections} connections / {memory_budget_mb} MB")
+    print(f"🔹 Batch export of {len(jobs)} DataMart(s), {workers} in parallel")
+
+    results = [None] * len(jobs)
+    done = 0
+    lock = threading.Lock()
+    start = time.monotonic()
+
+    def run(index: int, job: dict):
+        nonlocal done
+        name = f"DataMart {job['datamart_id']} ({job['target']})"
+        progress = api_progress.TransferProgress(name)
+        result = {"datamart_id": job["datamart_id"], "target": job["target"], "status": "failed",
+                  "result": None, "error": None}
+        if deadline is not None and time.monotonic() > deadline:
+            result["status"] = "skipped"
+            result["error"] = "export window exceeded"
+            logging.warning(f"⚠️ {name} skipped: export window exceeded")
+        else:
+            try:
+                outcome = _run_job(job, output_dir, page_size, page_concurrency, progress)
+                if outcome is not None:
+                    result["status"], result["result"] = "ok", outcome
+                else:
+                    result["error"] = "export returned no result (check log)"
+            except Exception as e:
+                result["error"] = str(e)
+                logging.error(f"❌ {name} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        progress.finish()
+        result.update({key: progress.snapshot()[key] for key in ("rows", "bytes", "seconds")})
+        results[index] = result
+        with lock:
+            done += 1
+            logging.info(f"{'✅' if result['status'] == 'ok' else '❌'} [{done}/{len(jobs)}] {progress.describe()} "
+                         f"in {progress.elapsed:.1f}s: {result['status']}")
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bhco-export") as executor:
+        for index, job in enumerate(jobs):
+            executor.submit(run, index, job)
+
+    ok = sum(1 for result in results if result["status"] == "ok")
+    failed = [result["datamart_id"] for result in results if result["status"] != "ok"]
+    total_rows = sum(result["rows"] for result in results)
+    total_bytes = sum(result["bytes"] for result in results)
+    logging.info(f"✅ Batch export finished in {time.monotonic() - start:.1f}s: {ok}/{len(jobs)} ok, "
+                 f"{total_rows} rows, {api_progress.format_bytes(total_bytes)}")
+    if failed:
+        logging.error(f"❌ Batch export failures: {', '.join(failed)}")
+        print(f"❌ Batch export: {ok}/{len(jobs)} ok, failed: {', '.join(failed)} (check log)")
+    else:
+        print(f"✅ Batch export: {ok}/{len(jobs)} ok")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export several BHCO DataMarts concurrently.")
+    parser.add_argument("datamart_ids", nargs="*", help="IDs of the DataMarts to export")
+    parser.add_argument("-f", "--file", help="file with one '<id> [target] [output]' per line, or a .json job list")
+    parser.add_argument("-t", "--target", choices=TARGETS, default=DEFAULT_TARGET, help="default export target")
+    parser.add_argument("-o", "--output-dir", help="output folder (default: logs/)")
+    parser.add_argument("--max-connections", type=int, help="total concurrent HTTP connections")
+    parser.add_argument("--memory-budget-mb", type=int, default=DEFAULT_MEMORY_BUDGET_MB, help="memory for in-flight pages")
+    parser.add_argument("--page-size", type=int, default=paging.DEFAULT_PAGE_SIZE, help="records per page")
+    parser.add_argument("--page-concurrency", type=int, default=1, help="pages downloaded in parallel per DataMart")
+    parser.add_argument("--deadline-minutes", type=float, help="skip exports not started within this window")
+    args = parser.parse_args()
+    if not args.file and not args.datamart_ids:
+        parser.error("provide DataMart IDs or --file")
+
+    batch = run_batch_export(args.file or args.datamart_ids, args.target, args.output_dir, args.max_connections,
+                             args.memory_budget_mb, args.page_size, args.page_concurrency,
+                             deadline_minutes=args.deadline_minutes)
+    sys.exit(0 if all(result["status"] == "ok" for result in batch) else 1)
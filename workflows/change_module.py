@@ -3,39 +3,32 @@ import os
 import time
 import logging
 import traceback
-import json
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import utils
-import API.exporting_etls_config.GET_all_etls as GET_all_etls
-import API.exporting_etls_config.POST_etl_configuration as POST_etl_configuration
 import API.updating_etls_config.POST_etl_config as POST_etl_config  # <-- patch_etl_configuration dovrebbe trovarsi qui
+import workflows.etl_snapshot as etl_snapshot
 
 def change_module():
-    etls_JSON = GET_all_etls.get_all_etls()
-    list_of_etls = [etl['etl_id'] for etl in etls_JSON]
-
-    for erid in list_of_etls:
-        # Recupero della configurazione ETL corrente
-        response_str = POST_etl_configuration.post_etl_configuration(erid)
-        if not response_str:
-            continue
-
-        try:
-            details_etls = json.loads(response_str)
-        except json.JSONDecodeError:
-            continue
-
+    # Configurazioni ETL correnti dallo snapshot locale (riscaricato in parallelo solo se vecchio)
+    for erid, details_etls in etl_snapshot.get_etl_configurations():
         if "etl" not in details_etls or "module_name" not in details_etls["etl"]:
             continue
 
         print(f"ETL {erid} module name --> {details_etls['etl']['module_name']}")
 
         if details_etls['etl']['module_name'] == "com.neptuny.cpit.etl.extractor.DMSQLE":
+            # Il PATCH parte dalla configurazione attuale del server, non dalla copia (fino a un'ora) dello snapshot
+            details_etls = etl_snapshot.refresh_etl_configuration(erid)
+            if details_etls is None:
+                logging.warning(f"⚠️ ETL {erid}: unable to re-read the current configuration, skipped")
+                continue
+            if details_etls.get('etl', {}).get('module_name') != "com.neptuny.cpit.etl.extractor.DMSQLE":
+                continue
             details_etls['etl']['module_name'] = "com.neptuny.cpit.etl.loader.seriesMessagL"
             input("🔹Confirm PATCH")
             POST_etl_config.patch_etl_configuration(erid, details_etls)
             time.sleep(3)
-            POST_etl_configuration.post_etl_configuration(erid)
+            etl_snapshot.refresh_etl_configuration(erid)
 
                 
\ No newline at end of file
@@ -4,32 +4,26 @@ import time
 import logging
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import utils
-import API.exporting_etls_config.GET_all_etls as GET_all_etls
-import API.exporting_etls_config.POST_etl_configuration as POST_etl_configuration
 import API.updating_etls_config.PUT_etl_config as PUT_etl_config
-import json
+import workflows.etl_snapshot as etl_snapshot
 
 def change_scheduler():
-    etls_JSON = GET_all_etls.get_all_etls()
-    list_of_etls = [etl['etl_id'] for etl in etls_JSON]
-
-    for erid in list_of_etls:
-        response_str = POST_etl_configuration.post_etl_configuration(erid)
-        if not response_str:
-            continue
-
-        try:
-            details_etls = json.loads(response_str)
-        except json.JSONDecodeError:
-            continue
-
+    # Le configurazioni vengono lette dallo snapshot locale (riscaricato in parallelo solo se vecchio)
+    for erid, details_etls in etl_snapshot.get_etl_configurations():
         if "scheduling" not in details_etls or "scheduler_id" not in details_etls["scheduling"]:
             continue
 
         if details_etls['scheduling']['scheduler_id'] != 1:
-            details_etls['scheduling']['scheduler_id'] = 1
+            # Il PUT parte dalla configurazione attuale del server, non dalla copia (fino a un'ora) dello snapshot
+            details_etls = etl_snapshot.refresh_etl_configuration(erid)
+            if details_etls is None:
+                logging.warning(f"⚠️ ETL {erid}: unable to re-read the current configuration, skipped")
+                continue
+            if details_etls.get('scheduling', {}).get('scheduler_id') == 1:
+                continue
+            details_etls.setdefault('scheduling', {})['scheduler_id'] = 1
             details_etls['scheduling']['period_sec'] = 86400
             input("Confirm PUT")
             PUT_etl_config.put_etl_configuration(erid, details_etls)
             time.sleep(3)
-            POST_etl_configuration.post_etl_configuration(erid)
\ No newline at end of file
+            etl_snapshot.refresh_etl_configuration(erid)
\ No newline at end of file
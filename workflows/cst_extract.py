@@ -0,0 +1,286 @@
+import os
+import re
+import csv
+import sys
+import json
+import time
+import hashlib
+import logging
+import sqlite3
+import argparse
+import itertools
+import traceback
+import requests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import DB.datamart_store as datamart_store
+import API.datamart.paging as paging
+import API.datamart.datamart_schema as datamart_schema
+import API.datamart.cst_cache as cst_cache
+import API.datamart.post_cst_data as post_cst_data
+import API.datamart.post_datamart_cst as post_datamart_cst
+
+TARGETS = ("sqlite", "csv", "jsonl")
+DEFAULT_TARGET = "sqlite"
+DEFAULT_CHUNK_SIZE = 50000
+MODE_PAGE = "page"
+MODE_KEY = "key"
+# Record della prima pagina usati per dedurre le colonne
+_SCHEMA_SAMPLE = 1000
+
+
+def default_extract_id(query: str = None, table_name: str = None) -> str:
+    """
+    Identificativo di un'estrazione (chiave dello stato di ripresa): `table_<nome>` oppure `query_<hash>`.
+    """
+    if table_name:
+        return f"table_{table_name}"
+    return "query_" + hashlib.sha1(cst_cache.normalize_sql(query).encode("utf-8")).hexdigest()[:12]
+
+
+def _slug(extract_id: str) -> str:
+    return re.sub(r'\W+', '_', extract_id).strip('_')
+
+
+def _sql_literal(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def chunk_query(base_sql: str, key_column: str, last_key=None) -> str:
+    """
+    Query di un blocco per intervalli di chiave: le righe con `key_column` maggiore dell'ultima
+    chiave estratta, in ordine di chiave (il numero di righe è limitato da `options.pagesize`).
+    Il nome della colonna è quotato come identificatore, quindi va indicato esattamente come
+    compare nei record (maiuscole/minuscole comprese).
+    """
+    base_sql = base_sql.strip().rstrip(";")
+    key = datamart_store.quote(key_column)
+    where = f" WHERE {key} > {_sql_literal(last_key)}" if last_key is not None else ""
+    return f"SELECT * FROM ({base_sql}) cst_chunk{where} ORDER BY {key}"
+
+
+def _chunk_records(query: str, table_name: str, state: dict, chunk_size: int, fields: dict):
+    if state["mode"] == MODE_KEY:
+        base_sql = query or f"SELECT * FROM {table_name}"
+        last_key = json.loads(state["last_key_raw"]) if state["last_key_raw"] is not None else None
+        return post_datamart_cst.stream_cst_query_records(chunk_query(base_sql, state["key_column"], last_key),
+                                                          paging.FIRST_PAGE, chunk_size, fields)
+    if table_name:
+        return post_cst_data.stream_custom_table_records(table_name, state["next_page"], chunk_size, fields)
+    return post_datamart_cst.stream_cst_query_records(query, state["next_page"], chunk_size, fields)
+
+
+def _write_sqlite_chunk(conn: sqlite3.Connection, table: str, columns: list, records, first: bool, finish):
+    if first:
+        datamart_store.create_table(conn, table, columns, replace=True)
+    datamart_store.bulk_insert(conn, table, columns, records, transaction_rows=float("inf"), before_commit=finish)
+
+
+def _write_file_chunk(conn: sqlite3.Connection, path: str, target: str, columns: list, records, state: dict,
+                      first: bool, finish):
+    if first:
+        open(path, 'w').close()
+    else:
+        # Scarta quanto scritto dopo l'ultimo blocco confermato (es. run interrotto a metà blocco)
+        with open(path, 'r+b') as f:
+            f.truncate(state["file_offset"])
+
+    rows = 0
+    with open(path, 'a', newline='', encoding='utf-8') as f:
+        if target == "csv":
+            writer = csv.DictWriter(f, fieldnames=[column["name"] for column in columns], extrasaction='ignore')
+            if first:
+                writer.writeheader()
+            for record in records:
+                writer.writerow(record)
+                rows += 1
+        else:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+                rows += 1
+        f.flush()
+        os.fsync(f.fileno())
+        state["file_offset"] = f.tell()
+    conn.execute("BEGIN")
+    finish(rows)
+    conn.execute("COMMIT")
+
+
+def extract_cst(query: str = None, table_name: str = None, target: str = DEFAULT_TARGET, output: str = None,
+                chunk_size: int = DEFAULT_CHUNK_SIZE, key_column: str = None, extract_id: str = None,
+                db_path: str = None, restart: bool = False, progress=None):
+    """
+    Estrae il risultato di una query CST (o un'intera custom table) a blocchi, verso il DB locale o un file.
+
+    Invece di una sola risposta con `pagesize: -1`, il risultato viene chiesto a blocchi di
+    `chunk_size` righe: per pagine (`options.pagenum`) oppure, con `key_column`, per intervalli
+    di chiave (`WHERE key > <ultima chiave> ORDER BY key`, più stabile se la tabella cambia
+    durante l'estrazione; la chiave deve essere univoca). Ogni blocco è analizzato in streaming
+    e scritto mentre arriva; a blocco completato lo stato (pagina o ultima chiave, righe, offset
+    del file) viene salvato in `_extract_state` nella stessa transazione dei dati. Se il run si
+    interrompe, rilanciandolo con gli stessi parametri riparte dal primo blocco non confermato.
+    Le colonne (`sqlite`, `csv`) sono dedotte dai primi record: i valori di campi che compaiono
+    solo dopo vengono scartati, ma segnalati e contati nel log; `jsonl` conserva ogni campo.
+
+    @param query: Query CST da estrarre (in alternativa a `table_name`).
+    @param table_name: Custom table da estrarre per intero.
+    @param target: `sqlite` (tabella nel DB locale), `csv` oppure `jsonl` (un record JSON per riga).
+    @param output: Tabella (default `cst_<id estrazione>`) o percorso del file (default `logs/CST_<id estrazione>.<target>`).
+    @param chunk_size: Righe per blocco.
+    @param key_column: Colonna per i blocchi a intervalli di chiave (default: blocchi per pagina).
+    @param extract_id: Identificativo dello stato di ripresa (default `default_extract_id`).
+    @param db_path: DB SQLite per la tabella e per lo stato (default `utils.get_db_path()`).
+    @param restart: Se `True`, ignora lo stato salvato e riparte da zero.
+    @param progress: `TransferProgress` opzionale aggiornato a ogni blocco.
+    @return: Numero totale di righe estratte, oppure `None` in caso di errore (lo stato resta per la ripresa).
+    """
+    utils.setup_logging()
+    if bool(query) == bool(table_name):
+        logging.error("❌ Provide either a CST query or a custom table name.")
+        print("❌ CST extraction failed (check log)")
+        return None
+    if target not in TARGETS:
+        logging.error(f"❌ Unknown extraction target '{target}' (use one of: {', '.join(TARGETS)})")
+        print("❌ CST extraction failed (check log)")
+        return None
+
+    extract_id = extract_id or default_extract_id(query, table_name)
+    mode = MODE_KEY if key_column else MODE_PAGE
+    if target == "sqlite":
+        output = output or f"cst_{_slug(extract_id)}"
+    else:
+        output = output or os.path.join(utils.get_logs_dir(), f"CST_{_slug(extract_id)}.{target}")
+    source = query or table_name
+    start = time.monotonic()
+
+    try:
+        conn = datamart_store.connect(db_path)
+    except sqlite3.Error as e:
+        logging.error(f"❌ Unable to open the local DB: {e}")
+        print("❌ CST extraction failed (check log)")
+        return None
+
+    state = None
+    try:
+        state = datamart_store.get_extract_state(conn, extract_id)
+        expected = {"source": source, "mode": mode, "key_column": key_column, "target": f"{target}:{output}"}
+        if state and not restart and state["status"] != "done" \
+                and all(state[name] == value for name, value in expected.items()) \
+                and (target == "sqlite" or os.path.exists(output)):
+            where = f"page {state['next_page']}" if mode == MODE_PAGE else f"{key_column} > {state['last_key_raw']}"
+            logging.info(f"🔄 Resuming extraction {extract_id} from {where} ({state['rows']} rows already extracted)")
+        else:
+            if state and state["status"] != "done" and not restart:
+                logging.warning(f"⚠️ Saved state of extraction {extract_id} does not match the request: starting over")
+            state = dict(expected, extract_id=extract_id, columns=None, next_page=paging.FIRST_PAGE,
+                         last_key_raw=None, file_offset=0, rows=0, status="running")
+            logging.info(f"🔹 Chunked extraction {extract_id} ({mode} chunks of {chunk_size} rows) into {output}")
+
+        columns = json.loads(state["columns"]) if state["columns"] else None
+        dropped = {}
+        while True:
+            chunk_start = time.monotonic()
+            fields = {}
+            records = _chunk_records(query, table_name, state, chunk_size, fields)
+            first = columns is None
+            if first:
+                sample = list(itertools.islice(records, _SCHEMA_SAMPLE))
+                columns = datamart_schema.infer_columns(sample)
+                records = itertools.chain(sample, records)
+                if not columns:
+                    state["status"] = "done"
+                    datamart_store.save_extract_state(conn, state)
+                    logging.warning(f"⚠️ Extraction {extract_id}: the result is empty")
+                    break
+
+            last = {"key": state["last_key_raw"]}
+            known = {column["name"] for column in columns}
+
+            def tracked():
+                for record in records:
+                    if target != "jsonl":
+                        # Colonne dedotte dal primo blocco: i campi comparsi dopo non hanno una colonna
+                        for name in record.keys() - known:
+                            if record[name] is not None:
+                                if name not in dropped:
+                                    logging.warning(f"⚠️ Extraction {extract_id}: field {name} is not in the columns "
+                                                    f"inferred from the first chunk, its values are dropped")
+                                dropped[name] = dropped.get(name, 0) + 1
+                    if key_column:
+                        if record.get(key_column) is None:
+                            raise ValueError(f"Record without key column {key_column}: {record}")
+                        last["key"] = json.dumps(record[key_column])
+                    yield record
+
+            def finish(rows):
+                # Eseguita nella transazione del blocco: dati e stato vengono confermati insieme.
+                # Il totale dichiarato dal server (se c'è) decide quando fermarsi: per pagine è il
+                # totale del risultato, per intervalli di chiave quello delle righe ancora da estrarre
+                total = paging.total_count(fields)
+                received = rows if mode == MODE_KEY else state["rows"] + rows
+                done = paging.is_last_page(rows, chunk_size, received, total)
+                if rows > chunk_size and total is None:
+                    logging.warning(f"⚠️ Extraction {extract_id}: the server returned {rows} rows for a chunk of "
+                                    f"{chunk_size} (paging ignored?), treating it as the whole result")
+                    done = True
+                elif 0 < rows < chunk_size and not done:
+                    logging.warning(f"⚠️ Extraction {extract_id}: the server returned {rows} of {chunk_size} rows "
+                                    f"({total} in total): continuing with smaller chunks")
+                state.update(columns=json.dumps(columns), rows=state["rows"] + rows, last_key_raw=last["key"],
+                             next_page=state["next_page"] + 1, status="done" if done else "running")
+                datamart_store.save_extract_state(conn, state)
+                last["rows"] = rows
+
+            if target == "sqlite":
+                _write_sqlite_chunk(conn, output, columns, tracked(), first, finish)
+            else:
+                _write_file_chunk(conn, output, target, columns, tracked(), state, first, finish)
+
+            rows = last["rows"]
+            if progress is not None:
+                progress.update(rows, 0, None)
+            logging.info(f"🔹 Extraction {extract_id}: chunk of {rows} rows in {time.monotonic() - chunk_start:.1f}s "
+                         f"({state['rows']} rows so far)")
+            if state["status"] == "done":
+                break
+
+        if target == "sqlite" and state["rows"]:
+            conn.execute(f"ANALYZE {datamart_store.quote(output)}")
+    except (requests.RequestException, sqlite3.Error, OSError, ValueError) as e:
+        logging.error(f"❌ Extraction {extract_id} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        if state and state["rows"]:
+            logging.error(f"❌ {state['rows']} rows are saved in {output}: run the extraction again to resume.")
+        print("❌ CST extraction failed (check log)")
+        return None
+    finally:
+        conn.close()
+
+    if dropped:
+        logging.warning(f"⚠️ Extraction {extract_id}: values dropped for fields not in the columns: {dropped} "
+                        f"(use target='jsonl' to keep every field)")
+        print(f"⚠️ CST extraction: values of {len(dropped)} fields not in the columns were dropped (check log)")
+    logging.info(f"✅ Extraction {extract_id} completed into {output}: {state['rows']} rows "
+                 f"in {time.monotonic() - start:.1f}s")
+    print(f"✅ CST extraction successful: {output} ({state['rows']} rows)")
+    return state["rows"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a CST query or custom table in resumable chunks.")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument("-q", "--query", help="CST query to extract")
+    source_group.add_argument("--table", help="custom table to extract")
+    parser.add_argument("-t", "--target", choices=TARGETS, default=DEFAULT_TARGET)
+    parser.add_argument("-o", "--output", help="output table (sqlite) or file path (csv/jsonl)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="rows per chunk")
+    parser.add_argument("--key", help="unique key column for key-range chunks (default: page chunks)")
+    parser.add_argument("--id", help="extraction id used for the resume state")
+    parser.add_argument("--restart", action="store_true", help="ignore the saved state and start over")
+    args = parser.parse_args()
+    result = extract_cst(args.query, args.table, args.target, args.output, args.chunk_size, args.key, args.id,
+                         restart=args.restart)
+    sys.exit(0 if result is not None else 1)
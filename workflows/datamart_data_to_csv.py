@@ -1,54 +1,104 @@
 import os
-import json
 import csv
-import logging
 import sys
-import API.datamart.retrive_datamart_data as retrive_datamart_data
+import time
+import logging
+import argparse
+import itertools
+import traceback
+import requests
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import utils
-import time
+import API.datamart.paging as paging
+import API.datamart.datamart_schema as datamart_schema
+import API.datamart.retrive_datamart_data as retrive_datamart_data
 utils.setup_logging()
 
-def convert_datamart_json_to_csv():
+
+def _first_page_columns(records: list) -> list:
+    """
+    Colonne nell'ordine in cui compaiono nei record della prima pagina.
+    """
+    return list(dict.fromkeys(key for record in records for key in record))
+
+
+def convert_datamart_json_to_csv(datamart_id: str, output_path: str = None, page_size: int = paging.DEFAULT_PAGE_SIZE,
+                                 concurrency: int = 1, progress=None):
     """
-    Converte la risposta JSON del Datamart (logs/response) in un CSV (logs/).
+    Converte i dati di un Datamart in un CSV (logs/Datamart_<id>.csv) in un solo passaggio.
+
+    Le colonne sono quelle dei metadati del datamart, seguite dagli eventuali altri campi
+    presenti nella prima pagina di dati; le righe vengono scritte man mano che le pagine
+    arrivano, senza tenere in memoria l'intero dataset. Un campo che compare per la prima
+    volta dopo la prima pagina non può più essere aggiunto all'intestazione e viene
+    ignorato (con un warning). Il CSV viene scritto in `<path>.tmp` e rinominato solo a
+    conversione completata.
+
+    @param datamart_id: The ID of the DataMart to convert.
+    @param output_path: Percorso del CSV (default `logs/Datamart_<id>.csv`).
+    @param page_size: Record per pagina.
+    @param concurrency: Pagine scaricate in parallelo.
+    @param progress: `TransferProgress` opzionale aggiornato a ogni pagina scaricata.
+    @return: Il percorso del CSV, oppure `None` in caso di errore.
     """
-    datamart_id = input("🔹 Enter Datamart ID to convert to CSV: ")
-    retrive_datamart_data.post_datamart_data(datamart_id)
-
-    json_path = utils.get_response_json_path("postDatamartData", f"datamart_{datamart_id}")
-    input("Modifica nel json quello che devi modificare")
-    if not os.path.exists(json_path):
-        logging.error(f"❌ JSON file not found at {json_path}")
-        print("❌ JSON file not found (check log)")
-        return
-
-    with open(json_path, 'r', encoding='utf-8') as f:
-        json_content = json.load(f)
-
-    data = json_content.get("data", [])
-    if not data:
-        logging.error("❌ No 'data' section found inside the JSON.")
-        print("❌ No data found inside JSON (check log)")
-        return
-
-    # Costruiamo l'elenco di tutte le colonne
-    all_keys = set()
-    for record in data:
-        all_keys.update(record.keys())
-    fieldnames = sorted(all_keys)
-
-    csv_path = os.path.join(utils.get_logs_dir(), f"Datamart_{datamart_id}.csv")
+    if not datamart_id:
+        logging.error("❌ DataMart ID not provided as input argument.")
+        print("❌ Error during conversion (check log)")
+        return None
+
+    csv_path = output_path or os.path.join(utils.get_logs_dir(), f"Datamart_{datamart_id}.csv")
+    tmp_path = f"{csv_path}.tmp"
+    start = time.monotonic()
+
     try:
-        with open(csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(data)
+        fieldnames = [column["name"] for column in datamart_schema.get_datamart_columns(datamart_id)]
+        records = retrive_datamart_data.iter_datamart_records(datamart_id, page_size, concurrency, progress=progress)
+        first_page = list(itertools.islice(records, page_size))
+        records = itertools.chain(first_page, records)
+        # Come nella vecchia conversione, anche i campi assenti dai metadati finiscono nel CSV
+        metadata_columns = set(fieldnames)
+        extra = [name for name in _first_page_columns(first_page) if name not in metadata_columns]
+        if extra:
+            logging.info(f"🔹 DataMart {datamart_id}: {len(extra)} columns taken from the first page"
+                         + (f" (not in the metadata: {extra})" if fieldnames else ""))
+            fieldnames += extra
+        if not fieldnames:
+            logging.error(f"❌ No data found for DataMart {datamart_id}.")
+            print("❌ No data found (check log)")
+            return None
 
-        logging.info(f"✅ CSV file generated successfully at {csv_path}")
-        print(f"✅ CSV generated: {csv_path}")
+        known = set(fieldnames)
+        ignored = set()
+        rows = 0
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames, extrasaction='ignore')
+            writer.writeheader()
+            for record in records:
+                extra = record.keys() - known - ignored
+                if extra:
+                    ignored.update(extra)
+                    logging.warning(f"⚠️ Fields first seen after the first page, ignored: {sorted(extra)}")
+                writer.writerow(record)
+                rows += 1
+        os.replace(tmp_path, csv_path)
 
-    except Exception as e:
-        logging.error(f"❌ Error processing JSON to CSV: {e}\n{traceback.format_exc()}")
+    except (requests.RequestException, OSError, ValueError) as e:
+        logging.error(f"❌ Error converting DataMart {datamart_id} to CSV: {e}\n{traceback.format_exc()}")
         print("❌ Error during conversion (check log)")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+
+    logging.info(f"✅ CSV file generated successfully at {csv_path}: {rows} rows in {time.monotonic() - start:.1f}s")
+    print(f"✅ CSV generated: {csv_path}")
+    return csv_path
+
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a BHCO DataMart to CSV.")
+    parser.add_argument("datamart_id", help="ID of the DataMart to export")
+    parser.add_argument("-o", "--output", help="CSV path (default: logs/Datamart_<id>.csv)")
+    parser.add_argument("--page-size", type=int, default=paging.DEFAULT_PAGE_SIZE, help="records per page")
+    parser.add_argument("--concurrency", type=int, default=1, help="pages downloaded in parallel")
+    args = parser.parse_args()
+    sys.exit(0 if convert_datamart_json_to_csv(args.datamart_id, args.output, args.page_size, args.concurrency) else 1)
@@ -0,0 +1,158 @@
+import os
+import sys
+import time
+import logging
+import itertools
+import traceback
+import requests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import API.datamart.paging as paging
+import API.datamart.datamart_schema as datamart_schema
+import API.datamart.retrive_datamart_data as retrive_datamart_data
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow è opzionale: serve solo per l'export colonnare
+    pa = pq = None
+
+# Record per row group: ogni row group viene scritto appena completo, così in memoria
+# resta al massimo un row group in formato colonnare
+DEFAULT_ROW_GROUP_SIZE = 100000
+DEFAULT_COMPRESSION = "zstd"
+
+
+def _arrow_type(logical: str):
+    return {
+        datamart_schema.INTEGER: pa.int64(),
+        datamart_schema.FLOAT: pa.float64(),
+        datamart_schema.BOOLEAN: pa.bool_(),
+        datamart_schema.TIMESTAMP: pa.timestamp("ms", tz="UTC"),
+    }.get(logical, pa.string())
+
+
+def build_arrow_schema(columns: list):
+    """
+    Schema Arrow corrispondente alle colonne tipizzate del datamart (vedi `datamart_schema.parse_columns`).
+    """
+    return pa.schema([pa.field(column["name"], _arrow_type(column["type"])) for column in columns])
+
+
+def write_records_parquet(records, columns: list, path: str, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                          compression: str = DEFAULT_COMPRESSION) -> int:
+    """
+    Scrive un iterabile di record in un file Parquet tipizzato, un row group alla volta.
+
+    I valori vengono convertiti nel tipo della colonna e accumulati per colonna; le colonne
+    di testo (nomi di entità, sistemi, metriche...) usano il dictionary encoding.
+    Il file viene scritto in `<path>.tmp` e rinominato solo a scrittura completata.
+
+    @param records: Iterabile di record (dict).
+    @param columns: Colonne tipizzate (`[{"name": ..., "type": ...}, ...]`).
+    @param path: Percorso del file Parquet.
+    @param row_group_size: Record per row group.
+    @param compression: Codec Parquet (`zstd`, `snappy`, `gzip`, `none`).
+    @return: Numero di record scritti.
+    """
+    schema = build_arrow_schema(columns)
+    names = [column["name"] for column in columns]
+    converters = [(column["name"], column["type"]) for column in columns]
+    string_columns = [column["name"] for column in columns if column["type"] == datamart_schema.STRING]
+    known = set(names)
+    unknown = set()
+
+    tmp_path = f"{path}.tmp"
+    writer = pq.ParquetWriter(tmp_path, schema, compression=compression, use_dictionary=string_columns or False)
+    buffers = {name: [] for name in names}
+    rows = 0
+    buffered = 0
+
+    def flush():
+        table = pa.Table.from_arrays([pa.array(buffers[name], type=field.type) for name, field in zip(names, schema)],
+                                     schema=schema)
+        writer.write_table(table, row_group_size=row_group_size)
+        for values in buffers.values():
+            values.clear()
+
+    try:
+        for record in records:
+            for name, logical in converters:
+                buffers[name].append(datamart_schema.convert_value(record.get(name), logical))
+            extra = record.keys() - known - unknown
+            if extra:
+                unknown.update(extra)
+                logging.warning(f"⚠️ Columns not in the schema, skipped: {sorted(extra)}")
+            buffered += 1
+            if buffered >= row_group_size:
+                flush()
+                rows += buffered
+                buffered = 0
+        if buffered:
+            flush()
+            rows += buffered
+        writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows
+
+
+def export_datamart_to_parquet(datamart_id: str, output_path: str = None, page_size: int = paging.DEFAULT_PAGE_SIZE,
+                               concurrency: int = 1, row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+                               compression: str = DEFAULT_COMPRESSION, progress=None):
+    """
+    Esporta un datamart in un file Parquet tipizzato (logs/Datamart_<id>.parquet).
+
+    Lo schema è costruito dalle colonne dei metadati (`get_datamart_metadata`); se i metadati
+    non le riportano, viene dedotto dalla prima pagina di dati. I record vengono scaricati
+    a pagine e scritti a row group mentre arrivano.
+
+    @param datamart_id: The ID of the DataMart to export.
+    @param output_path: Percorso del file (default `logs/Datamart_<id>.parquet`).
+    @param page_size: Record per pagina.
+    @param concurrency: Pagine scaricate in parallelo.
+    @param row_group_size: Record per row group.
+    @param compression: Codec Parquet.
+    @param progress: `TransferProgress` opzionale aggiornato a ogni pagina scaricata.
+    @return: Il percorso del file scritto, oppure `None` in caso di errore.
+
+    Requirements:
+    - `pyarrow` must be installed (`pip install pyarrow`).
+    """
+    utils.setup_logging()
+    if pa is None:
+        logging.error("❌ pyarrow is not installed: run `pip install pyarrow` to export Parquet files.")
+        print("❌ Parquet export failed (check log)")
+        return None
+
+    output_path = output_path or os.path.join(utils.get_logs_dir(), f"Datamart_{datamart_id}.parquet")
+    start = time.monotonic()
+
+    try:
+        columns = datamart_schema.get_datamart_columns(datamart_id)
+        records = retrive_datamart_data.iter_datamart_records(datamart_id, page_size, concurrency, progress=progress)
+        if not columns:
+            first_page = list(itertools.islice(records, page_size))
+            columns = datamart_schema.infer_columns(first_page)
+            logging.info(f"🔹 DataMart {datamart_id}: {len(columns)} columns inferred from the first page")
+            records = itertools.chain(first_page, records)
+        if not columns:
+            logging.error(f"❌ DataMart {datamart_id} has no columns and no data to export.")
+            print("❌ Parquet export failed (check log)")
+            return None
+
+        rows = write_records_parquet(records, columns, output_path, row_group_size, compression)
+    except (requests.RequestException, OSError, ValueError, pa.ArrowException) as e:
+        logging.error(f"❌ Parquet export of DataMart {datamart_id} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        print("❌ Parquet export failed (check log)")
+        return None
+
+    size = os.path.getsize(output_path)
+    logging.info(f"✅ Parquet file generated at {output_path}: {rows} rows, {len(columns)} columns, "
+                 f"{size} bytes in {time.monotonic() - start:.1f}s")
+    print(f"✅ Parquet generated: {output_path}")
+    return output_path
@@ -0,0 +1,88 @@
+import os
+import sys
+import time
+import logging
+import sqlite3
+import itertools
+import traceback
+import requests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import DB.datamart_store as datamart_store
+import API.datamart.paging as paging
+import API.datamart.datamart_schema as datamart_schema
+import API.datamart.retrive_datamart_data as retrive_datamart_data
+
+
+def load_datamart_to_sqlite(datamart_id: str, db_path: str = None, table: str = None,
+                            page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1,
+                            index_columns: list = None, append: bool = False, progress=None):
+    """
+    Carica un datamart in una tabella tipizzata del DB locale (default `DB/data.db`, tabella `datamart_<id>`).
+
+    Sostituisce il vecchio `sqlite3 data.db .import Datamart_<id>.csv` (tutte colonne TEXT):
+    la tabella è creata dai metadati del datamart (o dalla prima pagina se i metadati non
+    riportano le colonne), i record vengono inseriti mentre arrivano con `executemany` a
+    blocchi in transazioni grandi, e gli indici sono creati solo a caricamento concluso.
+
+    @param datamart_id: The ID of the DataMart to load.
+    @param db_path: Percorso del DB SQLite (default `utils.get_db_path()`).
+    @param table: Nome della tabella (default `datamart_<id>`).
+    @param page_size: Record per pagina.
+    @param concurrency: Pagine scaricate in parallelo.
+    @param index_columns: Colonne da indicizzare (default: timestamp e colonne dell'entità).
+    @param append: Se `True`, aggiunge le righe alla tabella esistente invece di ricrearla.
+    @param progress: `TransferProgress` opzionale aggiornato a ogni pagina scaricata.
+    @return: Numero di righe caricate, oppure `None` in caso di errore.
+    """
+    utils.setup_logging()
+    table = table or datamart_store.datamart_table(datamart_id)
+    start = time.monotonic()
+
+    try:
+        columns = datamart_schema.get_datamart_columns(datamart_id)
+        records = retrive_datamart_data.iter_datamart_records(datamart_id, page_size, concurrency, progress=progress)
+        if not columns:
+            first_page = list(itertools.islice(records, page_size))
+            columns = datamart_schema.infer_columns(first_page)
+            records = itertools.chain(first_page, records)
+        if not columns:
+            logging.error(f"❌ DataMart {datamart_id} has no columns and no data to load.")
+            print("❌ SQLite load failed (check log)")
+            return None
+
+        conn = datamart_store.connect(db_path)
+        # Un ricaricamento completo avviene in una tabella di appoggio che sostituisce quella
+        # esistente solo a download concluso: se fallisce, tabella e stato di sync restano intatti
+        target = table if append else datamart_store.staging_table(table)
+        try:
+            datamart_store.create_table(conn, target, columns, replace=not append)
+
+            def log_batch(rows):
+                elapsed = time.monotonic() - start
+                logging.info(f"🔹 {table}: {rows} rows loaded ({rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+            rows = datamart_store.bulk_insert(conn, target, columns, records, on_batch=log_batch)
+            if not append:
+                full_load = datamart_id if table == datamart_store.datamart_table(datamart_id) else None
+                datamart_store.swap_table(conn, target, table, full_load, rows)
+            datamart_store.create_indexes(conn, table, index_columns if index_columns is not None
+                                          else datamart_store.default_index_columns(columns))
+            conn.execute(f"ANALYZE {datamart_store.quote(table)}")
+        except BaseException:
+            if not append:
+                try:
+                    datamart_store.drop_table(conn, target)
+                except sqlite3.Error as e:
+                    logging.warning(f"⚠️ Unable to drop the staging table {target}: {e}")
+            raise
+        finally:
+            conn.close()
+    except (requests.RequestException, sqlite3.Error, OSError, ValueError) as e:
+        logging.error(f"❌ SQLite load of DataMart {datamart_id} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        print("❌ SQLite load failed (check log)")
+        return None
+
+    logging.info(f"✅ DataMart {datamart_id} loaded into {table}: {rows} rows in {time.monotonic() - start:.1f}s")
+    print(f"✅ SQLite load successful: {table} ({rows} rows)")
+    return rows
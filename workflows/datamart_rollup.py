@@ -0,0 +1,226 @@
+import os
+import re
+import csv
+import sys
+import time
+import logging
+import sqlite3
+import argparse
+import traceback
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import DB.datamart_store as datamart_store
+import API.datamart.datamart_schema as datamart_schema
+import API.datamart.rollup as rollup
+
+TARGETS = ("sqlite", "csv")
+DEFAULT_TARGET = "sqlite"
+
+# Nomi tipici della colonna timestamp nei datamart BHCO, confrontati con le parole del nome
+# (`TS`, `START_TS`, `EVENT_TIME`, ... ma non `COUNTS` o `RUNTIME`)
+_TIMESTAMP_NAME_HINTS = ("TS", "TIMESTAMP", "DATETIME", "TIME", "DATE")
+_SQLITE_LOGICAL_TYPES = {"INTEGER": datamart_schema.INTEGER, "REAL": datamart_schema.FLOAT}
+
+
+def rollup_table(datamart_id, period: str) -> str:
+    """
+    Nome della tabella locale con gli aggregati di un datamart, es. `rollup_3631_hour`.
+    """
+    return f"rollup_{datamart_id}_{period}"
+
+
+def _sqlite_columns(conn: sqlite3.Connection, table: str) -> list:
+    columns = []
+    for _, name, declared, *_ in conn.execute(f"PRAGMA table_info({datamart_store.quote(table)})"):
+        columns.append({"name": name, "type": _SQLITE_LOGICAL_TYPES.get(declared.upper(), datamart_schema.STRING),
+                        "source_type": declared})
+    return columns
+
+
+def _csv_columns(path: str, limit: int = 1000) -> list:
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        sample = []
+        for record in reader:
+            sample.append({name: datamart_schema.convert_value(value, datamart_schema.FLOAT, report=False)
+                           if value else None for name, value in record.items()})
+            if len(sample) >= limit:
+                break
+        names = reader.fieldnames or []
+    # Le colonne che nel campione non contengono numeri restano testo (timestamp ISO, entità...)
+    inferred = {column["name"]: column["type"] for column in datamart_schema.infer_columns(sample)}
+    return [{"name": name, "type": inferred.get(name) or datamart_schema.STRING, "source_type": None}
+            for name in names]
+
+
+def _is_timestamp_name(name: str) -> bool:
+    return any(token in _TIMESTAMP_NAME_HINTS for token in re.split(r'[^A-Z0-9]+', name.upper()))
+
+
+def default_rollup_columns(columns: list, timestamp_column: str = None, entity_columns: list = None,
+                           value_columns: list = None):
+    """
+    Sceglie le colonne dell'aggregazione quando non sono indicate.
+
+    - timestamp: la prima colonna di tipo timestamp; se non ce ne sono (es. tabelle SQLite o CSV,
+      dove i timestamp sono testo) la prima con un nome tipico (`TS`, `..._TS`, `..._TIME`, `..._DATE`);
+    - entità: le colonne di testo con i nomi usati per gli indici (`ENTNAME`, `SYSNM`, ...);
+    - metriche: tutte le altre colonne numeriche.
+    @return: `(timestamp_column, entity_columns, value_columns)`.
+    """
+    if timestamp_column is None:
+        timestamp_column = next((column["name"] for column in columns if column["type"] == datamart_schema.TIMESTAMP),
+                                None)
+        if timestamp_column is None:
+            timestamp_column = next((column["name"] for column in columns if _is_timestamp_name(column["name"])), None)
+    if entity_columns is None:
+        entity_columns = [column["name"] for column in columns
+                          if column["type"] == datamart_schema.STRING and column["name"] != timestamp_column
+                          and any(hint in column["name"].upper() for hint in datamart_store.DEFAULT_INDEX_NAME_HINTS)]
+    if value_columns is None:
+        value_columns = [column["name"] for column in columns
+                         if column["type"] in (datamart_schema.INTEGER, datamart_schema.FLOAT)
+                         and column["name"] != timestamp_column and column["name"] not in entity_columns
+                         and not any(hint in column["name"].upper() for hint in datamart_store.DEFAULT_INDEX_NAME_HINTS)]
+    return timestamp_column, list(entity_columns), list(value_columns)
+
+
+def _read_sqlite(db_path: str, table: str, names: list) -> dict:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute(f"SELECT {', '.join(datamart_store.quote(name) for name in names)} "
+                            f"FROM {datamart_store.quote(table)}").fetchall()
+    finally:
+        conn.close()
+    values = list(zip(*rows)) if rows else [()] * len(names)
+    return dict(zip(names, values))
+
+
+def _read_csv(path: str, names: list) -> dict:
+    data = {name: [] for name in names}
+    with open(path, 'r', newline='', encoding='utf-8') as f:
+        for record in csv.DictReader(f):
+            for name, values in data.items():
+                values.append(record.get(name) or None)
+    return data
+
+
+def _write_csv(rows: list, columns: list, path: str):
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=[column["name"] for column in columns])
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _write_sqlite(rows: list, columns: list, entity_columns: list, db_path: str, table: str):
+    conn = datamart_store.connect(db_path)
+    try:
+        datamart_store.create_table(conn, table, columns, replace=True)
+        datamart_store.bulk_insert(conn, table, columns, rows)
+        datamart_store.create_indexes(conn, table, [rollup.TS_COLUMN] + entity_columns)
+    finally:
+        conn.close()
+
+
+def rollup_datamart(datamart_id: str, period: str = rollup.DEFAULT_PERIOD, value_columns: list = None,
+                    entity_columns: list = None, timestamp_column: str = None,
+                    percentile: float = rollup.DEFAULT_PERCENTILE, target: str = DEFAULT_TARGET,
+                    output: str = None, source: str = None, db_path: str = None):
+    """
+    Calcola localmente gli aggregati (media, massimo, p95 per entità e per ora/giorno) di un datamart già scaricato.
+
+    Sostituisce, per i report di capacità, il giro `post_datamart_summary_properties` →
+    polling → download del datamart di sintesi: i dati vengono letti dalla copia locale
+    (tabella `datamart_<id>` creata da `datamart_data_to_sqlite` / `datamart_sync`, oppure
+    un CSV di `datamart_data_to_csv`) e aggregati con `API.datamart.rollup`, senza chiamate a BHCO.
+
+    @param datamart_id: The ID of the DataMart to roll up.
+    @param period: `hour` oppure `day`.
+    @param value_columns: Metriche da aggregare (default: le colonne numeriche).
+    @param entity_columns: Colonne dell'entità (default: `ENTNAME`, `SYSNM`, ... se presenti).
+    @param timestamp_column: Colonna del timestamp (default: `TS` o la prima colonna data/ora).
+    @param percentile: Percentile da calcolare (default 95).
+    @param target: `sqlite` (tabella `rollup_<id>_<period>`) oppure `csv` (`logs/Rollup_<id>_<period>.csv`).
+    @param output: Tabella (target `sqlite`) o percorso del CSV (target `csv`) al posto del default.
+    @param source: CSV già esportato da cui leggere i dati (default: la tabella `datamart_<id>` del DB locale).
+    @param db_path: Percorso del DB SQLite (default `utils.get_db_path()`).
+    @return: Numero di righe aggregate scritte, oppure `None` in caso di errore.
+    """
+    utils.setup_logging()
+    db_path = db_path or utils.get_db_path()
+    source_table = datamart_store.datamart_table(datamart_id)
+    start = time.monotonic()
+
+    try:
+        if target not in TARGETS:
+            raise ValueError(f"Unknown rollup target '{target}' (use one of: {', '.join(TARGETS)})")
+        if source:
+            columns = _csv_columns(source)
+        else:
+            conn = datamart_store.connect(db_path)
+            try:
+                if not datamart_store.table_exists(conn, source_table):
+                    logging.error(f"❌ Local table {source_table} not found: load or sync DataMart {datamart_id} first.")
+                    print("❌ Rollup failed (check log)")
+                    return None
+                columns = _sqlite_columns(conn, source_table)
+            finally:
+                conn.close()
+
+        timestamp_column, entity_columns, value_columns = default_rollup_columns(
+            columns, timestamp_column, entity_columns, value_columns)
+        if not timestamp_column or not value_columns:
+            logging.error(f"❌ DataMart {datamart_id}: no timestamp column or no numeric columns to roll up "
+                          f"(timestamp={timestamp_column}, metrics={value_columns})")
+            print("❌ Rollup failed (check log)")
+            return None
+        logging.info(f"🔹 Rollup of DataMart {datamart_id} per {period}: timestamp {timestamp_column}, "
+                     f"entity {entity_columns or '-'}, metrics {value_columns}")
+
+        names = [timestamp_column] + entity_columns + value_columns
+        data = _read_csv(source, names) if source else _read_sqlite(db_path, source_table, names)
+        loaded = time.monotonic()
+        rows = rollup.rollup(data, timestamp_column, entity_columns, value_columns, period, percentile)
+        logging.info(f"🔹 {len(data[timestamp_column])} samples → {len(rows)} aggregates in "
+                     f"{time.monotonic() - loaded:.2f}s ({'NumPy' if rollup.np is not None else 'pure Python'})")
+
+        result_columns = rollup.result_columns(entity_columns, percentile)
+        if target == "csv":
+            output = output or os.path.join(utils.get_logs_dir(), f"Rollup_{datamart_id}_{period}.csv")
+            _write_csv(rows, result_columns, output)
+        else:
+            output = output or rollup_table(datamart_id, period)
+            _write_sqlite(rows, result_columns, entity_columns, db_path, output)
+
+    except (sqlite3.Error, OSError, ValueError) as e:
+        logging.error(f"❌ Rollup of DataMart {datamart_id} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        print("❌ Rollup failed (check log)")
+        return None
+
+    logging.info(f"✅ DataMart {datamart_id} rolled up into {output}: {len(rows)} rows in {time.monotonic() - start:.1f}s")
+    print(f"✅ Rollup successful: {output} ({len(rows)} rows)")
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll up a locally downloaded BHCO DataMart per entity and hour/day.")
+    parser.add_argument("datamart_id", help="ID of the DataMart to roll up")
+    parser.add_argument("-p", "--period", choices=sorted(rollup.PERIODS), default=rollup.DEFAULT_PERIOD)
+    parser.add_argument("-m", "--metric", action="append", dest="metrics", help="metric column (repeatable)")
+    parser.add_argument("-e", "--entity", action="append", dest="entities", help="entity column (repeatable)")
+    parser.add_argument("--ts", help="timestamp column")
+    parser.add_argument("--percentile", type=float, default=rollup.DEFAULT_PERCENTILE)
+    parser.add_argument("-t", "--target", choices=TARGETS, default=DEFAULT_TARGET)
+    parser.add_argument("-o", "--output", help="output table (sqlite) or CSV path (csv)")
+    parser.add_argument("--source", help="read an exported CSV instead of the local datamart table")
+    args = parser.parse_args()
+    result = rollup_datamart(args.datamart_id, args.period, args.metrics, args.entities, args.ts, args.percentile,
+                             args.target, args.output, args.source)
+    sys.exit(0 if result is not None else 1)
@@ -0,0 +1,142 @@
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import traceback
+import requests
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import DB.datamart_store as datamart_store
+import API.datamart.paging as paging
+import API.datamart.datamart_schema as datamart_schema
+import API.datamart.retrive_datamart_data as retrive_datamart_data
+
+
+def choose_watermark_column(columns: list, watermark_column: str = None) -> dict:
+    """
+    Colonna usata come high-water mark: quella indicata, altrimenti il primo timestamp dei metadati.
+    """
+    if watermark_column:
+        return next((column for column in columns if column["name"] == watermark_column), None)
+    return next((column for column in columns if column["type"] == datamart_schema.TIMESTAMP), None)
+
+
+def default_key_columns(datamart_id, columns: list) -> list:
+    """
+    Chiave di upsert quando non viene indicata: quella configurata in `datamart_sync.key_columns.<id>`
+    (config.json), altrimenti le colonne dichiarate come chiave nei metadati (lista vuota se nessuna).
+    """
+    configured = utils.load_config().get("datamart_sync", {}).get("key_columns", {}).get(str(datamart_id))
+    if configured:
+        return list(configured)
+    return [column["name"] for column in columns if column.get("key")]
+
+
+def sync_datamart(datamart_id: str, watermark_column: str = None, key_columns: list = None, db_path: str = None,
+                  page_size: int = paging.DEFAULT_PAGE_SIZE, concurrency: int = 1, full: bool = False,
+                  progress=None):
+    """
+    Sincronizza in modo incrementale un datamart nella tabella locale `datamart_<id>`.
+
+    Per ogni datamart la tabella `_sync_state` conserva l'high-water mark raggiunto (valore
+    massimo della colonna timestamp/chiave scelta dai metadati). Le sincronizzazioni
+    successive chiedono al server solo le righe con valore `>=` al mark (`filters` nel
+    payload) e le inseriscono con un upsert sulla chiave, così le righe arrivate in
+    ritardo con lo stesso timestamp non vengono perse né duplicate. Le righe vengono
+    comunque filtrate anche lato client, nel caso il server ignori il filtro.
+
+    @param datamart_id: The ID of the DataMart to sync.
+    @param watermark_column: Colonna del watermark (default: primo timestamp dei metadati).
+    @param key_columns: Chiave di upsert, univoca per riga (default: `default_key_columns`; obbligatoria se
+                        né la configurazione né i metadati la dichiarano).
+    @param db_path: Percorso del DB SQLite (default `utils.get_db_path()`).
+    @param page_size: Record per pagina.
+    @param concurrency: Pagine scaricate in parallelo.
+    @param full: Se `True`, ignora il watermark salvato e scarica tutto il datamart.
+    @param progress: `TransferProgress` opzionale aggiornato a ogni pagina scaricata.
+    @return: Numero di righe scaricate e scritte, oppure `None` in caso di errore.
+    """
+    utils.setup_logging()
+    table = datamart_store.datamart_table(datamart_id)
+    start = time.monotonic()
+
+    columns = datamart_schema.get_datamart_columns(datamart_id)
+    watermark = choose_watermark_column(columns, watermark_column)
+    if watermark is None:
+        logging.error(f"❌ DataMart {datamart_id}: no watermark column "
+                      f"({watermark_column or 'no timestamp column in the metadata'}).")
+        print("❌ Sync failed (check log)")
+        return None
+    key_columns = key_columns or default_key_columns(datamart_id, columns)
+    if not key_columns:
+        logging.error(f"❌ DataMart {datamart_id}: no upsert key. Pass key_columns=[...] or set "
+                      f"datamart_sync.key_columns.{datamart_id} in config.json (the metadata declares no key).")
+        print("❌ Sync failed (check log)")
+        return None
+    missing = [key for key in key_columns if key not in {column["name"] for column in columns}]
+    if missing:
+        logging.error(f"❌ DataMart {datamart_id}: key columns not in the metadata: {missing}")
+        print("❌ Sync failed (check log)")
+        return None
+    name, logical = watermark["name"], watermark["type"]
+
+    try:
+        conn = datamart_store.connect(db_path)
+    except sqlite3.Error as e:
+        logging.error(f"❌ Unable to open the local DB: {e}")
+        print("❌ Sync failed (check log)")
+        return None
+
+    try:
+        state = None if full else datamart_store.get_sync_state(conn, datamart_id)
+        if state and state["watermark_column"] and state["watermark_column"] != name:
+            logging.warning(f"⚠️ Watermark column changed ({state['watermark_column']} -> {name}), running a full sync.")
+            state = None
+
+        datamart_store.create_table(conn, table, columns)
+        datamart_store.create_unique_index(conn, table, key_columns)
+
+        mark = state["watermark"] if state else None
+        filters = None
+        if mark is not None:
+            filters = [{"name": name, "operator": ">=", "value": json.loads(state["watermark_raw"])}]
+            logging.info(f"🔹 Incremental sync of DataMart {datamart_id} from {name} >= {mark}")
+        else:
+            logging.info(f"🔹 Full sync of DataMart {datamart_id} (watermark column: {name})")
+
+        high = {"value": mark, "raw": state["watermark_raw"] if state else None}
+        skipped = 0
+
+        def new_records():
+            nonlocal skipped
+            for record in retrive_datamart_data.iter_datamart_records(datamart_id, page_size, concurrency,
+                                                                      filters=filters, progress=progress):
+                value = datamart_store.to_sqlite_value(record.get(name), logical)
+                if value is None or (mark is not None and value < mark):
+                    skipped += 1
+                    continue
+                if high["value"] is None or value > high["value"]:
+                    high["value"], high["raw"] = value, json.dumps(record.get(name))
+                yield record
+
+        rows = datamart_store.bulk_insert(conn, table, columns, new_records(), upsert_key=key_columns)
+        datamart_store.save_sync_state(conn, datamart_id, table, name, high["value"], high["raw"])
+        datamart_store.create_indexes(conn, table, datamart_store.default_index_columns(columns))
+    except (requests.RequestException, sqlite3.Error, OSError, ValueError) as e:
+        logging.error(f"❌ Sync of DataMart {datamart_id} failed: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        if isinstance(e, sqlite3.IntegrityError):
+            logging.error(f"❌ {table} contains duplicate keys {key_columns}: run sync_datamart(..., full=True) "
+                          f"after dropping the table, or pass different key_columns.")
+        print("❌ Sync failed (check log)")
+        return None
+    finally:
+        conn.close()
+
+    if skipped:
+        logging.info(f"🔹 {skipped} rows older than the watermark (or without {name}) skipped client-side")
+    logging.info(f"✅ DataMart {datamart_id} synced into {table}: {rows} rows upserted, "
+                 f"watermark {name} = {high['value']} ({time.monotonic() - start:.1f}s)")
+    print(f"✅ Sync successful: {table} ({rows} rows)")
+    return rows
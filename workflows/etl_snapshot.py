@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import logging
+import sqlite3
+import argparse
+import traceback
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import utils
+import DB.datamart_store as datamart_store
+import DB.etl_store as etl_store
+import API.exporting_etls_config.GET_all_etls as GET_all_etls
+import API.exporting_etls_config.POST_etl_configuration as POST_etl_configuration
+import API.async_api as async_api
+
+# Età massima (secondi) dello snapshot prima di riscaricare le configurazioni
+DEFAULT_MAX_AGE = 3600
+
+
+def _max_age() -> float:
+    return utils.load_config().get("etl_snapshot", {}).get("max_age_sec", DEFAULT_MAX_AGE)
+
+
+def _parse(response_str):
+    if not response_str:
+        return None
+    try:
+        configuration = json.loads(response_str)
+    except json.JSONDecodeError:
+        return None
+    return configuration if isinstance(configuration, dict) else None
+
+
+def snapshot_etl_configurations(db_path: str = None):
+    """
+    Scarica in parallelo le configurazioni di tutti gli ETL e le salva nello snapshot locale.
+
+    L'elenco degli ETL viene riletto dal server (`get_all_etls(refresh=True)`), le
+    configurazioni sono scaricate con `async_api.fetch_etl_configurations` e salvate in
+    `etl_configurations` / `etl_properties` del DB locale, con indici su `etl_id`,
+    `module_name`, `scheduler_id`, `period_sec` e sulle chiavi delle proprietà.
+    Gli ETL la cui configurazione non si riesce a scaricare mantengono la voce precedente.
+
+    @param db_path: Percorso del DB SQLite (default `utils.get_db_path()`).
+    @return: Numero di configurazioni salvate, oppure `None` in caso di errore.
+    """
+    utils.setup_logging()
+    start = time.monotonic()
+    etls = GET_all_etls.get_all_etls(refresh=True)
+    if etls is None:
+        logging.error("❌ ETL snapshot aborted: unable to retrieve the ETL list.")
+        print("❌ ETL snapshot failed (check log)")
+        return None
+
+    erids = [etl['etl_id'] for etl in etls]
+    logging.info(f"🔹 ETL snapshot: downloading {len(erids)} configurations concurrently")
+    configurations, failed = {}, []
+    for erid, response_str in zip(erids, async_api.fetch_etl_configurations(erids)):
+        configuration = _parse(response_str)
+        if configuration is None:
+            failed.append(erid)
+        else:
+            configurations[str(erid)] = configuration
+
+    try:
+        conn = datamart_store.connect(db_path)
+        try:
+            etl_store.save_snapshot(conn, configurations, failed)
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logging.error(f"❌ Unable to save the ETL snapshot: {e}\n🔹 Full Traceback:\n{traceback.format_exc()}")
+        print("❌ ETL snapshot failed (check log)")
+        return None
+
+    if failed:
+        logging.warning(f"⚠️ ETL snapshot: {len(failed)} configurations not downloaded: {', '.join(map(str, failed))}")
+    logging.info(f"✅ ETL snapshot saved: {len(configurations)} configurations in {time.monotonic() - start:.1f}s")
+    print(f"✅ ETL snapshot saved: {len(configurations)}/{len(erids)} configurations")
+    return len(configurations)
+
+
+def get_snapshot_age(db_path: str = None):
+    """
+    Secondi trascorsi dall'ultimo snapshot, oppure `None` se non è mai stato fatto.
+    """
+    conn = datamart_store.connect(db_path)
+    try:
+        return etl_store.get_snapshot_age(conn)
+    finally:
+        conn.close()
+
+
+def get_etl_configurations(max_age: float = None, db_path: str = None, etl_ids: list = None) -> list:
+    """
+    Configurazioni ETL lette dallo snapshot locale, riscaricato solo se più vecchio di `max_age`.
+
+    @param max_age: Età massima dello snapshot in secondi (default `etl_snapshot.max_age_sec` o 1h; `0` = sempre nuovo).
+    @param db_path: Percorso del DB SQLite (default `utils.get_db_path()`).
+    @param etl_ids: Solo questi ETL (default: tutti).
+    @return: Lista di `(etl_id, configurazione)` (vuota se lo snapshot non è disponibile).
+
+    Requirements:
+    - `config.json` may contain `etl_snapshot.max_age_sec`.
+    """
+    utils.setup_logging()
+    max_age = _max_age() if max_age is None else max_age
+    age = get_snapshot_age(db_path)
+    if age is not None and age <= max_age:
+        logging.info(f"🔹 Using the local ETL snapshot ({age:.0f}s old)")
+    else:
+        logging.info(f"🔄 ETL snapshot {'missing' if age is None else f'is {age:.0f}s old'}: refreshing")
+        snapshot_etl_configurations(db_path)
+    conn = datamart_store.connect(db_path)
+    try:
+        return etl_store.load_configurations(conn, etl_ids)
+    finally:
+        conn.close()
+
+
+def refresh_etl_configuration(erid, db_path: str = None):
+    """
+    Riscarica la configurazione di un solo ETL (es. dopo un PUT/PATCH) e aggiorna lo snapshot.
+
+    @return: La configurazione (dict), oppure `None` se non è stato possibile scaricarla.
+    """
+    configuration = _parse(POST_etl_configuration.post_etl_configuration(erid))
+    if configuration is None:
+        return None
+    conn = datamart_store.connect(db_path)
+    try:
+        etl_store.ensure_schema(conn)
+        conn.execute("BEGIN")
+        etl_store.save_configuration(conn, erid, configuration)
+        conn.execute("COMMIT")
+    except sqlite3.Error as e:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        logging.warning(f"⚠️ Unable to update the ETL snapshot for {erid}: {e}")
+    finally:
+        conn.close()
+    return configuration
+
+
+def find_etls(max_age: float = None, db_path: str = None, **criteria) -> list:
+    """
+    Ricerca sullo snapshot, es. `find_etls(module_name="...", scheduler_id=1)` o `find_etls(property_key="...")`.
+
+    @return: Lista di ETL ID (vedi `etl_store.find_etls` per i criteri).
+    """
+    get_etl_configurations(max_age, db_path, etl_ids=[])  # aggiorna lo snapshot se necessario
+    conn = datamart_store.connect(db_path)
+    try:
+        return etl_store.find_etls(conn, **criteria)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot every ETL configuration into the local DB.")
+    parser.add_argument("--if-older-than", type=float, metavar="SECONDS",
+                        help="only refresh if the snapshot is older than this")
+    args = parser.parse_args()
+    if args.if_older_than is not None:
+        snapshot_age = get_snapshot_age()
+        if snapshot_age is not None and snapshot_age <= args.if_older_than:
+            print(f"✅ ETL snapshot is fresh ({snapshot_age:.0f}s old)")
+            sys.exit(0)
+    sys.exit(0 if snapshot_etl_configurations() is not None else 1)